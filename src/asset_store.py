@@ -0,0 +1,161 @@
+""" Content-addressed asset store on flash
+        by: Matt Hall
+        version: 0.1
+
+    Keeps the fonts and icons that layouts refer to (see layout.py) on the Pico's flash, so each
+    asset is downloaded once rather than with every layout that uses it. Assets are named by the
+    SHA-256 of their bytes, which is checked when storing and reading them, so a stored asset can
+    never be stale and a damaged file is dropped instead of drawn.
+
+    The store keeps to a size budget, evicting the least recently used assets to make room. An
+    index file records the size and last use of every asset, so startup reads one small file
+    instead of scanning the directory, and lookups are a dict access. Uses are counted on a clock
+    kept in the index (utime.time() restarts on every boot without a network time sync), and the
+    index is only written back to flash by flush(), once per layout rather than once per asset.
+
+    Index file (JSON):
+        'clock'     the use counter
+        'assets'    the stored assets, as {sha256: [size in bytes, last use]}
+"""
+import uos
+import ujson
+from ubinascii import hexlify
+
+try:
+    from uhashlib import sha256
+except ImportError:
+    from hashlib import sha256
+
+STORE_PATH = './assets'
+INDEX_NAME = 'index.json'
+
+# Most flash to use for assets (bytes)
+DEFAULT_BUDGET = 64 * 1024
+
+
+class AssetError(ValueError):
+    """ Raised when an asset's bytes don't match its hash """
+    pass
+
+
+def asset_hash(data):
+    return hexlify(sha256(data).digest()).decode()
+
+
+class AssetStore:
+    def __init__(self, path=STORE_PATH, budget=DEFAULT_BUDGET):
+        self.path = path
+        self.budget = budget
+
+        self.__clock = 0
+        self.__assets = {}
+        self.__dirty = False
+
+        try:
+            uos.mkdir(path)
+        except OSError:
+            pass    # Already there
+
+        self.__load_index()
+
+    def __file(self, key):
+        return self.path + '/' + key
+
+    def __load_index(self):
+        try:
+            with open(self.__file(INDEX_NAME)) as f:
+                index = ujson.load(f)
+            self.__clock = index['clock']
+            self.__assets = index['assets']
+        except (OSError, ValueError, KeyError):
+            # No index, or a damaged one: nothing stored can be trusted to be accounted for
+            self.clear()
+
+    def flush(self):
+        """ Write the index back to flash if anything has changed """
+        if not self.__dirty:
+            return
+
+        tmp_path = self.__file(INDEX_NAME) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            ujson.dump({'clock': self.__clock, 'assets': self.__assets}, f)
+        uos.rename(tmp_path, self.__file(INDEX_NAME))
+        self.__dirty = False
+
+    def clear(self):
+        """ Remove every asset """
+        for name in uos.listdir(self.path):
+            uos.remove(self.__file(name))
+
+        self.__clock = 0
+        self.__assets = {}
+        self.__dirty = True
+
+    def __contains__(self, key):
+        return key in self.__assets
+
+    def size(self):
+        """ Total size of the stored assets (bytes) """
+        return sum(entry[0] for entry in self.__assets.values())
+
+    def __touch(self, key):
+        self.__clock += 1
+        self.__assets[key][1] = self.__clock
+        self.__dirty = True
+
+    def __remove(self, key):
+        del self.__assets[key]
+        self.__dirty = True
+        try:
+            uos.remove(self.__file(key))
+        except OSError:
+            pass
+
+    def get(self, key):
+        """ The asset with the hash `key` as a bytearray, or None if it isn't stored """
+        if key not in self.__assets:
+            return None
+
+        try:
+            with open(self.__file(key), 'rb') as f:
+                data = bytearray(f.read())
+        except OSError:
+            data = None
+
+        if data is None or asset_hash(data) != key:
+            # Lost or damaged; it will be fetched again
+            self.__remove(key)
+            return None
+
+        self.__touch(key)
+        return data
+
+    def put(self, key, data):
+        """ Store the asset `data` under its hash `key`, evicting the least recently used assets
+        if needed to stay within the budget. Assets bigger than the whole budget aren't stored.
+
+        Raises AssetError if `data` doesn't match `key`.
+        """
+        if asset_hash(data) != key:
+            raise AssetError('Asset does not match its hash {}'.format(key))
+
+        if key in self.__assets:
+            self.__touch(key)
+            return
+        if len(data) > self.budget:
+            return
+
+        # Evict the least recently used until it fits
+        used = self.size()
+        while used + len(data) > self.budget:
+            oldest = min(self.__assets, key=lambda k: self.__assets[k][1])
+            used -= self.__assets[oldest][0]
+            self.__remove(oldest)
+
+        tmp_path = self.__file(key) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        uos.rename(tmp_path, self.__file(key))
+
+        self.__assets[key] = [len(data), 0]
+        self.__touch(key)
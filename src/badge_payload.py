@@ -0,0 +1,67 @@
+""" Binary badge payload reader
+        by: Matt Hall
+        version: 0.1
+
+    Reads the binary badge format that the badgeman server sends when asked for
+    'application/octet-stream'. This is half the size of the hex-in-JSON format and the image
+    planes can be streamed straight from the socket to the display.
+
+    Layout (all integers big-endian):
+        2 bytes     magic, b'BB'
+        1 byte      format version (1)
+        1 byte      number of image planes that follow (1 = black, 2 = black then red)
+        2 bytes     length N of the metadata
+        N bytes     metadata; the badge record as UTF-8 JSON, without 'userData.image'
+        ...         the image planes, one full frame (width * height / 8 bytes) each; a set bit is
+                    white in the black plane, and a clear bit is red in the red plane
+"""
+import ujson
+
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+
+MAGIC = b'BB'
+VERSION = 1
+HEADER_SIZE = 6
+
+
+class PayloadError(ValueError):
+    """ Raised when a binary payload is truncated or not in the expected format """
+    pass
+
+
+def read_into(stream, buf):
+    """ Fill `buf` completely from `stream`, raising PayloadError if the stream ends early """
+    view = memoryview(buf)
+    got = 0
+    while got < len(buf):
+        n = stream.readinto(view[got:])
+        if not n:
+            raise PayloadError('Payload truncated after {} of {} bytes'.format(got, len(buf)))
+        got += n
+
+
+def skip(stream, count, scratch):
+    """ Read and discard `count` bytes from `stream` using the small buffer `scratch` """
+    view = memoryview(scratch)
+    while count > 0:
+        chunk = min(count, len(scratch))
+        read_into(stream, view[:chunk])
+        count -= chunk
+
+
+def read_header(stream):
+    """ Read the payload header and metadata. Returns (metadata, plane_count). """
+    header = bytearray(HEADER_SIZE)
+    read_into(stream, header)
+
+    if header[0:2] != MAGIC or header[2] != VERSION:
+        raise PayloadError('Not a version {} badge payload'.format(VERSION))
+
+    plane_count = header[3]
+    if plane_count < 1:
+        raise PayloadError('Payload has no image planes')
+
+    meta = bytearray((header[4] << 8) | header[5])
+    read_into(stream, meta)
+
+    return ujson.loads(meta), plane_count
@@ -0,0 +1,78 @@
+""" Server push channel for badge updates
+        by: Matt Hall
+        version: 0.1
+
+    Long-polls the badgeman server's watch endpoint so the badge hears about an edit as soon as it
+    is saved, instead of on its next scheduled poll:
+
+        GET /api/badges/by-mac/<MAC>/watch?since=<version>&timeout=<seconds>
+
+    The server holds the request open until the badge record's version is newer than `since`, then
+    answers 200 with {"version": <new version>}. If nothing changes within `timeout` seconds it
+    answers 204 No Content. Without `since` it answers straight away with the current version.
+
+    Uses non-blocking uasyncio streams so that waiting for a change doesn't hold up other tasks.
+"""
+import uasyncio as asyncio
+import ujson
+
+# Extra time allowed on top of the long-poll timeout before giving up on the server (seconds)
+TIMEOUT_MARGIN = 10
+
+
+class WatchUnsupportedError(Exception):
+    """ Raised when the server doesn't have a watch endpoint """
+    pass
+
+
+async def _request(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f'GET {path} HTTP/1.0\r\nHost: {host}\r\n\r\n'.encode())
+        await writer.drain()
+
+        # Status line, e.g. 'HTTP/1.0 200 OK'
+        status = int((await reader.readline()).split()[1])
+
+        # Headers; the body length is capped, so they aren't needed
+        while True:
+            line = await reader.readline()
+            if not line or line == b'\r\n':
+                break
+
+        # The server closes the connection after the (small) body
+        body = b''
+        while len(body) < 256:
+            chunk = await reader.read(256 - len(body))
+            if not chunk:
+                break
+            body += chunk
+
+        return status, body
+
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def watch(host, port, mac, since=None, timeout=60):
+    """ Wait for the badge record to change after version `since`.
+
+    Returns the new version, or None if nothing changed within `timeout` seconds. Raises
+    WatchUnsupportedError if the server has no watch endpoint, and OSError (or
+    asyncio.TimeoutError) if the connection fails.
+    """
+    path = f'/api/badges/by-mac/{mac}/watch?timeout={timeout}'
+    if since is not None:
+        path += f'&since={since}'
+
+    status, body = await asyncio.wait_for(_request(host, port, path), timeout + TIMEOUT_MARGIN)
+
+    if status == 204:
+        return None
+    if status == 200:
+        return ujson.loads(body)['version']
+    if status in (404, 405, 501):
+        raise WatchUnsupportedError(f'Server has no watch endpoint (status {status})')
+
+    raise OSError(f'Watch request failed with status {status}')
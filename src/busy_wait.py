@@ -0,0 +1,50 @@
+""" BUSY pin wait shared by the display drivers
+        by: Matt Hall
+        version: 0.1
+
+    E-paper controllers hold their BUSY line while rendering. Rather than sleeping in whole seconds,
+    this polls the pin on a millisecond timer so a refresh costs only as long as the panel needs.
+"""
+import uasyncio as asyncio
+from utime import sleep_ms, ticks_ms, ticks_diff
+
+# Default upper bound for the display to become free (ms)
+DEFAULT_TIMEOUT_MS = 30000
+
+# How often to check the BUSY pin (ms)
+DEFAULT_POLL_MS = 2
+
+
+class DisplayTimeoutError(Exception):
+    """ Raised when the display is still busy after the timeout has elapsed """
+    pass
+
+
+def wait_for_idle(pin, idle_value, timeout_ms=DEFAULT_TIMEOUT_MS, poll_ms=DEFAULT_POLL_MS):
+    """ Block until `pin` reads `idle_value`, checking every `poll_ms` milliseconds.
+
+    Returns the number of milliseconds the display was busy for. Raises DisplayTimeoutError if it is
+    still busy after `timeout_ms`.
+    """
+    start = ticks_ms()
+
+    while pin.value() != idle_value:
+        elapsed = ticks_diff(ticks_ms(), start)
+        if elapsed >= timeout_ms:
+            raise DisplayTimeoutError('Display still busy after {} ms'.format(elapsed))
+        sleep_ms(poll_ms)
+
+    return ticks_diff(ticks_ms(), start)
+
+
+async def wait_for_idle_async(pin, idle_value, timeout_ms=DEFAULT_TIMEOUT_MS, poll_ms=DEFAULT_POLL_MS):
+    """ As wait_for_idle, but yields to other uasyncio tasks between checks """
+    start = ticks_ms()
+
+    while pin.value() != idle_value:
+        elapsed = ticks_diff(ticks_ms(), start)
+        if elapsed >= timeout_ms:
+            raise DisplayTimeoutError('Display still busy after {} ms'.format(elapsed))
+        await asyncio.sleep_ms(poll_ms)
+
+    return ticks_diff(ticks_ms(), start)
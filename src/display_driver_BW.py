@@ -10,6 +10,14 @@ from machine import Pin, SPI
 import framebuf
 import utime
 
+from busy_wait import wait_for_idle
+from image_decoder import decode_hex_image
+import instrument
+from panel import Capabilities, BW, FULL, FAST, PARTIAL
+
+# Toggle print debugging
+DEBUG = False
+
 # Display resolution
 EPD_WIDTH = 128
 EPD_HEIGHT = 296  # flash ur dad
@@ -21,6 +29,17 @@ CS_PIN = 9
 RST_PIN = 12
 BUSY_PIN = 13
 
+# Image channels, as named by the black/white/red driver; this panel shows both in black
+BLACK_CHANNEL = 0x10
+RED_CHANNEL = 0x13
+
+# Refresh policy of DisplayDriver (see RefreshPolicy): updates between full (clean) refreshes, the
+# largest change shown with a partial refresh, and how much partial refreshing (in total, since the
+# last clean refresh) forces a full one, as percentages of the panel area
+FULL_REFRESH_EVERY = 20
+PARTIAL_MAX_PERCENT = 30
+GHOSTING_MAX_PERCENT = 300
+
 WF_PARTIAL_2IN9 = [
     0x0,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
     0x80,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
@@ -43,8 +62,66 @@ WF_PARTIAL_2IN9 = [
     0x22,0x17,0x41,0xB0,0x32,0x36,
 ]
 
+try:
+    import micropython
+
+    @micropython.viper
+    def _and_into(dst, src, n: int):
+        d = ptr8(dst)
+        s = ptr8(src)
+        i = 0
+        while i < n:
+            d[i] = d[i] & s[i]
+            i += 1
+
+except (ImportError, AttributeError):
+    # No viper emitter (e.g. CPython on a host machine)
+    def _and_into(dst, src, n):
+        for i in range(n):
+            dst[i] &= src[i]
+
+def dirty_bounds(old, new, lines, stride):
+    """ Compare two frames laid out as `lines` runs of `stride` bytes and return the bounding box
+    of the bytes that changed as (first_line, last_line, first_byte, last_byte), or None if the
+    frames are identical.
+    """
+    size = lines * stride
+
+    # Find the first and last changed bytes to bound the lines
+    first = 0
+    while first < size and old[first] == new[first]:
+        first += 1
+    if first == size:
+        return None
+
+    last = size - 1
+    while old[last] == new[last]:
+        last -= 1
+
+    first_line = first // stride
+    last_line = last // stride
+
+    # Widen the byte range line by line, only checking bytes outside the range found so far
+    first_byte = first % stride
+    last_byte = last % stride
+    if first_byte > last_byte:
+        first_byte, last_byte = last_byte, first_byte
+
+    for line in range(first_line, last_line + 1):
+        base = line * stride
+        for i in range(0, first_byte):
+            if old[base + i] != new[base + i]:
+                first_byte = i
+                break
+        for i in range(stride - 1, last_byte, -1):
+            if old[base + i] != new[base + i]:
+                last_byte = i
+                break
+
+    return first_line, last_line, first_byte, last_byte
+
 class EPD_2in9_Portrait(framebuf.FrameBuffer):
-    def __init__(self):
+    def __init__(self, spi=None):
         self.reset_pin = Pin(RST_PIN, Pin.OUT)
         
         self.busy_pin = Pin(BUSY_PIN, Pin.IN, Pin.PULL_UP)
@@ -54,11 +131,21 @@ class EPD_2in9_Portrait(framebuf.FrameBuffer):
         
         self.lut = WF_PARTIAL_2IN9
         
-        self.spi = SPI(1)
-        self.spi.init(baudrate=4000_000)
+        # SPI bus (can be swapped out, e.g. for a recording fake on a host machine)
+        if spi is None:
+            spi = SPI(1)
+            spi.init(baudrate=4000_000)
+        self.spi = spi
         self.dc_pin = Pin(DC_PIN, Pin.OUT)
         
         self.buffer = bytearray(self.height * self.width // 8)
+
+        # Copy of the last frame sent with display_Partial, used to find what changed
+        self.last_frame = bytearray(self.height * self.width // 8)
+        self.partial_mode = False
+
+        # Whether the fast waveform is loaded (see init_Fast)
+        self.fast_mode = False
         super().__init__(self.buffer, self.width, self.height, framebuf.MONO_HLSB)
         self.init()
 
@@ -74,6 +161,21 @@ class EPD_2in9_Portrait(framebuf.FrameBuffer):
     def spi_writebyte(self, data):
         self.spi.write(bytearray(data))
 
+    def send_rows(self, image, lines, stride, start, end):
+        # Send bytes start..end-1 of each line (a range) in a single chip select, without copying
+        # the image
+        self.digital_write(self.dc_pin, 1)
+        self.digital_write(self.cs_pin, 0)
+        image = memoryview(image)
+        if start == 0 and end == stride and lines.step == 1:
+            # Whole lines in order are one run of the image, so send them in one transfer
+            self.spi.write(image[lines.start * stride:lines.stop * stride])
+        else:
+            for line in lines:
+                base = line * stride
+                self.spi.write(image[base + start:base + end])
+        self.digital_write(self.cs_pin, 1)
+
     def module_exit(self):
         self.digital_write(self.reset_pin, 0)
 
@@ -99,22 +201,29 @@ class EPD_2in9_Portrait(framebuf.FrameBuffer):
         self.digital_write(self.cs_pin, 1)
         
     def ReadBusy(self):
-        print("e-Paper busy")
-        while(self.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            self.delay_ms(10) 
-        print("e-Paper busy release")  
+        return wait_for_idle(self.busy_pin, 0)      #  0: idle, 1: busy
 
     def TurnOnDisplay(self):
         self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
         self.send_data(0xF7)
         self.send_command(0x20) # MASTER_ACTIVATION
-        self.ReadBusy()
+        instrument.record('refresh', self.ReadBusy())
+
+        # A full update reloads the LUT from OTP, so partial mode has to be set up again
+        self.partial_mode = False
+        self.fast_mode = False
 
     def TurnOnDisplay_Partial(self):
         self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
         self.send_data(0x0F)
         self.send_command(0x20) # MASTER_ACTIVATION
-        self.ReadBusy()
+        instrument.record('refresh', self.ReadBusy())
+
+    def TurnOnDisplay_Fast(self):
+        self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
+        self.send_data(0xC7)    # Display with the waveform already loaded by init_Fast()
+        self.send_command(0x20) # MASTER_ACTIVATION
+        instrument.record('refresh', self.ReadBusy())
 
     def SendLut(self):
         self.send_command(0x32)
@@ -145,6 +254,8 @@ class EPD_2in9_Portrait(framebuf.FrameBuffer):
     def init(self):
         # EPD hardware init start     
         self.reset()
+        self.partial_mode = False
+        self.fast_mode = False
 
         self.ReadBusy()   
         self.send_command(0x12)  #SWRESET
@@ -169,16 +280,40 @@ class EPD_2in9_Portrait(framebuf.FrameBuffer):
         # EPD hardware init end
         return 0
 
+    def init_Fast(self):
+        # As init(), then load the waveform the controller would pick at a high temperature,
+        # which drives the panel for less time: a full refresh in about half the time, for a
+        # little more ghosting
+        self.init()
+
+        self.send_command(0x18) # Temperature sensor control: internal
+        self.send_data(0x80)
+        self.send_command(0x22) # Load the temperature and the waveform for it
+        self.send_data(0xB1)
+        self.send_command(0x20)
+        self.ReadBusy()
+
+        self.send_command(0x1A) # Write temperature register (100 C)
+        self.send_data(0x64)
+        self.send_data(0x00)
+        self.send_command(0x22) # Load the waveform for the written temperature
+        self.send_data(0x91)
+        self.send_command(0x20)
+        self.ReadBusy()
+
+        self.fast_mode = True
+
     def display(self, image):
         if (image == None):
             return            
-        self.send_command(0x24) # WRITE_RAM
+        with instrument.span('upload'):
+            self.send_command(0x24) # WRITE_RAM
 
-        for j in range(0, self.height):
-            for i in range(0, int(self.width / 8)):
-                self.send_data(
-                    image[i + j * int(self.width / 8)]
-                )
+            for j in range(0, self.height):
+                for i in range(0, int(self.width / 8)):
+                    self.send_data(
+                        image[i + j * int(self.width / 8)]
+                    )
 
         self.TurnOnDisplay()
 
@@ -197,10 +332,22 @@ class EPD_2in9_Portrait(framebuf.FrameBuffer):
                 
         self.TurnOnDisplay()
         
-    def display_Partial(self, image):
+    def display_Fast(self, image):
         if (image == None):
             return
-            
+        if not self.fast_mode:
+            self.init_Fast()
+
+        # Both RAMs, so that a partial update can follow
+        stride = int(self.width / 8)
+        with instrument.span('upload'):
+            self.send_command(0x24) # WRITE_RAM
+            self.send_rows(image, range(self.height), stride, 0, stride)
+            self.send_command(0x26) # WRITE_RAM
+            self.send_rows(image, range(self.height), stride, 0, stride)
+        self.TurnOnDisplay_Fast()
+
+    def EnterPartialMode(self):
         self.digital_write(self.reset_pin, 0)
         self.delay_ms(2)
         self.digital_write(self.reset_pin, 1)
@@ -227,14 +374,40 @@ class EPD_2in9_Portrait(framebuf.FrameBuffer):
         self.send_command(0x20) 
         self.ReadBusy()
 
+        self.partial_mode = True
+        self.fast_mode = False
+
+    def display_Partial(self, image):
+        if (image == None):
+            return
+
+        stride = int(self.width / 8)
+
+        # Only the rows and bytes that changed since the last partial update are sent.
+        # Entering partial mode resets the controller, so the first update sends everything.
+        if self.partial_mode:
+            bounds = dirty_bounds(self.last_frame, image, self.height, stride)
+            if bounds == None:
+                return
+        else:
+            self.EnterPartialMode()
+            bounds = (0, self.height - 1, 0, stride - 1)
+
+        y_start, y_end, x_start, x_end = bounds
+
+        self.SetWindow(x_start * 8, y_start, x_end * 8, y_end)
+        self.SetCursor(x_start, y_start)
+
+        with instrument.span('upload'):
+            self.send_command(0x24) # WRITE_RAM
+            self.send_rows(image, range(y_start, y_end + 1), stride, x_start, x_end + 1)
+        self.TurnOnDisplay_Partial()
+
+        # Restore full screen addressing for the other display methods
         self.SetWindow(0, 0, self.width - 1, self.height - 1)
         self.SetCursor(0, 0)
-        
-        self.send_command(0x24) # WRITE_RAM
-        for j in range(0, self.height):
-            for i in range(0, int(self.width / 8)):
-                self.send_data(image[i + j * int(self.width / 8)])
-        self.TurnOnDisplay_Partial()
+
+        self.last_frame[:] = image
 
     def Clear(self, color):
         self.send_command(0x24) # WRITE_RAM
@@ -248,6 +421,8 @@ class EPD_2in9_Portrait(framebuf.FrameBuffer):
     def sleep(self):
         self.send_command(0x10) # DEEP_SLEEP_MODE
         self.send_data(0x01)
+        self.partial_mode = False
+        self.fast_mode = False
         
         self.delay_ms(2000)
         self.module_exit()
@@ -269,6 +444,13 @@ class EPD_2in9_Landscape(framebuf.FrameBuffer):
         self.dc_pin = Pin(DC_PIN, Pin.OUT)
         
         self.buffer = bytearray(self.height * self.width // 8)
+
+        # Copy of the last frame sent with display_Partial, used to find what changed
+        self.last_frame = bytearray(self.height * self.width // 8)
+        self.partial_mode = False
+
+        # Whether the fast waveform is loaded (see init_Fast)
+        self.fast_mode = False
         super().__init__(self.buffer, self.height, self.width, framebuf.MONO_VLSB)
         self.init()
 
@@ -284,6 +466,21 @@ class EPD_2in9_Landscape(framebuf.FrameBuffer):
     def spi_writebyte(self, data):
         self.spi.write(bytearray(data))
 
+    def send_rows(self, image, lines, stride, start, end):
+        # Send bytes start..end-1 of each line (a range) in a single chip select, without copying
+        # the image
+        self.digital_write(self.dc_pin, 1)
+        self.digital_write(self.cs_pin, 0)
+        image = memoryview(image)
+        if start == 0 and end == stride and lines.step == 1:
+            # Whole lines in order are one run of the image, so send them in one transfer
+            self.spi.write(image[lines.start * stride:lines.stop * stride])
+        else:
+            for line in lines:
+                base = line * stride
+                self.spi.write(image[base + start:base + end])
+        self.digital_write(self.cs_pin, 1)
+
     def module_exit(self):
         self.digital_write(self.reset_pin, 0)
 
@@ -309,22 +506,29 @@ class EPD_2in9_Landscape(framebuf.FrameBuffer):
         self.digital_write(self.cs_pin, 1)
         
     def ReadBusy(self):
-        print("e-Paper busy")
-        while(self.digital_read(self.busy_pin) == 1):      #  0: idle, 1: busy
-            self.delay_ms(10) 
-        print("e-Paper busy release")  
+        return wait_for_idle(self.busy_pin, 0)      #  0: idle, 1: busy
 
     def TurnOnDisplay(self):
         self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
         self.send_data(0xF7)
         self.send_command(0x20) # MASTER_ACTIVATION
-        self.ReadBusy()
+        instrument.record('refresh', self.ReadBusy())
+
+        # A full update reloads the LUT from OTP, so partial mode has to be set up again
+        self.partial_mode = False
+        self.fast_mode = False
 
     def TurnOnDisplay_Partial(self):
         self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
         self.send_data(0x0F)
         self.send_command(0x20) # MASTER_ACTIVATION
-        self.ReadBusy()
+        instrument.record('refresh', self.ReadBusy())
+
+    def TurnOnDisplay_Fast(self):
+        self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
+        self.send_data(0xC7)    # Display with the waveform already loaded by init_Fast()
+        self.send_command(0x20) # MASTER_ACTIVATION
+        instrument.record('refresh', self.ReadBusy())
 
     def SendLut(self):
         self.send_command(0x32)
@@ -355,6 +559,8 @@ class EPD_2in9_Landscape(framebuf.FrameBuffer):
     def init(self):
         # EPD hardware init start     
         self.reset()
+        self.partial_mode = False
+        self.fast_mode = False
 
         self.ReadBusy()   
         self.send_command(0x12)  #SWRESET
@@ -379,16 +585,40 @@ class EPD_2in9_Landscape(framebuf.FrameBuffer):
         # EPD hardware init end
         return 0
 
+    def init_Fast(self):
+        # As init(), then load the waveform the controller would pick at a high temperature,
+        # which drives the panel for less time: a full refresh in about half the time, for a
+        # little more ghosting
+        self.init()
+
+        self.send_command(0x18) # Temperature sensor control: internal
+        self.send_data(0x80)
+        self.send_command(0x22) # Load the temperature and the waveform for it
+        self.send_data(0xB1)
+        self.send_command(0x20)
+        self.ReadBusy()
+
+        self.send_command(0x1A) # Write temperature register (100 C)
+        self.send_data(0x64)
+        self.send_data(0x00)
+        self.send_command(0x22) # Load the waveform for the written temperature
+        self.send_data(0x91)
+        self.send_command(0x20)
+        self.ReadBusy()
+
+        self.fast_mode = True
+
     def display(self, image):
         if (image == None):
             return            
-        self.send_command(0x24) # WRITE_RAM
+        with instrument.span('upload'):
+            self.send_command(0x24) # WRITE_RAM
 
-        for j in range(int(self.width / 8) - 1, -1, -1):
-            for i in range(0, self.height):
-                self.send_data(
-                    image[i + j * self.height]
-                )
+            for j in range(int(self.width / 8) - 1, -1, -1):
+                for i in range(0, self.height):
+                    self.send_data(
+                        image[i + j * self.height]
+                    )
 
         self.TurnOnDisplay()
 
@@ -407,10 +637,22 @@ class EPD_2in9_Landscape(framebuf.FrameBuffer):
                 
         self.TurnOnDisplay()
         
-    def display_Partial(self, image):
+    def display_Fast(self, image):
         if (image == None):
             return
-            
+        if not self.fast_mode:
+            self.init_Fast()
+
+        # Both RAMs, so that a partial update can follow
+        columns = range(int(self.width / 8) - 1, -1, -1)
+        with instrument.span('upload'):
+            self.send_command(0x24) # WRITE_RAM
+            self.send_rows(image, columns, self.height, 0, self.height)
+            self.send_command(0x26) # WRITE_RAM
+            self.send_rows(image, columns, self.height, 0, self.height)
+        self.TurnOnDisplay_Fast()
+
+    def EnterPartialMode(self):
         self.digital_write(self.reset_pin, 0)
         self.delay_ms(2)
         self.digital_write(self.reset_pin, 1)
@@ -437,14 +679,43 @@ class EPD_2in9_Landscape(framebuf.FrameBuffer):
         self.send_command(0x20) 
         self.ReadBusy()
 
+        self.partial_mode = True
+        self.fast_mode = False
+
+    def display_Partial(self, image):
+        if (image == None):
+            return
+
+        columns = int(self.width / 8)
+
+        # Only the rows and bytes that changed since the last partial update are sent.
+        # Entering partial mode resets the controller, so the first update sends everything.
+        # Each run of self.height bytes in the image is one RAM column, stored in reverse order.
+        if self.partial_mode:
+            bounds = dirty_bounds(self.last_frame, image, columns, self.height)
+            if bounds == None:
+                return
+        else:
+            self.EnterPartialMode()
+            bounds = (0, columns - 1, 0, self.height - 1)
+
+        j_start, j_end, y_start, y_end = bounds
+        x_start = columns - 1 - j_end
+        x_end = columns - 1 - j_start
+
+        self.SetWindow(x_start * 8, y_start, x_end * 8, y_end)
+        self.SetCursor(x_start, y_start)
+
+        with instrument.span('upload'):
+            self.send_command(0x24) # WRITE_RAM
+            self.send_rows(image, range(j_end, j_start - 1, -1), self.height, y_start, y_end + 1)
+        self.TurnOnDisplay_Partial()
+
+        # Restore full screen addressing for the other display methods
         self.SetWindow(0, 0, self.width - 1, self.height - 1)
         self.SetCursor(0, 0)
-        
-        self.send_command(0x24) # WRITE_RAM
-        for j in range(int(self.width / 8) - 1, -1, -1):
-            for i in range(0, self.height):
-                self.send_data(image[i + j * self.height])    
-        self.TurnOnDisplay_Partial()
+
+        self.last_frame[:] = image
 
     def Clear(self, color):
         self.send_command(0x24) # WRITE_RAM
@@ -458,10 +729,245 @@ class EPD_2in9_Landscape(framebuf.FrameBuffer):
     def sleep(self):
         self.send_command(0x10) # DEEP_SLEEP_MODE
         self.send_data(0x01)
+        self.partial_mode = False
+        self.fast_mode = False
         
         self.delay_ms(2000)
         self.module_exit()
 
+class RefreshPolicy:
+    """ Picks the refresh mode (see panel.py) for each update of the panel.
+
+    Small changes get a partial refresh, and bigger ones a fast refresh, which flashes but drives
+    every pixel and so clears the ghosting that partial refreshes leave behind. A full (clean)
+    refresh is forced every `full_every` updates, or once the partial refreshes since the last
+    clean one have changed `ghosting_percent` of the panel area between them.
+    """
+    def __init__(self, full_every=FULL_REFRESH_EVERY, partial_percent=PARTIAL_MAX_PERCENT, ghosting_percent=GHOSTING_MAX_PERCENT):
+        self.full_every = full_every
+        self.partial_percent = partial_percent
+        self.ghosting_percent = ghosting_percent
+
+        # Updates since the last full refresh, and the area changed by partial refreshes since the
+        # last full or fast one (%)
+        self.updates = 0
+        self.ghosting = 0
+
+    def choose(self, changed_percent):
+        """ The mode for an update changing `changed_percent` of the panel area """
+        if self.updates + 1 >= self.full_every:
+            return FULL
+        if changed_percent > self.partial_percent:
+            return FAST
+        if self.ghosting + changed_percent > self.ghosting_percent:
+            return FULL
+        return PARTIAL
+
+    def refreshed(self, mode, changed_percent):
+        """ Account for an update done in `mode` """
+        if mode == FULL:
+            self.updates = 0
+            self.ghosting = 0
+            return
+
+        self.updates += 1
+        if mode == FAST:
+            self.ghosting = 0
+        else:
+            self.ghosting += changed_percent
+
+
+"""
+Badge display interface (see panel.py) for the black and white panel, in portrait
+"""
+class DisplayDriver:
+    # One colour plane; a partial refresh takes about 0.3 s, a fast one 1 s and a full one 2 s, and
+    # all of them block
+    CAPABILITIES = Capabilities(
+        BW, planes=1, partial_refresh=True, fast_lut=True, background_refresh=False,
+        refresh_ms=2000, partial_refresh_ms=300, fast_refresh_ms=1000
+    )
+
+    def __init__(self, spi=None, blocking=True):
+        """ Raises ValueError if not `blocking`, as refreshes on this panel can't carry on in the
+        background """
+        if not blocking:
+            raise ValueError('Refreshes on the black and white panel always block')
+
+        self.epd = EPD_2in9_Portrait(spi)
+
+        self.width = EPD_WIDTH
+        self.height = EPD_HEIGHT
+
+        # The portrait buffer has the same layout as a badge image plane
+        self.frame = self.epd.buffer
+
+        # Red plane sent along with a black image (bit clear = red); drawn in black on this panel
+        self.red_frame = bytearray(len(self.frame))
+
+        # Copy of the plane currently on the panel, so unchanged images can be skipped
+        self.__shown_frame = bytearray(len(self.frame))
+        self.__shown_channel = None
+
+        # Whether the controller's RAM matches the panel, which a partial refresh relies on
+        self.__synced = False
+
+        # Duration and mode of the most recent update (ms)
+        self.last_refresh_ms = 0
+        self.last_refresh_mode = None
+
+        # Picks the refresh mode when the caller doesn't
+        self.policy = RefreshPolicy()
+
+        # Refreshes on this panel are short and always block
+        self.blocking = True
+
+        # Whether the panel has been put into deep sleep (see sleep())
+        self.__asleep = False
+
+    def __full_update(self):
+        # Write both RAMs so that later partial refreshes start from what is on the panel
+        stride = self.width // 8
+        with instrument.span('upload'):
+            self.epd.send_command(0x24) # WRITE_RAM
+            self.epd.send_rows(self.frame, range(self.height), stride, 0, stride)
+            self.epd.send_command(0x26) # WRITE_RAM (previous image)
+            self.epd.send_rows(self.frame, range(self.height), stride, 0, stride)
+        self.epd.TurnOnDisplay()
+
+    def sleep(self):
+        """ Power the panel down into deep sleep; it keeps showing its image, and its RAM, so the
+        next update can still be a partial one. The panel is woken up again the next time anything
+        is displayed. """
+        if self.__asleep:
+            return
+
+        if DEBUG: print('* Powering display off...')
+        self.epd.send_command(0x10) # DEEP_SLEEP_MODE
+        self.epd.send_data(0x01)
+        self.__asleep = True
+
+        # Waking up resets the controller, so any waveform has to be loaded again
+        self.epd.partial_mode = False
+        self.epd.fast_mode = False
+
+    def clear(self):
+        self.frame[:] = b'\xff' * len(self.frame)
+        self.__shown_channel = None
+        self.display_frame(mode=FULL)
+
+    def refresh_pending(self):
+        """ Refreshes always block on this panel, so one is never pending """
+        return False
+
+    async def wait_async(self):
+        return 0
+
+    def restore_shown(self, channel=BLACK_CHANNEL, red=False):
+        """ Tell the driver that the panel already shows the contents of the frame buffer (e.g.
+        restored from flash after a reboot), so that displaying the same image again doesn't
+        refresh the panel. The controller's RAM is lost over a reboot, so the next change is shown
+        with a full refresh. """
+        self.__shown_frame[:] = self.frame
+        self.__shown_channel = channel
+        self.__synced = False
+
+    def shown_channel(self):
+        """ The channel of the image currently on the panel, or None if unknown """
+        return self.__shown_channel
+
+    def shows_red(self):
+        """ Red is merged into the frame on this panel, so there is never a separate red plane """
+        return False
+
+    def display(self, image, channel=BLACK_CHANNEL, red_image=None, mode=None):
+        """ Decode a hex image, and optionally a red plane, into the frame buffer and display it
+        with the refresh `mode` (see display_frame()); see the black/white/red driver. Red is shown
+        in black.
+
+        Returns True if the panel was updated, or False if it already shows these exact pixels.
+
+        Raises ImageFormatError (before touching the display) if the image is malformed.
+        """
+        with instrument.span('decode'):
+            decode_hex_image(image, self.frame)
+            if red_image is not None:
+                decode_hex_image(red_image, self.red_frame)
+
+        return self.display_frame(channel, red_image is not None, mode)
+
+    def display_stream(self, stream, channel=BLACK_CHANNEL, planes=1, mode=None):
+        """ Read raw image planes (black, then red if `planes` = 2) from `stream` into the frame
+        buffers and display them. The update only sends what changed, so unlike the black/white/red
+        driver nothing is sent while the planes are still arriving.
+
+        Raises EOFError if the stream ends before the planes have been read.
+        """
+        for buf in (self.frame, self.red_frame)[:planes]:
+            view = memoryview(buf)
+            got = 0
+            while got < len(buf):
+                n = stream.readinto(view[got:])
+                if not n:
+                    raise EOFError('Image stream ended after {} of {} bytes'.format(got, len(buf)))
+                got += n
+
+        return self.display_frame(channel, planes > 1, mode)
+
+    def display_frame(self, channel=BLACK_CHANNEL, red=False, mode=None):
+        """ Display whatever is in the frame buffer (self.frame), with the red plane
+        (self.red_frame) merged in if `red`.
+
+        The refresh is done in `mode` (see panel.py), or as the refresh policy (self.policy) picks
+        for the size of the change if None. The first update after starting up, when what's on the
+        panel isn't known to be in the controller's RAM, is always a full refresh.
+
+        Returns True if the panel was updated, or False if it already shows these exact pixels.
+        """
+        if red:
+            # Red pixels (clear bits) show as black
+            _and_into(self.frame, self.red_frame, len(self.frame))
+
+        if channel == self.__shown_channel and self.frame == self.__shown_frame:
+            if DEBUG: print('* Image unchanged; skipping render.')
+            return False
+
+        # Share of the panel area that changes, from the bounding box of the change
+        bounds = dirty_bounds(self.__shown_frame, self.frame, self.height, self.width // 8)
+        if bounds is None:
+            changed = 0     # Same pixels, shown on another channel
+        else:
+            changed = (bounds[1] - bounds[0] + 1) * (bounds[3] - bounds[2] + 1) * 100 // len(self.frame)
+
+        if not self.__synced:
+            mode = FULL if mode is None or mode == PARTIAL else mode
+        elif mode is None:
+            mode = self.policy.choose(changed)
+        if DEBUG: print(f'* {mode} refresh ({changed}% of the panel changed)')
+
+        start = utime.ticks_ms()
+        if self.__asleep:
+            # Only a hardware reset wakes the controller, which init_Fast() does itself
+            if mode != FAST:
+                self.epd.init()
+            self.__asleep = False
+
+        if mode == PARTIAL:
+            self.epd.display_Partial(self.frame)
+        elif mode == FAST:
+            self.epd.display_Fast(self.frame)
+        else:
+            self.__full_update()
+        self.last_refresh_ms = utime.ticks_diff(utime.ticks_ms(), start)
+        self.last_refresh_mode = mode
+        self.policy.refreshed(mode, changed)
+
+        self.__shown_frame[:] = self.frame
+        self.__shown_channel = channel
+        self.__synced = True
+        return True
+
+
 if __name__=='__main__':
     # Landscape
     epd = EPD_2in9_Landscape()
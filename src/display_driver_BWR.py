@@ -8,7 +8,12 @@
         license: MIT
 """
 from machine import Pin, SPI
-from utime import sleep
+from utime import sleep, ticks_ms, ticks_diff
+
+from busy_wait import wait_for_idle, wait_for_idle_async
+from image_decoder import decode_hex_image
+import instrument
+from panel import Capabilities, BWR
 
 # Toggle print debugging
 DEBUG = False
@@ -17,6 +22,19 @@ DEBUG = False
 DISPLAY_WIDTH = 128
 DISPLAY_HEIGHT = 296
 
+# Size of one full colour plane in SRAM (1 bit per pixel)
+PLANE_SIZE = DISPLAY_WIDTH * DISPLAY_HEIGHT // 8
+
+# SRAM channels
+BLACK_CHANNEL = 0x10    # DTM1
+RED_CHANNEL = 0x13      # DTM2
+
+# A plane with every pixel off, used to blank SRAM in one transfer
+BLANK_PLANE = b'\xff' * PLANE_SIZE
+
+# Bytes read from a stream per SPI transfer in display_stream
+STREAM_CHUNK_SIZE = 1024
+
 # Pinout
 DC_PIN = 8      # Data/Command pin (0=cmd, 1=data)
 CS_PIN = 9      # Chip Select pin
@@ -29,20 +47,57 @@ BUSY_PIN = 13   # Busy when LOW
 Driver class for the Waveshare 2.9" ePaper display for Pico (pico-e-paper-2.9-b)
 """
 class DisplayDriver:
-    def __init__(self):
+    # Two colour planes, no partial refresh; a full refresh takes about 15 s and carries on in the
+    # background
+    CAPABILITIES = Capabilities(
+        BWR, planes=2, partial_refresh=False, fast_lut=False, background_refresh=True, refresh_ms=15000
+    )
+
+    def __init__(self, spi=None, blocking=True):
         if DEBUG: print('* Initialising display module interface...')
         # Init pin layout
         self.__cs_pin = Pin(CS_PIN, Pin.OUT)
         self.__reset_pin = Pin(RESET_PIN, Pin.OUT)
         self.__busy_pin = Pin(BUSY_PIN, Pin.IN, Pin.PULL_UP)
 
-        # Init SPI connection
-        self.__spi = SPI(1, baudrate=4000000)
+        # Init SPI connection (can be swapped out, e.g. for a recording fake on a host machine)
+        if spi is None:
+            self.__spi = SPI(1, baudrate=4000000)
+        else:
+            self.__spi = spi
         self.__dc_pin = Pin(DC_PIN, Pin.OUT)
 
         self.width = DISPLAY_WIDTH
         self.height = DISPLAY_HEIGHT
 
+        # Preallocate transfer buffers so that sending pixel data doesn't allocate
+        self.__byte_buf = bytearray(1)
+        self.frame = bytearray(PLANE_SIZE)
+
+        # Red plane shown along with a black image in the frame (bit clear = red)
+        self.red_frame = bytearray(PLANE_SIZE)
+
+        # Copy of the planes currently on the panel, so unchanged images can be skipped
+        self.__shown_frame = bytearray(PLANE_SIZE)
+        self.__shown_red = bytearray(PLANE_SIZE)
+        self.__shown_channel = None
+        self.__shows_red = False
+
+        # Duration of the most recent panel refresh (ms)
+        self.last_refresh_ms = 0
+
+        # Whether refreshes block until the panel is done. If not, the refresh carries on in the
+        # background and wait_async() can be awaited for it to finish.
+        self.blocking = blocking
+        self.__refresh_pending = False
+        self.__refresh_start = 0
+
+        # Whether the panel has been put into deep sleep (see sleep())
+        self.__asleep = False
+
+        self.__init_panel()
+
+    def __init_panel(self):
         if DEBUG: print('* Initialising display...')
 
         # Reset and send power on cmd
@@ -105,12 +160,23 @@ class DisplayDriver:
         self.__delay_ms(50)
 
     def __send_command(self, command):
+        # Bring the panel back out of deep sleep first, which needs a full reset
+        if self.__asleep:
+            self.__asleep = False
+            self.__init_panel()
+
+        # Let a background refresh finish before sending anything else
+        if self.__refresh_pending:
+            self.__wait_for_display()
+            self.__end_refresh()
+
         # Command mode
         self.__dc_pin.value(0)
 
         # Slave chip select and send command, then return to master
+        self.__byte_buf[0] = command
         self.__cs_pin.value(0)
-        self.__spi.write(bytearray([command]))
+        self.__spi.write(self.__byte_buf)
         self.__cs_pin.value(1)
 
     def __send_data(self, data):
@@ -118,37 +184,85 @@ class DisplayDriver:
         self.__dc_pin.value(1)
 
         # Slave chip select and send command, then return to master
+        self.__byte_buf[0] = data
         self.__cs_pin.value(0)
-        self.__spi.write(bytearray([data]))
+        self.__spi.write(self.__byte_buf)
+        self.__cs_pin.value(1)
+
+    def __send_data_bulk(self, buf):
+        # Data mode
+        self.__dc_pin.value(1)
+
+        # Hold chip select for the whole buffer so it goes out in a single transfer
+        self.__cs_pin.value(0)
+        self.__spi.write(buf)
         self.__cs_pin.value(1)
 
     def __wait_for_display(self):
         if DEBUG: print('    Rendering...')
-        # Set upper bounds of 30 seconds for display to update; check every 1 second
-        for i in range(30):
-            # Rendering takes time so we monitor the BUSY pin that signals when
-            # the microcontroller has finished the render (0=busy, 1=free)
-            if self.__busy_pin.value() == 1: break
-            self.__delay_ms(1000)
-
-        if DEBUG: print('    Rendering complete.')
+        # Rendering takes time so we monitor the BUSY pin that signals when
+        # the microcontroller has finished the render (0=busy, 1=free)
+        return wait_for_idle(self.__busy_pin, 1)
 
     def __refresh_display(self):
         # Send display refresh cmd (DRF)
         self.__send_command(0x12)
-        self.__wait_for_display()
-
-    def __fill_display(self, channel=0x10, val_to_write=0xff):
-        # Start pixel data tx to SRAM (DTM1)
+        self.__refresh_start = ticks_ms()
+
+        if self.blocking:
+            self.__wait_for_display()
+            self.__end_refresh()
+        else:
+            self.__refresh_pending = True
+
+    def __end_refresh(self):
+        self.__refresh_pending = False
+        self.last_refresh_ms = ticks_diff(ticks_ms(), self.__refresh_start)
+        instrument.record('refresh', self.last_refresh_ms, start=self.__refresh_start)
+
+    def __fill_display(self, channel=BLACK_CHANNEL):
+        # Start pixel data tx to SRAM and overwrite the whole plane with blank pixels
+        # (only the SRAM is touched; the panel itself doesn't change until the next refresh)
         self.__send_command(channel)
+        self.__send_data_bulk(BLANK_PLANE)
 
-        for j in range(self.height):
-            for i in range(int(self.width / 8)):
-                if DEBUG: print(f'    clearing ({i}, {j})')
-                self.__send_data(val_to_write)
+    def __unchanged(self, channel, red):
+        # Whether the panel already shows the frame on `channel` (and the red plane, if `red`)
+        if channel != self.__shown_channel or red != self.__shows_red:
+            return False
+        return self.frame == self.__shown_frame and (not red or self.red_frame == self.__shown_red)
 
+    def __stream_plane(self, stream, channel, buf):
+        # Read one plane from the stream into `buf`, sending each chunk on to `channel` as it arrives
+        self.__send_command(channel)
+
+        view = memoryview(buf)
+        got = 0
+        while got < PLANE_SIZE:
+            n = stream.readinto(view[got:got + STREAM_CHUNK_SIZE])
+            if not n:
+                raise EOFError('Image stream ended after {} of {} bytes'.format(got, PLANE_SIZE))
+
+            self.__send_data_bulk(view[got:got + n])
+            got += n
+
+    def __finish_update(self, channel, red=False):
+        # Wipe the SRAM of the other channel (unless both were sent) so no stale pixels show through
+        if not red:
+            if channel == BLACK_CHANNEL:
+                self.__fill_display(RED_CHANNEL)
+            else:
+                self.__fill_display(BLACK_CHANNEL)
+
+        # Refresh screen with new image in SRAM (the only refresh for this update)
         self.__refresh_display()
 
+        self.__shown_frame[:] = self.frame
+        self.__shown_channel = channel
+        self.__shows_red = red
+        if red:
+            self.__shown_red[:] = self.red_frame
+
     def __power_off(self):
         # Send power off cmd
         self.__send_command(0x02)
@@ -158,6 +272,16 @@ class DisplayDriver:
         self.__send_command(0x07)
         self.__send_data(0xA5)
 
+    def sleep(self):
+        """ Power the panel down into deep sleep; it keeps showing its image. The panel is woken
+        up again automatically the next time anything is sent to it. """
+        if self.__asleep:
+            return
+
+        if DEBUG: print('* Powering display off...')
+        self.__power_off()
+        self.__asleep = True
+
     def debug_display_stripes(self, channel=0x10):
         if DEBUG: print("* DEBUG CMD: STRIPES")
         
@@ -177,29 +301,133 @@ class DisplayDriver:
 
         self.__refresh_display()
 
-    def display(self, image, channel=0x10):
+        self.__shown_channel = None
+
+    def clear(self):
+        # Blank both channels and refresh once
+        self.__fill_display(BLACK_CHANNEL)
+        self.__fill_display(RED_CHANNEL)
+        self.__refresh_display()
+
+        self.__shown_channel = None
+
+    def refresh_pending(self):
+        """ Whether a background refresh (see `blocking`) may still be in progress """
+        return self.__refresh_pending
+
+    async def wait_async(self):
+        """ Wait for a background refresh to finish while letting other uasyncio tasks run.
+
+        Returns the duration of the refresh in ms, or 0 if none was in progress. Raises
+        DisplayTimeoutError if the panel stays busy for too long.
+        """
+        if not self.__refresh_pending:
+            return 0
+
+        await wait_for_idle_async(self.__busy_pin, 1)
+
+        # Another task may have been waiting on the same refresh and got there first
+        if self.__refresh_pending:
+            self.__end_refresh()
+        return self.last_refresh_ms
+
+    def restore_shown(self, channel=BLACK_CHANNEL, red=False):
+        """ Tell the driver that the panel already shows the contents of the frame buffer, and
+        of the red plane if `red` (e.g. restored from flash after a reboot; e-paper keeps its image
+        without power), so that displaying the same image again doesn't refresh the panel. """
+        self.__shown_frame[:] = self.frame
+        self.__shown_channel = channel
+        self.__shows_red = red
+        if red:
+            self.__shown_red[:] = self.red_frame
+
+    def shown_channel(self):
+        """ The channel of the image currently on the panel, or None if unknown """
+        return self.__shown_channel
+
+    def shows_red(self):
+        """ Whether the panel shows the red plane (red_frame) along with the frame """
+        return self.__shows_red
+
+    def display(self, image, channel=BLACK_CHANNEL, red_image=None, mode=None):
         """ Push an image to the display module and display it. Images are expected to be contiguous
         hex strings, where each pair of hex values represents 8 pixels to display.
 
         e.g., '0e' corresponds to the 8 pixel segment: '00001110'
         
-        The image can be displayed in black (0x10) or red (0x13); black is default.
+        The image can be displayed in black (0x10) or red (0x13); black is default. A black image
+        can also come with `red_image`, a red plane in the same format (bit clear = red, drawn over
+        black), in which case both planes are uploaded and shown with a single refresh.
+
+        This panel only has a full refresh, so `mode` (see panel.py) is ignored.
+
+        Returns True if the panel was updated, or False if it already shows these exact pixels.
+
+        Raises ImageFormatError (before touching the display) if the image is malformed or doesn't
+        cover the whole display.
         """
-        # Wipe SRAM for both channels
-        self.__fill_display(0x10)
-        self.__fill_display(0x13)
-        
-        # Start pixel data tx to SRAM (DTM1)
-        self.__send_command(channel)
+        # Decode into the frame buffer first so a bad payload doesn't wipe the current image
+        with instrument.span('decode'):
+            decode_hex_image(image, self.frame)
+            if red_image is not None:
+                decode_hex_image(red_image, self.red_frame)
+
+        return self.display_frame(channel, red_image is not None)
+
+    def display_stream(self, stream, channel=BLACK_CHANNEL, planes=1, mode=None):
+        """ Read raw image planes (as in the binary badge format) from `stream`, e.g. a socket,
+        and send each chunk to the display's SRAM as soon as it arrives so the download and the SPI
+        upload overlap. Uses no memory beyond the existing frame buffers.
+
+        With `planes` = 2, a black plane is followed by a red one (see display()).
+
+        Returns True if the panel was refreshed, or False if the planes turned out to match what is
+        already shown (the refresh is skipped, though the upload has already happened).
+
+        Raises EOFError if the stream ends before the planes have been read.
+        """
+
+        red = planes > 1
+        if red and channel != BLACK_CHANNEL:
+            raise ValueError('A red plane can only go with a black image')
+
+        # Timed as one span, as receiving and sending overlap
+        with instrument.span('upload'):
+            self.__stream_plane(stream, channel, self.frame)
+            if red:
+                self.__stream_plane(stream, RED_CHANNEL, self.red_frame)
+
+        if self.__unchanged(channel, red):
+            if DEBUG: print('* Image unchanged; skipping refresh.')
+            return False
+
+        self.__finish_update(channel, red)
+        return True
+
+    def display_frame(self, channel=BLACK_CHANNEL, red=False, mode=None):
+        """ Display whatever is in the frame buffer (self.frame), along with the red plane
+        (self.red_frame) if `red`, e.g. after reading a binary image into them directly.
+
+        Returns True if the panel was updated, or False if it already shows these exact pixels.
+        """
+        if red and channel != BLACK_CHANNEL:
+            raise ValueError('A red plane can only go with a black image')
+
+        # Nothing to do if the pixels haven't changed
+        if self.__unchanged(channel, red):
+            if DEBUG: print('* Image unchanged; skipping render.')
+            return False
 
         if DEBUG: print('* Starting render...')
 
-        # Fetch every two chars in the image and interpret as hex number
-        for i in range(0, len(image), 2):
-            self.__send_data(
-                int(image[i:i+2], 16)
-            )
+        # Start pixel data tx to SRAM and send each plane in one go, back to back
+        with instrument.span('upload'):
+            self.__send_command(channel)
+            self.__send_data_bulk(self.frame)
+            if red:
+                self.__send_command(RED_CHANNEL)
+                self.__send_data_bulk(self.red_frame)
 
-        # Refresh screen with new image in SRAM
-        self.__refresh_display()
+        self.__finish_update(channel, red)
+        return True
 
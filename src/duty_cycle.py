@@ -0,0 +1,85 @@
+""" Low-power duty cycling between polls
+        by: Matt Hall
+        version: 0.1
+
+    In low-power mode the badge spends almost all of its time asleep: it wakes, connects to WLAN,
+    polls the server (drawing any change), powers the panel and radio down, and sleeps until the next
+    poll is due. This module is just that state machine; the hardware actions are passed in, so it
+    can be driven on a host with a fake clock and fake sleep.
+
+        WAKE -> CONNECT -> POLL -> POWER_DOWN -> SLEEP -> WAKE ...
+                   |                   ^
+                   +--(no connection)--+
+"""
+import poll_schedule
+
+# States
+WAKE = 'wake'
+CONNECT = 'connect'
+POLL = 'poll'
+POWER_DOWN = 'power_down'
+SLEEP = 'sleep'
+
+
+class DutyCycle:
+    def __init__(self, scheduler, connect, poll, power_down, sleep_ms, ticks_ms, ticks_diff):
+        """
+        scheduler       a poll_schedule.PollScheduler deciding how long to sleep
+        connect()       bring the network up; returns whether it connected
+        poll()          poll the server; returns a poll_schedule result
+        power_down()    put the panel and radio into their lowest power state
+        sleep_ms(ms)    sleep (e.g. machine.lightsleep); may not return if it resets the board
+        ticks_ms, ticks_diff
+                        the clock, as in utime
+        """
+        self.scheduler = scheduler
+        self.connect = connect
+        self.poll = poll
+        self.power_down = power_down
+        self.sleep_ms = sleep_ms
+        self.ticks_ms = ticks_ms
+        self.ticks_diff = ticks_diff
+
+        self.state = WAKE
+        self.result = None
+
+        # When the current cycle woke up, and how long the last cycle was awake/asleep for (ms)
+        self.wake_time = ticks_ms()
+        self.awake_ms = 0
+        self.asleep_ms = 0
+
+    def step(self):
+        """ Carry out the current state and move on to the next; returns the new state """
+        if self.state == WAKE:
+            self.wake_time = self.ticks_ms()
+            self.state = CONNECT
+
+        elif self.state == CONNECT:
+            if self.connect():
+                self.state = POLL
+            else:
+                self.result = poll_schedule.FAILED
+                self.scheduler.record(self.result)
+                self.state = POWER_DOWN
+
+        elif self.state == POLL:
+            self.result = self.poll()
+            self.scheduler.record(self.result)
+            self.state = POWER_DOWN
+
+        elif self.state == POWER_DOWN:
+            self.power_down()
+            self.state = SLEEP
+
+        elif self.state == SLEEP:
+            # Polls are spaced from wake to wake, so time spent awake comes off the sleep
+            self.awake_ms = self.ticks_diff(self.ticks_ms(), self.wake_time)
+            self.asleep_ms = max(0, int(self.scheduler.next_delay() * 1000) - self.awake_ms)
+            self.sleep_ms(self.asleep_ms)
+            self.state = WAKE
+
+        return self.state
+
+    def run(self):
+        while True:
+            self.step()
@@ -0,0 +1,106 @@
+""" Built-in badge font
+        by: Matt Hall
+        version: 0.1
+
+    A 6x8 pixel font covering printable ASCII (5x7 glyphs with a column and a row of spacing), in
+    the font asset format of layout.py, so layouts can draw text without the server sending a font.
+"""
+
+DEFAULT = (
+    b'F\x06\x08\x20\x5f'
+    b'\xff\xff\xff\xff\xff\xff\xff\xff'  # space
+    b'\xdf\xdf\xdf\xdf\xdf\xff\xdf\xff'  # !
+    b'\xaf\xaf\xaf\xff\xff\xff\xff\xff'  # "
+    b'\xaf\xaf\x07\xaf\x07\xaf\xaf\xff'  # #
+    b'\xdf\x87\x5f\x8f\xd7\x0f\xdf\xff'  # $
+    b'\x3f\x37\xef\xdf\xbf\x67\xe7\xff'  # %
+    b'\x9f\x6f\x5f\xbf\x57\x6f\x97\xff'  # &
+    b'\x9f\xdf\xbf\xff\xff\xff\xff\xff'  # '
+    b'\xef\xdf\xbf\xbf\xbf\xdf\xef\xff'  # (
+    b'\xbf\xdf\xef\xef\xef\xdf\xbf\xff'  # )
+    b'\xff\xaf\xdf\x07\xdf\xaf\xff\xff'  # *
+    b'\xff\xdf\xdf\x07\xdf\xdf\xff\xff'  # +
+    b'\xff\xff\xff\xff\x9f\xdf\xbf\xff'  # ,
+    b'\xff\xff\xff\x07\xff\xff\xff\xff'  # -
+    b'\xff\xff\xff\xff\xff\x9f\x9f\xff'  # .
+    b'\xff\xf7\xef\xdf\xbf\x7f\xff\xff'  # /
+    b'\x8f\x77\x67\x57\x37\x77\x8f\xff'  # 0
+    b'\xdf\x9f\xdf\xdf\xdf\xdf\x8f\xff'  # 1
+    b'\x8f\x77\xf7\xef\xdf\xbf\x07\xff'  # 2
+    b'\x07\xef\xdf\xef\xf7\x77\x8f\xff'  # 3
+    b'\xef\xcf\xaf\x6f\x07\xef\xef\xff'  # 4
+    b'\x07\x7f\x0f\xf7\xf7\x77\x8f\xff'  # 5
+    b'\xcf\xbf\x7f\x0f\x77\x77\x8f\xff'  # 6
+    b'\x07\xf7\xef\xdf\xbf\xbf\xbf\xff'  # 7
+    b'\x8f\x77\x77\x8f\x77\x77\x8f\xff'  # 8
+    b'\x8f\x77\x77\x87\xf7\xef\x9f\xff'  # 9
+    b'\xff\x9f\x9f\xff\x9f\x9f\xff\xff'  # :
+    b'\xff\x9f\x9f\xff\x9f\xdf\xbf\xff'  # ;
+    b'\xef\xdf\xbf\x7f\xbf\xdf\xef\xff'  # <
+    b'\xff\xff\x07\xff\x07\xff\xff\xff'  # =
+    b'\xbf\xdf\xef\xf7\xef\xdf\xbf\xff'  # >
+    b'\x8f\x77\xf7\xef\xdf\xff\xdf\xff'  # ?
+    b'\x8f\x77\xf7\x97\x57\x57\x8f\xff'  # @
+    b'\x8f\x77\x77\x77\x07\x77\x77\xff'  # A
+    b'\x0f\x77\x77\x0f\x77\x77\x0f\xff'  # B
+    b'\x8f\x77\x7f\x7f\x7f\x77\x8f\xff'  # C
+    b'\x1f\x6f\x77\x77\x77\x6f\x1f\xff'  # D
+    b'\x07\x7f\x7f\x0f\x7f\x7f\x07\xff'  # E
+    b'\x07\x7f\x7f\x1f\x7f\x7f\x7f\xff'  # F
+    b'\x8f\x77\x7f\x7f\x67\x77\x8f\xff'  # G
+    b'\x77\x77\x77\x07\x77\x77\x77\xff'  # H
+    b'\x8f\xdf\xdf\xdf\xdf\xdf\x8f\xff'  # I
+    b'\xc7\xef\xef\xef\xef\x6f\x9f\xff'  # J
+    b'\x77\x6f\x5f\x3f\x5f\x6f\x77\xff'  # K
+    b'\x7f\x7f\x7f\x7f\x7f\x7f\x07\xff'  # L
+    b'\x77\x27\x57\x77\x77\x77\x77\xff'  # M
+    b'\x77\x77\x37\x57\x67\x77\x77\xff'  # N
+    b'\x8f\x77\x77\x77\x77\x77\x8f\xff'  # O
+    b'\x0f\x77\x77\x0f\x7f\x7f\x7f\xff'  # P
+    b'\x8f\x77\x77\x77\x57\x6f\x97\xff'  # Q
+    b'\x0f\x77\x77\x0f\x5f\x6f\x77\xff'  # R
+    b'\x87\x7f\x7f\x8f\xf7\xf7\x0f\xff'  # S
+    b'\x07\xdf\xdf\xdf\xdf\xdf\xdf\xff'  # T
+    b'\x77\x77\x77\x77\x77\x77\x8f\xff'  # U
+    b'\x77\x77\x77\x77\x77\xaf\xdf\xff'  # V
+    b'\x77\x77\x77\x57\x57\x27\x77\xff'  # W
+    b'\x77\x77\xaf\xdf\xaf\x77\x77\xff'  # X
+    b'\x77\x77\xaf\xdf\xdf\xdf\xdf\xff'  # Y
+    b'\x07\xf7\xef\xdf\xbf\x7f\x07\xff'  # Z
+    b'\x8f\xbf\xbf\xbf\xbf\xbf\x8f\xff'  # [
+    b'\xff\x7f\xbf\xdf\xef\xf7\xff\xff'  # backslash
+    b'\x8f\xef\xef\xef\xef\xef\x8f\xff'  # ]
+    b'\xdf\xaf\x77\xff\xff\xff\xff\xff'  # ^
+    b'\xff\xff\xff\xff\xff\xff\x07\xff'  # _
+    b'\xbf\xdf\xef\xff\xff\xff\xff\xff'  # `
+    b'\xff\xff\x8f\xf7\x87\x77\x87\xff'  # a
+    b'\x7f\x7f\x4f\x37\x77\x77\x0f\xff'  # b
+    b'\xff\xff\x8f\x7f\x7f\x77\x8f\xff'  # c
+    b'\xf7\xf7\x97\x67\x77\x77\x87\xff'  # d
+    b'\xff\xff\x8f\x77\x07\x7f\x8f\xff'  # e
+    b'\xcf\xb7\xbf\x1f\xbf\xbf\xbf\xff'  # f
+    b'\xff\xff\x87\x77\x87\xf7\x8f\xff'  # g
+    b'\x7f\x7f\x4f\x37\x77\x77\x77\xff'  # h
+    b'\xdf\xff\x9f\xdf\xdf\xdf\x8f\xff'  # i
+    b'\xef\xff\xcf\xef\xef\x6f\x9f\xff'  # j
+    b'\x7f\x7f\x6f\x5f\x3f\x5f\x6f\xff'  # k
+    b'\x9f\xdf\xdf\xdf\xdf\xdf\x8f\xff'  # l
+    b'\xff\xff\x2f\x57\x57\x77\x77\xff'  # m
+    b'\xff\xff\x4f\x37\x77\x77\x77\xff'  # n
+    b'\xff\xff\x8f\x77\x77\x77\x8f\xff'  # o
+    b'\xff\xff\x0f\x77\x0f\x7f\x7f\xff'  # p
+    b'\xff\xff\x97\x67\x87\xf7\xf7\xff'  # q
+    b'\xff\xff\x4f\x37\x7f\x7f\x7f\xff'  # r
+    b'\xff\xff\x8f\x7f\x8f\xf7\x0f\xff'  # s
+    b'\xbf\xbf\x1f\xbf\xbf\xb7\xcf\xff'  # t
+    b'\xff\xff\x77\x77\x77\x67\x97\xff'  # u
+    b'\xff\xff\x77\x77\x77\xaf\xdf\xff'  # v
+    b'\xff\xff\x77\x77\x57\x57\xaf\xff'  # w
+    b'\xff\xff\x77\xaf\xdf\xaf\x77\xff'  # x
+    b'\xff\xff\x77\x77\x87\xf7\x8f\xff'  # y
+    b'\xff\xff\x07\xef\xdf\xbf\x07\xff'  # z
+    b'\xef\xdf\xdf\xbf\xdf\xdf\xef\xff'  # {
+    b'\xdf\xdf\xdf\xdf\xdf\xdf\xdf\xff'  # |
+    b'\xbf\xdf\xdf\xef\xdf\xdf\xbf\xff'  # }
+    b'\xff\xff\xbf\x57\xef\xff\xff\xff'  # ~
+)
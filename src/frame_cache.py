@@ -0,0 +1,116 @@
+""" On-flash cache of the last displayed badge
+        by: Matt Hall
+        version: 0.1
+
+    Keeps the last image plane sent to the display (and its red plane, if any), along with the
+    badge record and its server validator (ETag), in a single file on the Pico's flash. After a
+    power cycle the badge can tell the driver what is already on the panel and send the validator
+    with its first poll, so an unchanged badge needs neither a download nor a refresh.
+
+    File layout (all integers big-endian):
+        2 bytes     magic, b'BC'
+        1 byte      format version (1)
+        1 byte      unused (0)
+        2 bytes     length N of the metadata
+        N bytes     metadata; UTF-8 JSON with the keys:
+                        'hash'      SHA-256 of the image plane (hex)
+                        'etag'      server validator for the badge record, or null
+                        'channel'   display channel the plane is shown on
+                        'red'       SHA-256 of the red plane (hex), or null if there is none
+                        'time'      when the cache was written (seconds since the epoch)
+                        'record'    the badge record, without 'userData.image' and 'imageRed'
+        ...         the raw image plane, then the raw red plane if there is one
+"""
+import uos
+import ujson
+import utime
+from ubinascii import hexlify
+
+try:
+    from uhashlib import sha256
+except ImportError:
+    from hashlib import sha256
+
+from badge_payload import read_into
+
+CACHE_PATH = './badge_cache.bin'
+
+MAGIC = b'BC'
+VERSION = 1
+
+
+def plane_hash(plane):
+    return hexlify(sha256(plane).digest()).decode()
+
+
+def strip_image(record):
+    """ Copy of a badge record without the (large) hex images """
+    record = dict(record)
+    if 'userData' in record:
+        record['userData'] = dict(record['userData'])
+        record['userData'].pop('image', None)
+        record['userData'].pop('imageRed', None)
+    return record
+
+
+def save(plane, record, etag, channel, red=None, path=CACHE_PATH):
+    """ Atomically write the cache: the new file is written in full beside the old one and then
+    renamed over it, so losing power part way through leaves the previous cache intact.
+    """
+    meta = ujson.dumps({
+        'hash': plane_hash(plane),
+        'etag': etag,
+        'channel': channel,
+        'red': None if red is None else plane_hash(red),
+        'time': utime.time(),
+        'record': strip_image(record),
+    }).encode()
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as cache:
+        cache.write(MAGIC + bytes([VERSION, 0, len(meta) >> 8, len(meta) & 0xff]))
+        cache.write(meta)
+        cache.write(plane)
+        if red is not None:
+            cache.write(red)
+
+    uos.rename(tmp_path, path)
+
+
+def load(plane, red, path=CACHE_PATH):
+    """ Read the cached image plane into the bytearray `plane` (and the red plane, if any, into
+    `red`) and return the cache metadata (see above), or None if there is no valid cache. The
+    planes may be overwritten even if invalid.
+    """
+    try:
+        with open(path, 'rb') as cache:
+            header = bytearray(6)
+            read_into(cache, header)
+            if header[0:2] != MAGIC or header[2] != VERSION:
+                return None
+
+            meta = bytearray((header[4] << 8) | header[5])
+            read_into(cache, meta)
+            read_into(cache, plane)
+
+            meta = ujson.loads(meta)
+            if meta.get('red'):
+                read_into(cache, red)
+
+    except (OSError, ValueError):
+        return None
+
+    # Don't trust a plane that doesn't match what was written
+    if meta.get('hash') != plane_hash(plane):
+        return None
+    if meta.get('red') and meta['red'] != plane_hash(red):
+        return None
+
+    return meta
+
+
+def clear(path=CACHE_PATH):
+    try:
+        uos.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,294 @@
+""" Persistent HTTP/1.1 client
+        by: Matt Hall
+        version: 0.1
+
+    urequests opens a new TCP connection for every request and closes it afterwards. This client
+    keeps one keep-alive connection to the server and sends each request over it, so a poll, or a
+    create followed by a fetch, doesn't pay for a new connection each time. If the connection has
+    gone (e.g. the server closed it while idle), it reconnects and sends the request again, but only
+    for idempotent methods such as GET: the server may have acted on a POST before the connection
+    went, and sending it again could repeat it. Nor is a request sent again after it timed out: the
+    server is there but not answering, and a second try would only hold up the badge for as long
+    again.
+
+    Response bodies are read straight from the socket, limited to the Content-Length (or decoded
+    from chunked transfer encoding), so that the connection is left at the start of the next
+    response. Close each response before making the next request.
+"""
+import ujson
+
+try:
+    import usocket as socket
+except ImportError:
+    import socket
+
+try:
+    import uerrno as errno
+except ImportError:
+    import errno
+
+# Socket timeout for connecting and reading (seconds)
+DEFAULT_TIMEOUT = 10
+
+# Methods that are safe to send again if the connection fails part way through
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# Size of the pieces a body of unknown length is read in (bytes)
+READ_CHUNK_SIZE = 256
+
+# What a socket raises on a timeout: OSError(ETIMEDOUT) on MicroPython, socket.timeout on CPython
+SOCKET_TIMEOUT = getattr(socket, 'timeout', ())
+
+
+def timed_out(err):
+    """ Whether an OSError from the socket was a timeout """
+    return isinstance(err, SOCKET_TIMEOUT) or err.args[:1] == (errno.ETIMEDOUT,)
+
+
+class BodyReader:
+    """ Reads a response body of `length` bytes from the connection, or until the server closes it
+    if `length` is None """
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.remaining = length
+
+    def readinto(self, buf):
+        if self.remaining is None:
+            return self.stream.readinto(buf) or 0
+        if self.remaining <= 0:
+            return 0
+
+        view = memoryview(buf)
+        if len(view) > self.remaining:
+            view = view[:self.remaining]
+
+        n = self.stream.readinto(view)
+        if not n:
+            raise EOFError('Connection closed mid-body')
+
+        self.remaining -= n
+        return n
+
+    def length(self):
+        """ Bytes left in the body, or None if not known """
+        return self.remaining
+
+    def read(self, size=-1):
+        """ Read up to `size` bytes, or the rest of the body """
+        length = self.length()
+        if length is not None:
+            # Read straight into a buffer of the right size
+            if 0 <= size < length:
+                length = size
+            body = bytearray(length)
+            view = memoryview(body)
+            got = 0
+            while got < length:
+                got += self.readinto(view[got:])
+            return body
+
+        # Otherwise read it in pieces and join them once at the end
+        pieces = []
+        got = 0
+        while size < 0 or got < size:
+            buf = bytearray(READ_CHUNK_SIZE if size < 0 else min(READ_CHUNK_SIZE, size - got))
+            n = self.readinto(buf)
+            if not n:
+                break
+            pieces.append(buf if n == len(buf) else buf[:n])
+            got += n
+        return b''.join(pieces)
+
+
+class ChunkedReader(BodyReader):
+    """ Reads a body sent with 'Transfer-Encoding: chunked' """
+    def __init__(self, stream):
+        super().__init__(stream, 0)
+        self.first = True
+        self.done = False
+
+    def length(self):
+        return None
+
+    def readinto(self, buf):
+        if self.remaining <= 0 and not self.done:
+            self.__next_chunk()
+        return super().readinto(buf)
+
+    def __next_chunk(self):
+        # Each chunk's data is followed by CRLF, before the next chunk's size line
+        if not self.first:
+            self.stream.readline()
+        self.first = False
+
+        self.remaining = int(self.stream.readline().split(b';')[0], 16)
+        if self.remaining == 0:
+            # Skip any trailers
+            while self.stream.readline() not in (b'\r\n', b''):
+                pass
+            self.done = True
+
+
+class Response:
+    def __init__(self, client, status_code, headers, raw, keep_alive):
+        self.client = client
+        self.status_code = status_code
+        self.headers = headers
+
+        # The body, as a stream with readinto()
+        self.raw = raw
+
+        self.__keep_alive = keep_alive
+        self.__content = None
+
+    @property
+    def content(self):
+        if self.__content is None:
+            self.__content = self.raw.read()
+        return self.__content
+
+    @property
+    def text(self):
+        return self.content.decode()
+
+    def json(self):
+        return ujson.loads(self.content)
+
+    def close(self):
+        """ Finish with the response, reading any unread body so the connection can be reused """
+        if self.raw is None:
+            return
+
+        try:
+            scratch = bytearray(64)
+            while self.raw.readinto(scratch):
+                pass
+        except (OSError, EOFError, ValueError):
+            # The connection is somewhere in the middle of the body (ValueError is a malformed
+            # chunk size), so it can't be used for the next request
+            self.__keep_alive = False
+
+        self.raw = None
+        if not self.__keep_alive:
+            self.client.close()
+
+
+class HttpClient:
+    def __init__(self, host, port=80, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+        self.__sock = None
+        self.__stream = None
+
+        # How many TCP connections have been opened, for seeing how well they're being reused
+        self.connections = 0
+
+    def close(self):
+        """ Close the connection; the next request opens a new one """
+        if self.__sock is not None:
+            try:
+                self.__sock.close()
+            except OSError:
+                pass
+        self.__sock = None
+        self.__stream = None
+
+    def __connect(self):
+        addr = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)[0][-1]
+        sock = socket.socket()
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(addr)
+        except OSError:
+            sock.close()
+            raise
+
+        self.__sock = sock
+        self.__stream = sock.makefile('rwb')
+        self.connections += 1
+
+    def __send(self, method, path, headers, body):
+        stream = self.__stream
+
+        request = f'{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n'
+        for key, value in headers.items():
+            request += f'{key}: {value}\r\n'
+        stream.write((request + '\r\n').encode())
+        if body:
+            stream.write(body)
+        if hasattr(stream, 'flush'):
+            stream.flush()
+
+        # Status line, e.g. 'HTTP/1.1 200 OK'; empty if the server has closed the connection
+        line = stream.readline()
+        if not line:
+            raise OSError('Connection closed by server')
+        return line
+
+    def request(self, method, path, headers=None, json=None, data=None):
+        """ Send a request over the kept-alive connection and return the Response """
+        headers = headers or {}
+        body = data or b''
+        if json is not None:
+            body = ujson.dumps(json).encode()
+            headers = dict(headers)
+            headers['Content-Type'] = 'application/json'
+        elif isinstance(body, str):
+            body = body.encode()
+
+        # The server may have dropped an idle connection; if so, reconnect and try once more,
+        # unless the request may already have been acted on or the server isn't answering
+        attempts = 2 if self.__sock is not None and method in IDEMPOTENT_METHODS else 1
+        while True:
+            attempts -= 1
+            try:
+                if self.__sock is None:
+                    self.__connect()
+                line = self.__send(method, path, headers, body)
+                return self.__read_response(method, line)
+            except OSError as err:
+                self.close()
+                if not attempts or timed_out(err):
+                    raise
+            except Exception:
+                self.close()
+                raise
+
+    def __read_response(self, method, line):
+        stream = self.__stream
+
+        version, status = line.split(None, 2)[:2]
+        status_code = int(status)
+
+        response_headers = {}
+        while True:
+            line = stream.readline()
+            if not line or line == b'\r\n':
+                break
+            key, value = line.decode().split(':', 1)
+            response_headers[key.strip()] = value.strip()
+
+        lowered = {key.lower(): value for key, value in response_headers.items()}
+        connection = lowered.get('connection', '').lower()
+        keep_alive = connection != 'close' and (version == b'HTTP/1.1' or connection == 'keep-alive')
+
+        if method == 'HEAD' or status_code in (204, 304) or 100 <= status_code < 200:
+            raw = BodyReader(stream, 0)
+        elif lowered.get('transfer-encoding', '').lower() == 'chunked':
+            raw = ChunkedReader(stream)
+        elif 'content-length' in lowered:
+            raw = BodyReader(stream, int(lowered['content-length']))
+        else:
+            # Body runs until the server closes the connection
+            raw = BodyReader(stream, None)
+            keep_alive = False
+
+        return Response(self, status_code, response_headers, raw, keep_alive)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
@@ -0,0 +1,136 @@
+""" Badge image decoder
+        by: Matt Hall
+        version: 0.1
+
+    Decodes the hex image payloads sent by the badgeman server straight into a preallocated frame
+    buffer. On the Pico the decode runs as a viper routine that walks the payload in place, so a
+    render doesn't leave thousands of short-lived strings and ints scattered across the heap.
+"""
+try:
+    from ubinascii import unhexlify
+except ImportError:
+    from binascii import unhexlify
+
+
+class ImageFormatError(ValueError):
+    """ Raised when an image payload is the wrong length or contains non-hex characters """
+    pass
+
+
+try:
+    import micropython
+
+    @micropython.viper
+    def _unhex_into(src, dst, n: int) -> int:
+        # Returns -1 on success, otherwise the offset of the first bad character in src
+        s = ptr8(src)
+        d = ptr8(dst)
+        i = 0
+        j = 0
+        while i < n:
+            c = s[j]
+            if c >= 48 and c <= 57:     # 0-9
+                hi = c - 48
+            elif c >= 97 and c <= 102:  # a-f
+                hi = c - 87
+            elif c >= 65 and c <= 70:   # A-F
+                hi = c - 55
+            else:
+                return j
+
+            c = s[j + 1]
+            if c >= 48 and c <= 57:
+                lo = c - 48
+            elif c >= 97 and c <= 102:
+                lo = c - 87
+            elif c >= 65 and c <= 70:
+                lo = c - 55
+            else:
+                return j + 1
+
+            d[i] = (hi << 4) | lo
+            i += 1
+            j += 2
+        return -1
+
+except (ImportError, AttributeError):
+    # No viper emitter (e.g. CPython on a host machine); fall back to a single unhexlify per frame
+    _unhex_into = None
+
+
+def decode_hex_image(image, frame):
+    """ Decode a contiguous hex string (or bytes) into the bytearray `frame`, where each pair of hex
+    characters becomes one byte of 8 pixels.
+
+    Raises ImageFormatError if the payload doesn't fill the frame exactly or isn't valid hex; the
+    contents of `frame` are undefined in that case.
+    """
+    n = len(frame)
+
+    if len(image) != 2 * n:
+        raise ImageFormatError('Expected {} hex characters, got {}'.format(2 * n, len(image)))
+
+    if _unhex_into is not None:
+        bad = _unhex_into(image, frame, n)
+        if bad >= 0:
+            raise ImageFormatError('Invalid hex character at offset {}'.format(bad))
+    else:
+        try:
+            frame[:] = unhexlify(image)
+        except ValueError:
+            raise ImageFormatError('Invalid hex character in image data')
+
+
+if __name__ == '__main__':
+    # Decoder benchmark: reports throughput and heap allocated per decoded frame
+    # Run on a host with `python3 src/image_decoder.py`, or on the Pico with `mpremote run`
+    import gc
+    try:
+        from utime import ticks_us, ticks_diff
+    except ImportError:
+        from time import perf_counter_ns
+
+        def ticks_us():
+            return perf_counter_ns() // 1000
+
+        def ticks_diff(a, b):
+            return a - b
+
+    try:
+        import tracemalloc
+    except ImportError:
+        tracemalloc = None
+
+    FRAME_SIZE = 128 * 296 // 8
+    RUNS = 20
+
+    frame = bytearray(FRAME_SIZE)
+    image = ''.join('{:02x}'.format((i * 37) & 0xff) for i in range(FRAME_SIZE))
+
+    # Warm up
+    decode_hex_image(image, frame)
+
+    gc.collect()
+    if tracemalloc:
+        tracemalloc.start()
+    else:
+        mem_before = gc.mem_free()
+
+    start = ticks_us()
+    for _ in range(RUNS):
+        decode_hex_image(image, frame)
+    elapsed = ticks_diff(ticks_us(), start)
+
+    if tracemalloc:
+        # CPython frees each temporary straight away, so the peak is what a single frame needed
+        allocated = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    else:
+        # MicroPython only reclaims on collection, so the total drop is spread across every run
+        allocated = (mem_before - gc.mem_free()) // RUNS
+
+    print('decoder: {}'.format('viper' if _unhex_into else 'unhexlify'))
+    print('frame size: {} B'.format(FRAME_SIZE))
+    print('time per frame: {} us'.format(elapsed // RUNS))
+    print('throughput: {} B/s'.format(FRAME_SIZE * RUNS * 1000000 // max(elapsed, 1)))
+    print('allocated per frame: {} B'.format(allocated))
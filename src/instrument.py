@@ -0,0 +1,161 @@
+""" Lightweight instrumentation
+        by: Matt Hall
+        version: 0.1
+
+    Named spans that time a piece of work (ticks_ms) and measure the heap it used (gc.mem_free),
+    recorded into a fixed-size ring buffer so a long-running badge keeps only the latest ones:
+
+        with instrument.span('decode'):
+            ...
+
+    Work timed elsewhere (e.g. a refresh that runs in the background) can be added with record().
+
+    While off (the default), span() hands back one shared do-nothing object, so leaving the spans in
+    costs a function call and no allocation. Turn it on by setting ENABLED below, or by calling
+    enable() before the spans of interest run. The buffer can then be printed over serial with
+    dump() or summary(), or sent to the server as records().
+"""
+from array import array
+from utime import ticks_ms, ticks_diff
+
+try:
+    from gc import mem_free
+except ImportError:
+    # Not available off the Pico (e.g. CPython); heap use reads as 0
+    def mem_free():
+        return 0
+
+# Toggle instrumentation
+ENABLED = False
+
+# Number of spans kept
+RING_SIZE = 64
+
+# Also print each span as it ends
+ECHO = False
+
+_names = None
+_starts = None
+_durations = None
+_mem = None
+_next = 0
+_count = 0
+
+
+def enable(size=RING_SIZE, echo=ECHO):
+    """ Start recording spans into a new ring buffer of `size` entries """
+    global ENABLED, ECHO, _names, _starts, _durations, _mem, _next, _count
+
+    _names = [None] * size
+    _starts = array('i', [0] * size)
+    _durations = array('i', [0] * size)
+    _mem = array('i', [0] * size)
+    _next = 0
+    _count = 0
+
+    ECHO = echo
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def record(name, duration_ms, mem_used=0, start=None):
+    """ Add a span that was timed elsewhere """
+    global _next, _count
+    if not ENABLED:
+        return
+
+    i = _next
+    _names[i] = name
+    _starts[i] = ticks_ms() - duration_ms if start is None else start
+    _durations[i] = duration_ms
+    _mem[i] = mem_used
+
+    _next = (i + 1) % len(_names)
+    if _count < len(_names):
+        _count += 1
+
+    if ECHO: print(f'[{name}] {duration_ms} ms, {mem_used} B')
+
+
+class _Span:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.mem = mem_free()
+        self.start = ticks_ms()
+        return self
+
+    def __exit__(self, *exc):
+        duration = ticks_diff(ticks_ms(), self.start)
+        record(self.name, duration, self.mem - mem_free(), self.start)
+        return False
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """ Context manager timing the work inside it as the span `name` """
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def records():
+    """ The recorded spans, oldest first, as dicts of name, start (ticks_ms), ms and mem (bytes) """
+    if _names is None:
+        return []
+
+    size = len(_names)
+    first = (_next - _count) % size
+    out = []
+    for n in range(_count):
+        i = (first + n) % size
+        out.append({'name': _names[i], 'start': _starts[i], 'ms': _durations[i], 'mem': _mem[i]})
+    return out
+
+
+def clear():
+    global _next, _count
+    _next = 0
+    _count = 0
+
+
+def dump():
+    """ Print the recorded spans, oldest first """
+    for r in records():
+        print(f'{r["start"]:>10} {r["name"]:<12} {r["ms"]:>7} ms {r["mem"]:>7} B')
+
+
+def summary():
+    """ Print the count, total and worst time and heap use of each span name """
+    totals = {}
+    for r in records():
+        t = totals.get(r['name'])
+        if t is None:
+            t = totals[r['name']] = [0, 0, 0, 0]
+        t[0] += 1
+        t[1] += r['ms']
+        t[2] = max(t[2], r['ms'])
+        t[3] = max(t[3], r['mem'])
+
+    print(f'{"span":<12}{"count":>7}{"total ms":>10}{"max ms":>8}{"max B":>8}')
+    for name, (count, total, worst, mem) in totals.items():
+        print(f'{name:<12}{count:>7}{total:>10}{worst:>8}{mem:>8}')
+
+
+if ENABLED:
+    enable()
@@ -0,0 +1,230 @@
+""" Badge layout compositor
+        by: Matt Hall
+        version: 0.1
+
+    Draws a badge from a layout sent by the server rather than from a full image, so changing a
+    name or a message costs a few hundred bytes instead of a 4.7 KB plane. The layout travels in
+    the badge record as 'userData.layout' and is drawn into the display's frame buffers with
+    framebuf; its text is filled in from the other userData fields.
+
+    A layout is a JSON object:
+        'ops'       the drawing operations, drawn in order onto a blank (white) badge:
+                        ['fill', colour]
+                        ['rect', x, y, w, h, colour, filled]
+                        ['text', x, y, text, colour, font, scale, align]
+                        ['icon', x, y, icon, colour]
+                    Everything after the colour is optional: 'filled' (0), 'font' ('default', the
+                    built-in font), 'scale' (1), 'align' (0: x is the left edge, 1: the centre, 2:
+                    the right edge) and the icon's colour (black). Text names userData fields in
+                    braces, as in str.format(), e.g. '{name} ({pronouns})'.
+        'fonts'     fonts by name, as hex assets or asset references (optional)
+        'icons'     icons by name, as hex assets or asset references (optional)
+
+    Colours are 0 (black), 1 (white) and 2 (red; drawn in black on the black and white panel).
+
+    Assets are bitmaps laid out like the display planes (rows of bytes, MSB first, bit set = white):
+        icon        b'I', width and height (2 bytes each, big-endian), then the rows
+        font        b'F', glyph width, glyph height, first character code and number of glyphs (1
+                    byte each), then each glyph's rows; characters without a glyph are drawn as '?'
+
+    An asset reference is 'sha256:' and the hash of the asset's bytes. The badge fetches the
+    assets it doesn't have yet from the server once and keeps them on flash (see asset_store.py),
+    so a logo or font shared by many layouts only crosses the network once. A layout is still drawn
+    if a referenced asset isn't there (e.g. it couldn't be fetched): text in a missing font is drawn
+    in the default font, and missing icons are left out.
+
+    The compositor only uses framebuf, so tools/render_layout.py can run it on the host (on the
+    simulated framebuf) and produce the same bytes as the badge, e.g. to check a layout.
+"""
+import framebuf
+from ubinascii import unhexlify
+
+import font
+
+# Display resolution
+WIDTH = 128
+HEIGHT = 296
+
+BLACK = 0
+WHITE = 1
+RED = 2
+
+ASSET_HEADER_SIZE = 5
+FONT_ASSET = ord('F')
+ICON_ASSET = ord('I')
+ASSET_REF_PREFIX = 'sha256:'
+
+# Maps the two pixel values of an icon the other way round when blitting (see Canvas.icon)
+_INVERT = framebuf.FrameBuffer(bytearray([0x80]), 2, 1, framebuf.MONO_HLSB)
+
+
+class LayoutError(ValueError):
+    """ Raised when a layout is malformed or refers to a missing font, icon or field """
+    pass
+
+
+def asset_refs(layout):
+    """ The hashes of the assets that `layout` refers to """
+    refs = []
+    for group in ('fonts', 'icons'):
+        for value in layout.get(group, {}).values():
+            if value.startswith(ASSET_REF_PREFIX):
+                refs.append(value[len(ASSET_REF_PREFIX):])
+    return refs
+
+
+def missing_asset(value, assets):
+    """ Whether `value` is a reference to an asset that isn't in the dict `assets` """
+    return value.startswith(ASSET_REF_PREFIX) and not (assets and value[len(ASSET_REF_PREFIX):] in assets)
+
+
+def load_asset(value, kind, assets):
+    """ Get an asset of the given kind (FONT_ASSET or ICON_ASSET) from its hex, or by reference
+    from the dict `assets` of hash to bytes, checking its size """
+    if value.startswith(ASSET_REF_PREFIX):
+        asset = assets.get(value[len(ASSET_REF_PREFIX):]) if assets else None
+        if asset is None:
+            raise LayoutError('Missing asset {}'.format(value))
+    else:
+        try:
+            asset = bytearray(unhexlify(value))
+        except (TypeError, ValueError):
+            raise LayoutError('Asset is not valid hex')
+
+    if len(asset) < ASSET_HEADER_SIZE or asset[0] != kind:
+        raise LayoutError('Not a {} asset'.format('font' if kind == FONT_ASSET else 'icon'))
+
+    if kind == FONT_ASSET:
+        size = ((asset[1] + 7) >> 3) * asset[2] * asset[4]
+    else:
+        size = (((asset[1] << 8 | asset[2]) + 7) >> 3) * (asset[3] << 8 | asset[4])
+
+    if len(asset) != ASSET_HEADER_SIZE + size:
+        raise LayoutError('Asset is {} bytes, expected {}'.format(len(asset), ASSET_HEADER_SIZE + size))
+
+    return asset
+
+
+class Canvas:
+    """ The black and red planes of the badge, drawn to in layout colours """
+    def __init__(self, frame, red_frame):
+        self.black = framebuf.FrameBuffer(frame, WIDTH, HEIGHT, framebuf.MONO_HLSB)
+        self.red = None if red_frame is None else framebuf.FrameBuffer(red_frame, WIDTH, HEIGHT, framebuf.MONO_HLSB)
+
+        # Whether anything has been drawn in red
+        self.used_red = False
+
+    def planes(self, colour):
+        """ The (plane, pixel value) pairs that make up a layout colour. Red shows over black on
+        the panel, so the red plane is cleared under black and white. Without a red plane, red is
+        drawn in black. """
+        if self.red is None:
+            if colour == WHITE:
+                return ((self.black, 1),)
+            if colour in (BLACK, RED):
+                return ((self.black, 0),)
+        elif colour == BLACK:
+            return ((self.black, 0), (self.red, 1))
+        elif colour == WHITE:
+            return ((self.black, 1), (self.red, 1))
+        elif colour == RED:
+            self.used_red = True
+            return ((self.black, 1), (self.red, 0))
+        raise LayoutError('Unknown colour {}'.format(colour))
+
+    def fill(self, colour):
+        for plane, c in self.planes(colour):
+            plane.fill(c)
+
+    def rect(self, x, y, w, h, colour, filled=0):
+        for plane, c in self.planes(colour):
+            plane.rect(x, y, w, h, c, bool(filled))
+
+    def text(self, x, y, text, colour, asset, scale=1, align=0):
+        width = asset[1]
+        height = asset[2]
+        first = asset[3]
+        count = asset[4]
+        row_bytes = (width + 7) >> 3
+        glyph_size = row_bytes * height
+        advance = width * scale
+
+        x -= len(text) * advance * align // 2
+
+        planes = self.planes(colour)
+        for char in text:
+            index = ord(char) - first
+            if not 0 <= index < count:
+                index = ord('?') - first
+                if not 0 <= index < count:
+                    x += advance
+                    continue
+
+            # Draw each clear (ink) pixel of the glyph as a scale x scale block
+            base = ASSET_HEADER_SIZE + index * glyph_size
+            for row in range(height):
+                offset = base + row * row_bytes
+                for col in range(width):
+                    if not asset[offset + (col >> 3)] & (0x80 >> (col & 7)):
+                        for plane, c in planes:
+                            plane.fill_rect(x + col * scale, y + row * scale, scale, scale, c)
+            x += advance
+
+    def icon(self, x, y, asset, colour=BLACK):
+        width = asset[1] << 8 | asset[2]
+        height = asset[3] << 8 | asset[4]
+        icon = framebuf.FrameBuffer(memoryview(asset)[ASSET_HEADER_SIZE:], width, height, framebuf.MONO_HLSB)
+
+        # Only the icon's clear (ink) pixels are drawn; the rest is transparent
+        for plane, c in self.planes(colour):
+            if c:
+                plane.blit(icon, x, y, 0, _INVERT)
+            else:
+                plane.blit(icon, x, y, 1)
+
+
+def render(layout, frame, red_frame, fields, assets=None):
+    """ Draw `layout` into the black plane `frame` and the red plane `red_frame` (or, for a panel
+    without a red plane, None to draw red in black), filling in its text from the dict `fields`
+    (the badge's userData) and taking the assets it refers to from the dict `assets` (hash:
+    bytearray), drawing without any that are missing. Returns whether anything was drawn in the
+    red plane.
+
+    Raises LayoutError if the layout can't be drawn; the planes may have been drawn to already.
+    """
+    canvas = Canvas(frame, red_frame)
+    canvas.fill(WHITE)
+
+    fonts = {'default': font.DEFAULT}
+    for name, value in layout.get('fonts', {}).items():
+        fonts[name] = font.DEFAULT if missing_asset(value, assets) else load_asset(value, FONT_ASSET, assets)
+    icons = {}
+    for name, value in layout.get('icons', {}).items():
+        icons[name] = None if missing_asset(value, assets) else load_asset(value, ICON_ASSET, assets)
+
+    for op in layout['ops']:
+        kind = op[0]
+        try:
+            if kind == 'fill':
+                canvas.fill(op[1])
+            elif kind == 'rect':
+                canvas.rect(*op[1:])
+            elif kind == 'text':
+                font_name = op[5] if len(op) > 5 else 'default'
+                text = op[3].format(**fields)
+                canvas.text(op[1], op[2], text, op[4], fonts[font_name], *op[6:])
+            elif kind == 'icon':
+                icon = icons[op[3]]
+                if icon is not None:
+                    canvas.icon(op[1], op[2], icon, *op[4:])
+            else:
+                raise LayoutError('Unknown layout operation {}'.format(kind))
+
+        except LayoutError:
+            raise
+        except KeyError as err:
+            raise LayoutError('Layout operation {} refers to a missing font, icon or field {}'.format(kind, err))
+        except (IndexError, TypeError, ValueError) as err:
+            raise LayoutError('Bad layout operation {}: {}'.format(op, err))
+
+    return canvas.used_red
@@ -5,20 +5,38 @@
 
     This requires that the MicroPython binaries are loaded onto the Pico already.
 
+    The badge runs as a set of uasyncio tasks: Wi-Fi supervision, polling the server, listening for
+    pushed updates, waiting on panel refreshes and driving the status LED. A refresh that takes
+    several seconds therefore doesn't hold up reconnecting or the next poll: a poll only waits for
+    a refresh that is still running once it has something new to draw.
+
+    Polls go over a blocking keep-alive connection (see http_client.py), so while a poll is in
+    progress the other tasks wait for it: normally a few tens of ms on the local network, but up
+    to HTTP_TIMEOUT for each request if the server stops answering.
+
         by: Matt Hall
-        version: 0.2
+        version: 0.3
 
 """
-from machine import Pin, Timer
+from machine import Pin, Timer, lightsleep, deepsleep
 import network
-import time
 import rp2
-import ujson
+import uasyncio as asyncio
 import ubinascii
-import urequests as req
-
-# Import whatever driver file is present
-from display_driver_BWR import DisplayDriver
+from utime import ticks_ms, ticks_diff
+
+import panel
+from badge_payload import BINARY_CONTENT_TYPE, read_header, skip
+import badge_watch
+import poll_schedule
+import duty_cycle
+import packbits
+import frame_cache
+import wifi
+import http_client
+import layout
+import asset_store
+import instrument
 
 # Toggle print debugging
 DEBUG = False
@@ -29,196 +47,667 @@ WLAN_PW = 'ihatecomputers'
 WLAN_SUBNET = '192.168.69'
 WLAN_SERVER_IP = '1'
 WLAN_SERVER_PORT = '3000'
-WLAN_SERVER_URL = WLAN_SUBNET + '.' + WLAN_SERVER_IP + ':' + WLAN_SERVER_PORT
-
-REQUEST_HEADER = { "Content-Type": "application/json" }
+WLAN_SERVER_HOST = WLAN_SUBNET + '.' + WLAN_SERVER_IP
+
+# Socket timeout for requests to the server (seconds); also the longest a poll can hold up the other
+# tasks for each request while the server isn't answering (a request that times out isn't sent
+# again, see http_client.py)
+HTTP_TIMEOUT = 10
+
+# Fixed address for this badge within WLAN_SUBNET (e.g. '42'), skipping DHCP entirely; None to use DHCP
+WLAN_STATIC_IP = None
+WLAN_NETMASK = '255.255.255.0'
+WLAN_GATEWAY_IP = '1'
+
+# When using DHCP, reuse the address we were given on reconnects instead of asking again, for up to
+# WLAN_LEASE_TIME seconds after it was given. The lease is never renewed, so this must be shorter
+# than the DHCP server's lease time, or the address may be given to another device.
+WLAN_REUSE_LEASE = False
+WLAN_LEASE_TIME = 1800
+
+# Ask for the binary badge format, compressed if possible; servers that don't support it just send JSON
+POLL_HEADER = {
+    "Content-Type": "application/json",
+    "Accept": BINARY_CONTENT_TYPE + ", application/json",
+    "Accept-Encoding": packbits.CONTENT_ENCODING
+}
 
 DISPLAY_DATA_CACHE = {}
 
-EVENT_LOOP_SLEEP_TIME = 20
+# Validator (ETag) of the cached badge data; sent back so the server can reply 304 Not Modified
+DISPLAY_DATA_ETAG = None
+
+# Poll interval (seconds): the minimum right after a change, backing off by the given factor while
+# nothing changes or the server is failing, up to the maximum; each wait is jittered by up to
+# +/- POLL_JITTER of itself
+POLL_MIN_INTERVAL = 10
+POLL_MAX_INTERVAL = 120
+POLL_BACKOFF_FACTOR = 1.5
+POLL_JITTER = 0.2
+
+# Server push: how long each long-poll is held open, the (much longer) safety-net poll interval while
+# push is working, and how long to wait before trying push again after it fails (seconds)
+PUSH_WATCH_TIMEOUT = 60
+PUSH_POLL_SLEEP_TIME = 300
+PUSH_RETRY_TIME = 30
+PUSH_UNSUPPORTED_RETRY_TIME = 600
+
+# Low-power mode: instead of the always-on event loop (and server push), power the panel and radio
+# down and sleep the Pico between polls. None (off), 'light' (machine.lightsleep) or 'deep'
+# (machine.deepsleep, which resets the Pico on waking so it starts again from the flash cache)
+LOW_POWER_MODE = None
+
+# How long to wait for each WLAN connection attempt, e.g. after waking in low-power mode (ms)
+WLAN_CONNECT_TIMEOUT_MS = 10000
+
+# How often the Wi-Fi supervisor checks the connection (seconds)
+WLAN_CHECK_INTERVAL = 1
+
+# Record timings of connecting, polling, decoding, drawing layouts, uploading, refreshing and
+# sleeping (see src/instrument.py; print them over serial with instrument.dump() or
+# instrument.summary()), and whether to send them to the server after each poll
+INSTRUMENT = False
+INSTRUMENT_REPORT = False
+
+# Most flash to use for the fonts and icons that layouts refer to (bytes); the least recently used
+# are dropped to make room
+ASSET_BUDGET = 64 * 1024
+
+# Which display hat is attached: 'BW' or 'BWR'. With DETECT_PANEL, the hat is detected at startup
+# and this is only used if detection can't tell (e.g. the hat isn't answering)
+DISPLAY_PANEL = 'BWR'
+DETECT_PANEL = True
 
 # Control onboard LED as a status indicator
 led = Pin('LED', Pin.OUT)
 led_timer = Timer()
 
+# LED blink frequency (Hz) for each badge status; 0 means solid on
+LED_STATUS_FREQ = {
+    'init': 1,      # starting up or (re)connecting
+    'busy': 10,     # updating the display
+    'idle': 0.5,    # waiting for the next poll
+    'error': 0,     # last poll or refresh failed
+}
+
+led_status = 'init'
+led_status_changed = asyncio.Event()
+
+# Set once connected to WLAN, cleared when the connection drops
+wlan_connected = asyncio.Event()
+
+# Set to poll the server straight away instead of waiting out the sleep
+poll_now = asyncio.Event()
+
+# Set whenever a panel refresh has been started in the background
+refresh_started = asyncio.Event()
+
+# Whether the server push channel is currently up
+push_active = False
+
 def blink_led(_timer):
     global led
     led.toggle()
 
-def connect_to_wifi():
-    if DEBUG: print('* Connecting to WLAN...')
+def set_status(status):
+    global led_status
+    led_status = status
+    led_status_changed.set()
 
-    # Try to establish connection
-    wlan.connect(WLAN_SSID, WLAN_PW)
+def request_poll():
+    """ Poll the server now rather than at the end of the sleep. Safe to call from an IRQ handler
+    through micropython.schedule. """
+    poll_now.set()
 
-    # We don't want to ever stop trying to connect for resiliency
-    while wlan.status() != 3:
-        if DEBUG: print('  ...' + str(wlan.status()))
-        time.sleep(1)
+async def connect_to_wifi():
+    # We don't want to ever stop trying to connect for resiliency (each attempt is recorded by
+    # wifi_link, see wifi.py)
+    while not await wifi_link.connect_async(WLAN_CONNECT_TIMEOUT_MS):
+        await asyncio.sleep(1)
 
     # Log local IP address
     if DEBUG: print(f'    Connected to \'{WLAN_SSID}\' with address {wlan.ifconfig()[0]}')
 
-def load_data_cache():
+def get_header(response, name):
+    """ Case-insensitive lookup of a response header, or None if absent """
+    headers = getattr(response, 'headers', None) or {}
+    name = name.lower()
+    for key in headers:
+        if key.lower() == name:
+            return headers[key]
+    return None
+
+def poll_headers():
+    """ Request headers for polling, including the validator of the cached data (if any) """
+    if DISPLAY_DATA_ETAG is None:
+        return POLL_HEADER
+
+    headers = dict(POLL_HEADER)
+    headers['If-None-Match'] = DISPLAY_DATA_ETAG
+    return headers
+
+def refresh_mode():
+    """ The refresh mode (see panel.py) to ask the panel for, from what it can do, or None to let
+    the driver pick one for each update by how much changes """
+    capabilities = badge.CAPABILITIES
+    if not (capabilities.partial_refresh or capabilities.fast_lut):
+        # Only a full refresh to choose from
+        return panel.FULL
+
+    if LOW_POWER_MODE == 'deep' and capabilities.fast_lut:
+        # Each wake from deep sleep starts the badge afresh, so the driver doesn't know what is in
+        # the controller's RAM and can't do a partial refresh; a fast refresh redraws the whole
+        # panel in about half the time of a full one, so the badge is awake for less
+        return panel.FAST
+
+    return None
+
+async def wait_for_panel():
+    """ Let a background refresh finish before anything more is sent to the panel, which would
+    otherwise block the event loop until the refresh has finished """
+    if not badge.refresh_pending():
+        return
+
     try:
-        with open('./cache.json', 'r') as cache:
-            if DEBUG: print('* Found badge data cache file. Loading...')
-            ujson.loads(DISPLAY_DATA_CACHE, cache)
+        await badge.wait_async()
+    except Exception as err:
+        if DEBUG: print(f'    ERROR: Display refresh failed:\n    {err}')
+
+async def render_badge(image=None, stream=None, red_image=None, planes=1, user_data=None):
+    """ Draw the badge image, given either as hex strings (black, and optionally red), as a
+    stream to read `planes` raw planes from, or as the userData of a record with a layout to draw
+    on the badge itself (see layout.py). Only refreshes the panel when the pixels have changed.
+    Both planes go out with a single refresh, which carries on in the background (see
+    refresh_task). On a panel with a single plane, red is drawn in black, and layouts don't draw a
+    red plane at all. Waits for any refresh still running in the background first.
+
+    Returns False if a layout was drawn without some of its assets (see load_assets()), or True.
+    """
+    complete = True
+
+    # Blink LED fast to show activity
+    set_status('busy')
+
+    if user_data is not None:
+        layout_data = user_data['layout']
+        assets = load_assets(layout_data)
+        complete = all(key in assets for key in layout.asset_refs(layout_data))
+
+    await wait_for_panel()
+
+    mode = refresh_mode()
+    if stream is not None:
+        updated = badge.display_stream(stream, planes=planes, mode=mode)
+    elif user_data is not None:
+        red_frame = badge.red_frame if badge.CAPABILITIES.planes > 1 else None
+        with instrument.span('compose'):
+            red = layout.render(layout_data, badge.frame, red_frame, user_data, assets)
+        updated = badge.display_frame(red=red, mode=mode)
+    else:
+        updated = badge.display(image, red_image=red_image, mode=mode)
+
+    if updated:
+        refresh_started.set()
+
+    return complete
+
+def load_assets(layout_data):
+    """ Get the assets that a layout refers to from flash, only downloading those that aren't
+    there yet. Returns them as a dict of hash: bytearray, without any that couldn't be fetched or
+    didn't match their hash, which the layout is then drawn without. """
+    assets = {}
+    for key in layout.asset_refs(layout_data):
+        data = asset_cache.get(key)
+        if data is None:
+            with instrument.span('asset'):
+                response = server.get(ASSET_PATH + key)
+                try:
+                    if response.status_code == 200:
+                        data = bytearray(response.content)
+                    else:
+                        if DEBUG: print(f'    ERROR: Could not fetch asset {key}. API returned status {response.status_code}')
+                finally:
+                    response.close()
+
+            if data is None:
+                continue
+
+            try:
+                asset_cache.put(key, data)
+            except asset_store.AssetError as err:
+                # Not the asset the layout refers to, so don't draw it
+                if DEBUG: print(f'    ERROR: {err}')
+                continue
+            except OSError as err:
+                # Still drawn this time, just fetched again next time
+                if DEBUG: print(f'    ERROR: Could not save asset: {err}')
+
+        assets[key] = data
 
-    except:
-        if DEBUG: print('    Error loading cache file (may not exist)')
+    try:
+        asset_cache.flush()
+    except OSError as err:
+        if DEBUG: print(f'    ERROR: Could not save asset index: {err}')
+
+    return assets
+
+async def receive_badge(response):
+    """ Read a badge record from a 200 response in either format, display it if it has changed and
+    update the data cache. Returns whether anything changed. """
+    content_type = get_header(response, 'Content-Type') or ''
+    complete = True
+
+    if content_type.startswith(BINARY_CONTENT_TYPE):
+        # Decompress on the fly if the server compressed the payload
+        stream = response.raw
+        if get_header(response, 'Content-Encoding') == packbits.CONTENT_ENCODING:
+            stream = packbits.PackBitsReader(stream)
+
+        # The record has no image; the planes (black, then red if there is one) are streamed from
+        # the socket to the display as they arrive
+        with instrument.span('parse'):
+            badge_data, plane_count = read_header(stream)
+        await render_badge(stream=stream, planes=min(plane_count, 2))
+
+        # Drain any planes we don't know how to display
+        if plane_count > 2:
+            skip(stream, (plane_count - 2) * len(badge.frame), bytearray(64))
+
+    else:
+        with instrument.span('parse'):
+            badge_data = response.json()
+
+        # Only change things when the server data has changed
+        if badge_data != DISPLAY_DATA_CACHE:
+            if DEBUG: print('    Display data cache out of date. Refreshing...')
+
+            # Display badge info (skipped by the driver if only metadata changed)
+            user_data = badge_data['userData']
+            if user_data.get('layout'):
+                # Finish with the response first, as any missing assets are fetched over the
+                # same connection
+                response.close()
+                complete = await render_badge(user_data=user_data)
+            else:
+                await render_badge(user_data['image'], red_image=user_data.get('imageRed'))
+        else:
+            if DEBUG: print('    No change in badge data.')
 
-def save_data_cache(new_data):   
-    # Update local var
-    DISPLAY_DATA_CACHE = new_data
-    
-    # TODO: fix cache saving to file
-    return
-    
-    print("saving cache")
-    print(DISPLAY_DATA_CACHE)
+    # Update data cache (only written to flash when something changed). A layout drawn without
+    # some of its assets isn't cached, so the next poll draws it again and fetches them again.
+    etag = get_header(response, 'ETag')
+    changed = badge_data != DISPLAY_DATA_CACHE or etag != DISPLAY_DATA_ETAG
+    if changed and complete:
+        save_data_cache(badge_data, etag)
 
-    # Save to cache file
-    with open('./cache.json', 'w') as cache:
-        ujson.dump(DISPLAY_DATA_CACHE, cache)
+    return changed
 
-# ---------------------------------------
-# Begin initialisation
-if DEBUG: print('*** badgeboy for the Raspberry Pi Pico W ***')
+def load_data_cache():
+    """ Restore the last displayed badge from flash, so that an unchanged badge isn't downloaded or
+    redrawn after a power cycle """
+    global DISPLAY_DATA_CACHE, DISPLAY_DATA_ETAG
 
-# Blink LED slowly during init
-led_timer.init(freq=1, mode=Timer.PERIODIC, callback=blink_led)
+    cache = frame_cache.load(badge.frame, badge.red_frame)
+    if cache is None:
+        if DEBUG: print('    No valid badge data cache found')
+        return
 
-# Set device country to GB so that the wireless radio
-# uses UK-approved network channels
-rp2.country('GB')
+    if DEBUG: print('* Found badge data cache file. Loading...')
 
-# Connect to WLAN as a client rather than a host
-wlan = network.WLAN(network.STA_IF)
-wlan.active(True)
+    # The panel keeps its image without power, so it still shows the cached planes
+    badge.restore_shown(cache['channel'], bool(cache.get('red')))
 
-# Disable wireless radio power saving, if needed
-# wlan.config(pm=0xa11140)
+    DISPLAY_DATA_CACHE = cache['record']
+    DISPLAY_DATA_ETAG = cache['etag']
 
-# Get our MAC address
-MAC = ubinascii.hexlify(
-    network.WLAN().config('mac')
-).decode().upper()
+def save_data_cache(new_data, etag):
+    """ Update the data cache and save it, with the plane now on the display, to flash """
+    global DISPLAY_DATA_CACHE, DISPLAY_DATA_ETAG
 
-# Log MAC
-if DEBUG: print(f"* This device's MAC address is {MAC}")
+    DISPLAY_DATA_CACHE = new_data
+    DISPLAY_DATA_ETAG = etag
 
-# Connect to network (WARNING: will infinite loop until connected)
-connect_to_wifi()
+    try:
+        red = badge.red_frame if badge.shows_red() else None
+        frame_cache.save(badge.frame, new_data, etag, badge.shown_channel(), red)
+    except OSError as err:
+        if DEBUG: print(f'    ERROR: Could not save badge data cache: {err}')
 
-# Create and init display unit
-if DEBUG: print(f'* Initialising display...')
-badge = DisplayDriver()
+def report_metrics():
+    """ Send the recorded spans to the server, then start recording afresh """
+    if not (INSTRUMENT_REPORT and instrument.ENABLED):
+        return
 
-# Try to load badge data cache
-load_data_cache()
+    try:
+        response = server.post(BADGE_PATH + '/metrics', json={'spans': instrument.records()})
+        response.close()
+        instrument.clear()
+    except Exception as err:
+        if DEBUG: print(f'    ERROR: Could not report metrics:\n    {err}')
 
-# ---------------------------------------
-# Begin event loop
+async def poll_server():
+    """ Poll the server once for changes to this badge's data, creating its record if needed.
+    Returns the result for the poll scheduler. """
+    result = poll_schedule.FAILED
 
-while True:
-    try:
-        if DEBUG: print('* Polling API...')
+    # Poll DB for changes (over the kept-alive connection)
+    with instrument.span('poll'):
+        poll_request = server.get(BADGE_PATH, headers=poll_headers())
 
-        # Poll DB for changes
-        poll_request = req.get(
-            f'http://{WLAN_SERVER_URL}/api/badges/by-mac/{MAC}',
-            headers=REQUEST_HEADER
-        )
+    try:
+        # If unchanged since last poll (no body to read)
+        if poll_request.status_code == 304:
+            if DEBUG: print('    No change in badge data (not modified).')
+            result = poll_schedule.UNCHANGED
 
         # If found in DB
-        if poll_request.status_code == 200:
+        elif poll_request.status_code == 200:
             if DEBUG: print('    Badge exists in DB')
-            badge_data = poll_request.json()
-
-            # Only change things when the server data has changed
-            if badge_data != DISPLAY_DATA_CACHE:
-                if DEBUG: print('    Display data cache out of date. Refreshing...')
-
-                # Blink LED fast to show activity
-                led_timer.init(freq=10, mode=Timer.PERIODIC, callback=blink_led)
-
-                # Update data cache
-                DISPLAY_DATA_CACHE = badge_data
-                
-                if DEBUG: print('    Starting image render...')
-                
-                # Display badge info
-                badge.display(badge_data['userData']['image'])
-            else:
-                if DEBUG: print('    No change in badge data.')
+            result = poll_schedule.CHANGED if await receive_badge(poll_request) else poll_schedule.UNCHANGED
 
         # If not found in DB
         elif poll_request.status_code == 404:
+            # Finish with the poll response so the connection is free for the next request
+            poll_request.close()
+
             if DEBUG: print('    Badge not found!\n      Inserting blank DB record...')
-            
+
             # Blink LED fast to show activity
-            led_timer.init(freq=10, mode=Timer.PERIODIC, callback=blink_led)
+            set_status('busy')
+
+            # Insert blank DB record; the server answers with the new record
+            create_badge_request = server.post(BADGE_PATH, headers=POLL_HEADER)
+
+            try:
+                # If successful
+                if create_badge_request.status_code == 201:
+                    if DEBUG: print(f'      Successfully created new DB record.')
+
+                    if get_header(create_badge_request, 'Content-Length') == '0':
+                        # Older servers don't send the record back, so fetch it
+                        if DEBUG: print(f'      Retrieving image from server...')
+                        create_badge_request.close()
+                        create_badge_request = server.get(BADGE_PATH, headers=POLL_HEADER)
+
+                    if create_badge_request.status_code in (200, 201):
+                        if DEBUG: print('      Pushing image to display module...')
+
+                        # Display instructions
+                        await receive_badge(create_badge_request)
+                        result = poll_schedule.CHANGED
+                    else:
+                        if DEBUG: print(f'      ERROR: Could not get badge image from server. API returned status {create_badge_request.status_code}')
+                else:
+                    if DEBUG: print(f'      ERROR: Could not create new badge record in DB. API returned status {create_badge_request.status_code}')
 
-            # Insert blank DB record
-            create_badge_request = req.post(
-                f'http://{WLAN_SERVER_URL}/api/badges/by-mac/{MAC}',
-                headers=REQUEST_HEADER
-            )
+            finally:
+                create_badge_request.close()
 
-            # If successful
-            if create_badge_request.status_code == 201:
-                if DEBUG: print(f'      Successfully created new DB record.')
-                if DEBUG: print(f'      Retrieving image from server...')
+        else:
+            if DEBUG: print(f'    ERROR: DB poll failed. API returned status {poll_request.status_code}')
 
-                # Get image from server
-                img_request = req.get(
-                    f'http://{WLAN_SERVER_URL}/api/badges/by-mac/{MAC}',
-                    headers=REQUEST_HEADER
-                )
+    finally:
+        # Read off anything left of the response, keeping the connection for the next poll
+        poll_request.close()
 
-                if img_request.status_code == 200:
-                    if DEBUG: print('      Pushing image to display module...')
+    return result
 
-                    # Update data cache
-                    DISPLAY_DATA_CACHE = img_request.json()
+# ---------------------------------------
+# Tasks
+
+async def wlan_task():
+    """ Keep the WLAN connection up, reconnecting whenever it drops """
+    while True:
+        if wlan.status() != 3:
+            wlan_connected.clear()
+            set_status('init')
+
+            if wlan.status() < 0 or wlan.status() > 3:
+                if DEBUG: print('* Network connection was lost. Attempting reconnect...')
+                wlan.disconnect()
+
+            # Any kept-alive connection to the server went with the network
+            server.close()
+
+            await connect_to_wifi()   # WARNING: will continue forever until reconnected
+            wlan_connected.set()
+
+        await asyncio.sleep(WLAN_CHECK_INTERVAL)
+
+async def poll_task():
+    """ Poll the server on an adaptive schedule, or sooner if asked to """
+    scheduler = poll_schedule.PollScheduler(
+        MAC, POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_BACKOFF_FACTOR, POLL_JITTER
+    )
+
+    # Spread out the first polls of badges that were powered on together
+    await asyncio.sleep(scheduler.initial_delay())
+
+    while True:
+        await wlan_connected.wait()
+
+        # A refresh still running in the background is only waited for if the poll brings
+        # something new to draw (see render_badge())
+        try:
+            result = await poll_server()
+        except Exception as err:
+            if DEBUG: print(f'    ERROR: Could not complete network request:\n    {err}')
+            result = poll_schedule.FAILED
+
+        scheduler.record(result)
+        report_metrics()
+
+        if result == poll_schedule.FAILED:
+            # LED on solid when errored
+            set_status('error')
+        elif not badge.refresh_pending():
+            set_status('idle')
+
+        # With push working, polling is only a safety net
+        if push_active:
+            sleep_time = scheduler.jittered(PUSH_POLL_SLEEP_TIME)
+        else:
+            sleep_time = scheduler.next_delay()
+
+        # Sleep until the next poll is due or one is requested
+        with instrument.span('sleep'):
+            try:
+                await asyncio.wait_for(poll_now.wait(), sleep_time)
+            except asyncio.TimeoutError:
+                pass
+        poll_now.clear()
+
+async def push_task():
+    """ Hold a long-poll open to the server and poll as soon as it signals a change, falling back
+    to regular polling whenever the push channel is down """
+    global push_active
+
+    version = None
+    while True:
+        await wlan_connected.wait()
+
+        try:
+            new_version = await badge_watch.watch(
+                WLAN_SERVER_HOST, int(WLAN_SERVER_PORT), MAC, version, PUSH_WATCH_TIMEOUT
+            )
 
-                    # Display instructions
-                    badge.display(img_request.json()['userData']['image'])
-                else:
-                    if DEBUG: print(f'      ERROR: Could not get badge image from server. API returned status {img_request.status_code}')
+        except badge_watch.WatchUnsupportedError:
+            if DEBUG: print('* Server push not supported; polling instead')
+            push_active = False
+            await asyncio.sleep(PUSH_UNSUPPORTED_RETRY_TIME)
 
-                img_request.close()
-            else:
-                if DEBUG: print(f'      ERROR: Could not create new badge record in DB. API returned status {create_badge_request.status_code}')
-            
-            # Finally, close socket
-            create_badge_request.close()
+        except Exception as err:
+            if DEBUG: print(f'* Server push connection lost; polling instead:\n    {err}')
+            if push_active:
+                # Catch up on anything missed, and go back to the short poll interval
+                push_active = False
+                request_poll()
+            version = None
+            await asyncio.sleep(PUSH_RETRY_TIME)
 
         else:
-            if DEBUG: print(f'    ERROR: DB poll failed. API returned status {poll_request.status_code}')
-            
-        # Clean up connection
-        poll_request.close()
-    
+            if not push_active:
+                if DEBUG: print('* Server push connected')
+                push_active = True
+
+            # The first watch just fetches the current version
+            if new_version is not None and version is not None:
+                request_poll()
+            if new_version is not None:
+                version = new_version
+
+async def refresh_task():
+    """ Wait for background panel refreshes to finish without blocking the other tasks """
+    while True:
+        await refresh_started.wait()
+        refresh_started.clear()
+
+        try:
+            await badge.wait_async()
+        except Exception as err:
+            if DEBUG: print(f'    ERROR: Display refresh failed:\n    {err}')
+            set_status('error')
+        else:
+            set_status('idle')
+
+async def led_task():
+    """ Show the badge status on the onboard LED """
+    while True:
+        freq = LED_STATUS_FREQ[led_status]
+        if freq:
+            led_timer.init(freq=freq, mode=Timer.PERIODIC, callback=blink_led)
+        else:
+            led_timer.deinit()
+            led.on()
+
+        await led_status_changed.wait()
+        led_status_changed.clear()
+
+# ---------------------------------------
+# Low-power mode
+
+def wake_wifi():
+    """ Bring the WLAN connection back up after sleeping; returns whether it connected in time """
+    led.on()
+
+    if not wifi_link.connect(WLAN_CONNECT_TIMEOUT_MS):
+        if DEBUG: print(f'    ERROR: Could not connect to WLAN (status {wlan.status()})')
+        return False
+
+    return True
+
+def poll_once():
+    """ Poll the server, drawing any change; returns the result for the poll scheduler """
+    try:
+        # Refreshes block in low-power mode, so the panel is never waited on here
+        result = asyncio.run(poll_server())
     except Exception as err:
         if DEBUG: print(f'    ERROR: Could not complete network request:\n    {err}')
-        
-        # LED on solid when errored
-        led_timer.init(freq=0, mode=Timer.PERIODIC, callback=blink_led)
-
-        #  Check if network was to blame
-        if wlan.status() < 0 or wlan.status() > 3:
-            if DEBUG: print('      REASON: Network connection was lost. Attempting reconnect...')
-            wlan.disconnect()
-            connect_to_wifi()   # WARNING: will continue forever until reconnected
-
-    if DEBUG: print(f'* Event loop complete. Sleeping for {EVENT_LOOP_SLEEP_TIME} seconds...')
-    
-    # Blink LED slowly when sleeping
-    led_timer.init(freq=0.5, mode=Timer.PERIODIC, callback=blink_led)
-    
-    time.sleep(EVENT_LOOP_SLEEP_TIME)
-    
+        return poll_schedule.FAILED
+
+    report_metrics()
+    return result
+
+def power_down():
+    """ Put the panel and radio into their lowest power states before sleeping """
+    badge.sleep()
+
+    server.close()
+    wlan.disconnect()
+    wlan.active(False)
+
+    led.off()
+
+def run_low_power():
+    scheduler = poll_schedule.PollScheduler(
+        MAC, POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_BACKOFF_FACTOR, POLL_JITTER
+    )
+    deep = LOW_POWER_MODE == 'deep'
+    machine_sleep = deepsleep if deep else lightsleep
+
+    # Waking from deep sleep starts main.py again, so carry on with the backoff and jitter from
+    # before the sleep rather than starting over at the minimum interval
+    if deep:
+        scheduler.load()
+
+    def sleep(ms):
+        if deep:
+            scheduler.save()
+        with instrument.span('sleep'):
+            machine_sleep(ms)
+
+    duty_cycle.DutyCycle(
+        scheduler, wake_wifi, poll_once, power_down, sleep, ticks_ms, ticks_diff
+    ).run()
+
+# ---------------------------------------
+# Always-on mode
+
+async def main():
+    asyncio.create_task(led_task())
+    asyncio.create_task(wlan_task())
+    asyncio.create_task(refresh_task())
+    asyncio.create_task(push_task())
+    await poll_task()
+
 # ---------------------------------------
-# End event loop
+# Begin initialisation
+if DEBUG: print('*** badgeboy for the Raspberry Pi Pico W ***')
+
+# Set device country to GB so that the wireless radio
+# uses UK-approved network channels
+rp2.country('GB')
+
+# Connect to WLAN as a client rather than a host
+wlan = network.WLAN(network.STA_IF)
+wlan.active(True)
+
+# Disable wireless radio power saving, if needed
+# wlan.config(pm=0xa11140)
+
+# Remembers the access point and address between connections so reconnects are quick
+wifi_link = wifi.WifiConnector(
+    wlan, WLAN_SSID, WLAN_PW,
+    static_ip=WLAN_STATIC_IP and (
+        WLAN_SUBNET + '.' + WLAN_STATIC_IP,
+        WLAN_NETMASK,
+        WLAN_SUBNET + '.' + WLAN_GATEWAY_IP,
+        WLAN_SUBNET + '.' + WLAN_GATEWAY_IP
+    ),
+    reuse_lease=WLAN_REUSE_LEASE,
+    lease_time=WLAN_LEASE_TIME
+)
+
+# Get our MAC address
+MAC = ubinascii.hexlify(
+    network.WLAN().config('mac')
+).decode().upper()
+
+# Log MAC
+if DEBUG: print(f"* This device's MAC address is {MAC}")
+
+# This badge's record on the server, and the connection kept open to it between requests
+BADGE_PATH = f'/api/badges/by-mac/{MAC}'
+server = http_client.HttpClient(WLAN_SERVER_HOST, int(WLAN_SERVER_PORT), HTTP_TIMEOUT)
+ASSET_PATH = '/api/assets/'
+
+# Fonts and icons kept on flash for drawing layouts
+asset_cache = asset_store.AssetStore(budget=ASSET_BUDGET)
+
+if INSTRUMENT: instrument.enable()
+
+# Create and init display unit; refreshes run in the background unless in low-power mode
+if DEBUG: print(f'* Initialising display...')
+badge = panel.create(None if DETECT_PANEL else DISPLAY_PANEL, blocking=LOW_POWER_MODE is not None, default=DISPLAY_PANEL)
+if DEBUG: print(f'* Display panel is {badge.CAPABILITIES.name}')
+
+# Try to load badge data cache
+load_data_cache()
+
+# ---------------------------------------
+# Begin event loop (the WLAN task connects before the first poll)
+
+if LOW_POWER_MODE:
+    run_low_power()
+else:
+    asyncio.run(main())
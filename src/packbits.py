@@ -0,0 +1,89 @@
+""" PackBits decompression for badge payloads
+        by: Matt Hall
+        version: 0.1
+
+    Badge images are mostly blank space, so the server can run-length encode the binary badge
+    payload with PackBits (negotiated as the 'x-packbits' content coding). PackBitsReader wraps the
+    response socket and decompresses on the fly through a small working buffer, so it can be handed
+    to anything that reads a stream with readinto(), such as DisplayDriver.display_stream.
+
+    Each block starts with a control byte n:
+        0..127      the next n + 1 bytes are copied as they are
+        129..255    the next byte is repeated 257 - n times
+        128         no-op
+"""
+
+CONTENT_ENCODING = 'x-packbits'
+
+# Size of the compressed input buffer
+INPUT_BUFFER_SIZE = 128
+
+
+class PackBitsReader:
+    """ Stream wrapper that decompresses PackBits data read from `stream` """
+
+    def __init__(self, stream, buffer_size=INPUT_BUFFER_SIZE):
+        self.stream = stream
+
+        self.__buf = bytearray(buffer_size)
+        self.__view = memoryview(self.__buf)
+        self.__pos = 0
+        self.__end = 0
+
+        # Decoder state: bytes left in the current literal or run block
+        self.__literal = 0
+        self.__run = 0
+        self.__value = 0
+
+    def __fill(self):
+        # Refill the input buffer; returns False at the end of the stream
+        n = self.stream.readinto(self.__buf)
+        self.__pos = 0
+        self.__end = n or 0
+        return self.__end > 0
+
+    def __next_byte(self):
+        if self.__pos == self.__end and not self.__fill():
+            return -1
+        b = self.__buf[self.__pos]
+        self.__pos += 1
+        return b
+
+    def readinto(self, buf):
+        """ Decompress into `buf`, returning the number of bytes written (0 at the end of the data) """
+        view = memoryview(buf)
+        size = len(buf)
+        got = 0
+
+        while got < size:
+            if self.__literal:
+                if self.__pos == self.__end and not self.__fill():
+                    raise EOFError('PackBits data ends inside a literal block')
+                n = min(self.__literal, self.__end - self.__pos, size - got)
+                view[got:got + n] = self.__view[self.__pos:self.__pos + n]
+                self.__pos += n
+                self.__literal -= n
+                got += n
+
+            elif self.__run:
+                n = min(self.__run, size - got)
+                value = self.__value
+                for i in range(got, got + n):
+                    view[i] = value
+                self.__run -= n
+                got += n
+
+            else:
+                control = self.__next_byte()
+                if control < 0:
+                    break
+                if control < 128:
+                    self.__literal = control + 1
+                elif control > 128:
+                    value = self.__next_byte()
+                    if value < 0:
+                        raise EOFError('PackBits data ends inside a run block')
+                    self.__value = value
+                    self.__run = 257 - control
+
+        return got
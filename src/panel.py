@@ -0,0 +1,146 @@
+""" Common display panel interface
+        by: Matt Hall
+        version: 0.1
+
+    Both display drivers provide a DisplayDriver class with the same interface, which is what the
+    rest of the badge code uses:
+
+        frame                       the frame buffer (one 1 bpp plane, rows of 16 bytes, bit set = white)
+        red_frame                   the red plane shown along with a black frame (bit clear = red)
+        display(image, channel, red_image, mode)
+                                    decode a hex image (and red plane) into the frames and show them
+        display_stream(stream, channel, planes, mode)
+                                    read raw planes from a stream into the frames and show them
+        display_frame(channel, red, mode)
+                                    show whatever is in the frame (and red plane)
+        refresh_pending(), wait_async()
+                                    for refreshes that carry on in the background
+        restore_shown(channel, red), shown_channel(), shows_red()
+                                    what the panel is known to show (e.g. after a reboot)
+        sleep()                     power the panel down until it is next used
+        last_refresh_ms             how long the last refresh took
+        CAPABILITIES                what the panel can do (see Capabilities)
+
+    Each driver picks the cheapest way to update its own panel from what it can do, e.g. the black
+    and white panel picks a partial, fast or full refresh by how much changes, and draws red in black. A particular
+    refresh can be asked for with `mode` (FULL, FAST or PARTIAL); a driver uses the nearest one its
+    panel has.
+
+    Which panel is attached is found at startup by create(), so the same firmware runs on either.
+"""
+from machine import Pin
+from utime import sleep_ms, ticks_ms, ticks_diff
+
+# Display pins shared by both hats
+RESET_PIN = 12
+BUSY_PIN = 13
+
+# How long probe() waits for the BUSY line to settle after a reset, how long it has to hold one
+# level to count as settled, and how long each pull is left to charge the line before reading (ms)
+PROBE_TIMEOUT_MS = 200
+PROBE_SETTLE_MS = 20
+PROBE_POLL_MS = 1
+
+# Panel names
+BW = 'BW'
+BWR = 'BWR'
+
+# Refresh modes
+FULL = 'full'           # the panel's standard waveform: slow and flashing, but leaves a clean image
+FAST = 'fast'           # a shorter full waveform: quicker, but leaves a little ghosting
+PARTIAL = 'partial'     # only drives the pixels that change: quickest and doesn't flash, but
+                        # ghosting builds up with each one
+
+
+class Capabilities:
+    def __init__(self, name, planes, partial_refresh, fast_lut, background_refresh, refresh_ms, partial_refresh_ms=None, fast_refresh_ms=None):
+        """
+        name                panel name (BW or BWR)
+        planes              number of colour planes (1: black, 2: black and red)
+        partial_refresh     whether part of the panel can be refreshed without a full refresh cycle
+        fast_lut            whether a fast full-refresh waveform is available
+        background_refresh  whether refreshes can carry on while the badge does other work; if
+                            not, the driver is always created blocking (see create())
+        refresh_ms          rough duration of a full refresh (ms)
+        partial_refresh_ms  rough duration of a partial refresh (ms), if supported
+        fast_refresh_ms     rough duration of a fast refresh (ms), if supported
+        """
+        self.name = name
+        self.planes = planes
+        self.partial_refresh = partial_refresh
+        self.fast_lut = fast_lut
+        self.background_refresh = background_refresh
+        self.refresh_ms = refresh_ms
+        self.partial_refresh_ms = partial_refresh_ms
+        self.fast_refresh_ms = fast_refresh_ms
+
+    def update_ms(self):
+        """ Rough duration of the cheapest update the panel can do (ms) """
+        if self.partial_refresh:
+            return self.partial_refresh_ms
+        if self.fast_lut:
+            return self.fast_refresh_ms
+        return self.refresh_ms
+
+
+def probe():
+    """ Guess which panel is attached from its BUSY line once it has settled after a reset: the
+    black/white/red panel's controller holds it high when idle, the black/white panel's holds it low.
+
+    A line that no controller drives just follows the pin's pull resistor, so each reading is taken
+    with the pull up and then down, and only counts if both agree. Returns None if the line isn't
+    driven (e.g. no panel is attached) or doesn't settle within PROBE_TIMEOUT_MS.
+    """
+    reset = Pin(RESET_PIN, Pin.OUT)
+    busy = Pin(BUSY_PIN, Pin.IN, Pin.PULL_UP)
+
+    reset.value(1)
+    sleep_ms(10)
+    reset.value(0)
+    sleep_ms(2)
+    reset.value(1)
+
+    start = ticks_ms()
+    level = None
+    level_since = start
+    while True:
+        busy.init(Pin.IN, Pin.PULL_UP)
+        sleep_ms(PROBE_POLL_MS)
+        high = busy.value()
+        busy.init(Pin.IN, Pin.PULL_DOWN)
+        sleep_ms(PROBE_POLL_MS)
+        reading = high if busy.value() == high else None
+
+        now = ticks_ms()
+        if reading != level:
+            level = reading
+            level_since = now
+        elif level is not None and ticks_diff(now, level_since) >= PROBE_SETTLE_MS:
+            break
+
+        if ticks_diff(now, start) > PROBE_TIMEOUT_MS:
+            level = None
+            break
+
+    # Leave the pull up, as the drivers expect
+    busy.init(Pin.IN, Pin.PULL_UP)
+
+    if level is None:
+        return None
+    return BW if level == 0 else BWR
+
+
+def create(name=None, blocking=True, default=BWR):
+    """ Create the DisplayDriver for the panel called `name`, or for the attached one if None (or
+    for the `default` panel if which one is attached can't be told). Refreshes carry on in the
+    background unless `blocking`, where the panel can do that. """
+    if name is None:
+        name = probe() or default
+
+    if name == BW:
+        from display_driver_BW import DisplayDriver
+    else:
+        from display_driver_BWR import DisplayDriver
+
+    # A panel that can't refresh in the background has every refresh block
+    return DisplayDriver(blocking=blocking or not DisplayDriver.CAPABILITIES.background_refresh)
@@ -0,0 +1,84 @@
+""" Adaptive poll scheduling
+        by: Matt Hall
+        version: 0.1
+
+    Decides how long a badge waits between polls. Right after a change the badge polls at the
+    minimum interval, since more edits tend to follow; while the data stays the same, or the server
+    keeps failing, the interval grows by a backoff factor up to a maximum. Every delay is jittered
+    by a per-device pseudo-random amount seeded from the MAC address, so a room full of badges that
+    powered on together doesn't hit the server in lockstep.
+
+    The interval and the jitter generator can be saved to flash and loaded again, so the schedule
+    carries on across machine.deepsleep(), which resets the Pico on waking.
+"""
+import ujson
+
+STATE_PATH = './poll_schedule.json'
+
+# Poll results
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+
+
+class PollScheduler:
+    def __init__(self, mac, min_interval=10, max_interval=120, backoff_factor=1.5, jitter=0.2):
+        """ `mac` seeds the jitter; intervals are in seconds; `jitter` is the largest fraction of
+        each delay that is added or taken away at random. """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+
+        self.interval = min_interval
+
+        # Seed a xorshift generator from the MAC (hex string); it must never be zero
+        self.__state = (int(mac, 16) & 0xffffffff) or 0x9e3779b9
+
+    def __random(self):
+        # xorshift32, giving a float in [0, 1)
+        x = self.__state
+        x ^= (x << 13) & 0xffffffff
+        x ^= x >> 17
+        x ^= (x << 5) & 0xffffffff
+        self.__state = x
+        return x / 4294967296
+
+    def record(self, result):
+        """ Adjust the interval after a poll with the given result (CHANGED, UNCHANGED or FAILED) """
+        if result == CHANGED:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff_factor, self.max_interval)
+
+    def jittered(self, delay):
+        """ `delay` randomly moved by up to +/- the jitter fraction """
+        return delay * (1 + self.jitter * (2 * self.__random() - 1))
+
+    def next_delay(self):
+        """ Seconds to wait before the next poll """
+        return self.jittered(self.interval)
+
+    def save(self, path=STATE_PATH):
+        """ Write the interval and the jitter generator's state to flash """
+        try:
+            with open(path, 'w') as f:
+                ujson.dump([self.interval, self.__state], f)
+        except OSError:
+            pass
+
+    def load(self, path=STATE_PATH):
+        """ Carry on from the state written by save(), if any; returns whether there was one """
+        try:
+            with open(path) as f:
+                interval, state = ujson.load(f)
+        except (OSError, ValueError, TypeError):
+            return False
+
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        self.__state = (state & 0xffffffff) or self.__state
+        return True
+
+    def initial_delay(self):
+        """ Seconds to wait before the first poll, spreading badges across one minimum interval """
+        return self.min_interval * self.__random()
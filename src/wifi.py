@@ -0,0 +1,195 @@
+""" Fast WLAN (re)connection
+        by: Matt Hall
+        version: 0.1
+
+    A plain connect scans every channel for the network and then waits on DHCP, which takes several
+    seconds. After the first successful connection this remembers the access point (BSSID and
+    channel) on flash, so later connections, e.g. after a dropout or waking from sleep, can join that
+    access point directly. If the fast join doesn't work out, it falls back to a full scan-and-DHCP
+    connect.
+
+    Optionally, the address from DHCP is reused on reconnects without asking DHCP again. The badge
+    never renews the lease, so the address is only reused until `lease_time` after it was given,
+    which must be shorter than the DHCP server's lease time; after that (or if reconnecting with it
+    fails) the badge goes back to DHCP. The lease is only kept in memory, as the clock starts over
+    on every boot, so waking from deep sleep always asks DHCP.
+"""
+import uasyncio as asyncio
+import ujson
+from ubinascii import hexlify, unhexlify
+from utime import sleep_ms, ticks_ms, ticks_diff
+
+import instrument
+
+DEBUG = False
+
+CACHE_PATH = './wlan_cache.json'
+
+# wlan.status() value once connected with an IP address (network.STAT_GOT_IP)
+STAT_GOT_IP = 3
+
+# How often to check the connection status while connecting (ms)
+STATUS_POLL_MS = 20
+
+# How long an address from DHCP is reused for by default (s)
+DEFAULT_LEASE_TIME = 1800
+
+
+class WifiConnector:
+    def __init__(self, wlan, ssid, password, static_ip=None, reuse_lease=False, lease_time=DEFAULT_LEASE_TIME, cache_path=CACHE_PATH):
+        """
+        static_ip       (ip, netmask, gateway, dns) to always use instead of DHCP, or None
+        reuse_lease     whether to reuse the last address given by DHCP on later connections
+        lease_time      how long after DHCP gives an address it may be reused for (s)
+        """
+        self.wlan = wlan
+        self.ssid = ssid
+        self.password = password
+        self.static_ip = static_ip
+        self.reuse_lease = reuse_lease
+        self.lease_time = lease_time
+        self.cache_path = cache_path
+
+        # The address DHCP last gave us, and when (ticks_ms), or None
+        self.__lease = None
+        self.__lease_start = 0
+        self.__reusing = False
+
+        # How long the last successful connection took (ms)
+        self.last_connect_ms = None
+
+        self.__cache = self.__load_cache()
+        self.__pending_cache = self.__cache
+        self.__fast = False
+        self.__start = 0
+
+    def __load_cache(self):
+        try:
+            with open(self.cache_path) as cache:
+                return ujson.load(cache)
+        except (OSError, ValueError):
+            return {}
+
+    def __save_cache(self, cache):
+        if cache == self.__cache:
+            return
+
+        self.__cache = cache
+        try:
+            with open(self.cache_path, 'w') as f:
+                ujson.dump(cache, f)
+        except OSError:
+            pass
+
+    def __find_access_point(self):
+        # Strongest access point for our SSID as (bssid, channel), or None
+        best = None
+        for ssid, bssid, channel, rssi, *_ in self.wlan.scan():
+            if ssid.decode() == self.ssid and (best is None or rssi > best[2]):
+                best = (bssid, channel, rssi)
+        return best and best[:2]
+
+    def __lease_valid(self):
+        if self.__lease is None:
+            return False
+        return ticks_diff(ticks_ms(), self.__lease_start) < self.lease_time * 1000
+
+    def start(self, fast=True):
+        """ Start connecting, joining the remembered access point directly if `fast` and known.
+
+        Without a remembered access point this scans for one first, which blocks for about 2 s.
+        """
+        wlan = self.wlan
+        wlan.active(True)
+
+        cache = self.__cache
+        self.__fast = fast and 'bssid' in cache
+        self.__reusing = False
+
+        if self.static_ip:
+            wlan.ifconfig(self.static_ip)
+        elif self.__fast and self.reuse_lease and self.__lease_valid():
+            wlan.ifconfig(self.__lease)
+            self.__reusing = True
+        else:
+            try:
+                wlan.ifconfig('dhcp')
+            except (OSError, TypeError, ValueError):
+                pass
+
+        if not self.__fast:
+            # Slow path: scan for the best access point to remember for next time
+            ap = self.__find_access_point()
+            if ap:
+                cache = dict(cache, bssid=hexlify(ap[0]).decode(), channel=ap[1])
+
+        self.__start = ticks_ms()
+        if 'bssid' in cache:
+            wlan.connect(self.ssid, self.password, bssid=unhexlify(cache['bssid']))
+        else:
+            wlan.connect(self.ssid, self.password)
+
+        self.__pending_cache = cache
+
+    def check(self, timeout_ms):
+        """ Check on a connection started with start(). Returns True once connected, False while
+        still connecting, or None if it has failed or run out of time. """
+        status = self.wlan.status()
+
+        if status == STAT_GOT_IP:
+            self.last_connect_ms = ticks_diff(ticks_ms(), self.__start)
+            instrument.record('wifi_fast' if self.__fast else 'wifi_full', self.last_connect_ms, start=self.__start)
+
+            # The lease runs from when DHCP gave the address, not from when it was last reused
+            if not self.static_ip and not self.__reusing:
+                self.__lease = tuple(self.wlan.ifconfig())
+                self.__lease_start = self.__start
+            self.__save_cache(self.__pending_cache)
+            return True
+
+        if status < 0 or ticks_diff(ticks_ms(), self.__start) > timeout_ms:
+            if DEBUG: print(f'    Connecting to \'{self.ssid}\' failed (status {status})')
+            self.wlan.disconnect()
+
+            # Don't try the address again if it didn't work out
+            if self.__reusing:
+                self.__lease = None
+            return None
+
+        return False
+
+    def __next_attempt(self):
+        # After a failed fast join, forget the remembered access point and do a full connect
+        if self.__fast:
+            self.__save_cache({})
+            self.start(fast=False)
+            return True
+        return False
+
+    def connect(self, timeout_ms):
+        """ Connect, blocking for up to `timeout_ms` per attempt (fast join, then full connect).
+        Returns whether it connected. """
+        self.start()
+        while True:
+            result = self.check(timeout_ms)
+            if result:
+                return True
+            if result is None and not self.__next_attempt():
+                return False
+            sleep_ms(STATUS_POLL_MS)
+
+    async def connect_async(self, timeout_ms):
+        """ As connect(), but lets other uasyncio tasks run while waiting. Any scan for the access
+        point (see start()) still blocks. """
+        self.start()
+        while True:
+            result = self.check(timeout_ms)
+            if result:
+                return True
+            if result is None:
+                # Give the other tasks a turn before the full connect's blocking scan
+                await asyncio.sleep_ms(0)
+                if not self.__next_attempt():
+                    return False
+            await asyncio.sleep_ms(STATUS_POLL_MS)
+
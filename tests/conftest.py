@@ -0,0 +1,65 @@
+""" Shared fixtures: the badge code runs on the host simulator (tools/sim) """
+import os
+import sys
+import threading
+
+import pytest
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools')
+if TOOLS_DIR not in sys.path:
+    sys.path.insert(0, TOOLS_DIR)
+
+import sim  # noqa: E402
+import badgeman_stub  # noqa: E402
+from sim.board import DC_PIN  # noqa: E402
+
+# Server address configured in src/main.py, redirected to the stub server
+SERVER_HOST = '192.168.69.1'
+SERVER_PORT = 3000
+
+# How much faster than real time the simulated clock runs, so a 15 s refresh takes 15 ms
+SIM_SCALE = 1000
+
+# Make the MicroPython modules (and src/) importable from the start; each test that touches the
+# hardware gets a fresh board from a fixture below
+sim.install(scale=SIM_SCALE)
+
+
+class RecordingSPI:
+    """ Records each write as (D/C level, bytes) and passes it on to the simulated panel """
+    def __init__(self, board):
+        self.board = board
+        self.writes = []
+
+    def write(self, buf):
+        self.writes.append((self.board.levels.get(DC_PIN, 0), bytes(buf)))
+        self.board.spi_write(buf)
+
+
+@pytest.fixture
+def bwr_board():
+    """ A fresh simulated board with the black/white/red panel """
+    return sim.install(panel='BWR', scale=SIM_SCALE)
+
+
+@pytest.fixture
+def bw_board():
+    """ A fresh simulated board with the black and white panel """
+    return sim.install(panel='BW', scale=SIM_SCALE)
+
+
+@pytest.fixture
+def stub():
+    """ A badgeman stub server running on a free local port """
+    server = badgeman_stub.make_server(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def networked_board(stub):
+    """ A simulated black/white/red board whose connections to the badge server go to the stub.
+    Its clock runs in real time, as the stub's long-poll timeouts do. """
+    return sim.install(panel='BWR', hosts={SERVER_HOST: stub.server_address[:2]})
@@ -0,0 +1,137 @@
+""" The on-flash asset store (src/asset_store.py): budget, LRU eviction and the index """
+import os
+
+import pytest
+
+from asset_store import INDEX_NAME, AssetError, AssetStore, asset_hash
+
+
+def asset(n, size=100):
+    data = bytearray([n]) * size
+    return asset_hash(data), data
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'assets')
+
+
+def stored(store, *assets):
+    return [key in store for key, _ in assets]
+
+
+def test_get_what_was_put(path):
+    store = AssetStore(path, budget=1000)
+    key, data = asset(1)
+    store.put(key, data)
+
+    assert store.get(key) == data
+    assert store.get(asset(2)[0]) is None
+
+
+def test_put_rejects_data_that_does_not_match_its_hash(path):
+    store = AssetStore(path, budget=1000)
+    with pytest.raises(AssetError):
+        store.put(asset(1)[0], asset(2)[1])
+    assert store.size() == 0
+
+
+def test_evicts_the_least_recently_used_past_the_budget(path):
+    store = AssetStore(path, budget=300)
+    a, b, c, d = (asset(n) for n in range(4))
+    for key, data in (a, b, c):
+        store.put(key, data)
+
+    # Reading 'a' makes 'b' the least recently used
+    store.get(a[0])
+    store.put(*d)
+
+    assert stored(store, a, b, c, d) == [True, False, True, True]
+    assert store.size() == 300
+    assert not os.path.exists(os.path.join(path, b[0]))
+
+
+def test_putting_a_stored_asset_again_counts_as_a_use(path):
+    store = AssetStore(path, budget=200)
+    a, b, c = (asset(n) for n in range(3))
+    store.put(*a)
+    store.put(*b)
+    store.put(*a)
+    store.put(*c)
+
+    assert stored(store, a, b, c) == [True, False, True]
+
+
+def test_skips_assets_bigger_than_the_budget(path):
+    store = AssetStore(path, budget=150)
+    a = asset(1)
+    store.put(*a)
+    store.put(*asset(2, size=200))
+
+    assert stored(store, a) == [True]
+    assert store.size() == 100
+
+
+def test_index_survives_a_restart(path):
+    store = AssetStore(path, budget=300)
+    a, b, c, d = (asset(n) for n in range(4))
+    for key, data in (a, b, c):
+        store.put(key, data)
+    store.get(a[0])
+    store.flush()
+
+    # The order of use carries over, so 'b' is still the first to go
+    store = AssetStore(path, budget=300)
+    assert stored(store, a, b, c) == [True, True, True]
+    store.put(*d)
+    assert stored(store, a, b, c, d) == [True, False, True, True]
+
+
+def test_unflushed_changes_are_lost_on_restart(path):
+    store = AssetStore(path, budget=300)
+    store.put(*asset(1))
+    store.flush()
+    store.put(*asset(2))
+
+    assert stored(AssetStore(path, budget=300), asset(1), asset(2)) == [True, False]
+
+
+@pytest.mark.parametrize('index', [b'{"clock": 3', b'{"assets": {}}', None])
+def test_damaged_or_missing_index_drops_everything(path, index):
+    store = AssetStore(path, budget=300)
+    key, data = asset(1)
+    store.put(key, data)
+    store.flush()
+
+    index_path = os.path.join(path, INDEX_NAME)
+    if index is None:
+        os.remove(index_path)
+    else:
+        with open(index_path, 'wb') as f:
+            f.write(index)
+
+    store = AssetStore(path, budget=300)
+    assert key not in store
+    assert os.listdir(path) == []
+
+
+def test_drops_a_damaged_file(path):
+    store = AssetStore(path, budget=300)
+    key, data = asset(1)
+    store.put(key, data)
+    with open(os.path.join(path, key), 'wb') as f:
+        f.write(b'\x00' * len(data))
+
+    assert store.get(key) is None
+    assert key not in store
+    assert not os.path.exists(os.path.join(path, key))
+
+
+def test_drops_a_missing_file(path):
+    store = AssetStore(path, budget=300)
+    key, data = asset(1)
+    store.put(key, data)
+    os.remove(os.path.join(path, key))
+
+    assert store.get(key) is None
+    assert key not in store
@@ -0,0 +1,87 @@
+""" Push-to-display latency of the server push channel, against the stub server """
+import threading
+import time
+
+import pytest
+
+from conftest import SERVER_HOST, SERVER_PORT
+
+MAC = '28CDC100BAD9'
+BADGE_PATH = '/api/badges/by-mac/' + MAC
+
+# Longest an update may take to reach the badge over the push channel (s). Polling alone takes up
+# to POLL_MIN_INTERVAL (10 s) in main.py.
+PUSH_LATENCY_BOUND = 1.0
+
+
+def run(coroutine):
+    import uasyncio as asyncio
+    return asyncio.run(coroutine)
+
+
+def update_later(stub, delay, user_data):
+    """ Update the badge on the server from another thread after `delay` seconds """
+    timer = threading.Timer(delay, stub.store.update, (MAC, user_data))
+    timer.start()
+    return timer
+
+
+def test_first_watch_returns_the_current_version(stub, networked_board):
+    import badge_watch
+
+    stub.store.create(MAC)
+
+    assert run(badge_watch.watch(SERVER_HOST, SERVER_PORT, MAC)) == stub.store.version(MAC)
+
+
+def test_update_is_pushed_within_the_latency_bound(stub, networked_board):
+    import badge_watch
+    from http_client import HttpClient
+
+    stub.store.create(MAC)
+    version = stub.store.version(MAC)
+
+    update_later(stub, 0.2, {'name': 'Matt'})
+    start = time.monotonic()
+    new_version = run(badge_watch.watch(SERVER_HOST, SERVER_PORT, MAC, version, timeout=10))
+    waited = time.monotonic() - start
+
+    assert new_version == version + 1
+    assert waited < 0.2 + PUSH_LATENCY_BOUND
+
+    # Then the badge fetches the record; the stub times the update to that fetch. Its stats are
+    # read over the same connection, so only once it has finished with the fetch.
+    client = HttpClient(SERVER_HOST, SERVER_PORT)
+    response = client.get(BADGE_PATH, headers={'Accept': 'application/json'})
+    assert response.json()['userData']['name'] == 'Matt'
+    response.close()
+    response = client.get('/stats')
+    stats = response.json()
+    response.close()
+    client.close()
+
+    assert stats['last_update_latency_ms'] < PUSH_LATENCY_BOUND * 1000
+
+
+def test_no_change_times_out_with_none(stub, networked_board):
+    import badge_watch
+
+    stub.store.create(MAC)
+
+    assert run(badge_watch.watch(SERVER_HOST, SERVER_PORT, MAC, stub.store.version(MAC), timeout=0.2)) is None
+
+
+def test_server_without_push(networked_board):
+    import badge_watch
+    import badgeman_stub
+
+    server = badgeman_stub.make_server(port=0, no_push=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    networked_board.hosts[SERVER_HOST] = server.server_address[:2]
+
+    try:
+        with pytest.raises(badge_watch.WatchUnsupportedError):
+            run(badge_watch.watch(SERVER_HOST, SERVER_PORT, MAC, 0, timeout=1))
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,136 @@
+""" Conditional polling and content negotiation between the badge's HTTP client and the stub """
+import io
+
+import pytest
+
+from conftest import SERVER_HOST, SERVER_PORT
+from sim.panels import PLANE_SIZE
+
+MAC = '28CDC100BAD9'
+BADGE_PATH = '/api/badges/by-mac/' + MAC
+
+BLACK = bytes((i * 3) & 0xff for i in range(PLANE_SIZE))
+RED = bytes((i * 5) & 0xff for i in range(PLANE_SIZE))
+
+JSON = {'Accept': 'application/json'}
+BINARY = {'Accept': 'application/octet-stream, application/json'}
+
+
+@pytest.fixture
+def client(networked_board):
+    from http_client import HttpClient
+
+    client = HttpClient(SERVER_HOST, SERVER_PORT)
+    yield client
+    client.close()
+
+
+def fetch(client, headers):
+    response = client.get(BADGE_PATH, headers=headers)
+    body = response.content
+    response.close()
+    return response, body
+
+
+def test_unknown_badge_is_created(stub, client):
+    response, _ = fetch(client, JSON)
+    assert response.status_code == 404
+
+    response = client.post(BADGE_PATH, headers=JSON)
+    assert response.status_code == 201
+    assert response.json()['macAddress'] == MAC
+    response.close()
+
+    assert fetch(client, JSON)[0].status_code == 200
+
+
+def test_etag_gets_not_modified_until_the_badge_changes(stub, client):
+    stub.store.update(MAC, {'name': 'Matt', 'image': BLACK.hex()})
+
+    response, body = fetch(client, JSON)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert body
+
+    # Unchanged: no body, over the same connection
+    response, body = fetch(client, dict(JSON, **{'If-None-Match': etag}))
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert body == b''
+    assert client.connections == 1
+    assert stub.store.stats['not_modified'] == 1
+
+    # Changed: the old validator no longer matches
+    stub.store.update(MAC, {'name': 'Matthew'})
+    response, body = fetch(client, dict(JSON, **{'If-None-Match': etag}))
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_validators_differ_between_formats(stub, client):
+    stub.store.update(MAC, {'image': BLACK.hex()})
+
+    json_etag = fetch(client, JSON)[0].headers['ETag']
+    response, _ = fetch(client, dict(BINARY, **{'If-None-Match': json_etag}))
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != json_etag
+
+
+def test_binary_format_when_accepted(stub, client):
+    from badge_payload import read_header, read_into
+
+    stub.store.update(MAC, {'name': 'Matt', 'image': BLACK.hex(), 'imageRed': RED.hex()})
+
+    response, body = fetch(client, BINARY)
+    assert response.headers['Content-Type'] == 'application/octet-stream'
+
+    stream = io.BytesIO(body)
+    record, planes = read_header(stream)
+    assert planes == 2
+    assert record['userData']['name'] == 'Matt'
+    assert 'image' not in record['userData'] and 'imageRed' not in record['userData']
+
+    black = bytearray(PLANE_SIZE)
+    red = bytearray(PLANE_SIZE)
+    read_into(stream, black)
+    read_into(stream, red)
+    assert black == BLACK and red == RED
+
+
+def test_compressed_binary_format_when_accepted(stub, client):
+    from badge_payload import read_header, read_into
+    from packbits import CONTENT_ENCODING, PackBitsReader
+
+    stub.store.update(MAC, {'image': 'ff' * PLANE_SIZE})
+
+    response = client.get(BADGE_PATH, headers=dict(BINARY, **{'Accept-Encoding': CONTENT_ENCODING}))
+    assert response.headers['Content-Encoding'] == CONTENT_ENCODING
+    assert int(response.headers['Content-Length']) < PLANE_SIZE // 10
+
+    stream = PackBitsReader(response.raw)
+    _, planes = read_header(stream)
+    plane = bytearray(PLANE_SIZE)
+    read_into(stream, plane)
+    response.close()
+
+    assert planes == 1
+    assert plane == b'\xff' * PLANE_SIZE
+
+
+def test_json_when_binary_not_accepted(stub, client):
+    stub.store.update(MAC, {'image': BLACK.hex()})
+
+    response, _ = fetch(client, JSON)
+
+    assert response.headers['Content-Type'] == 'application/json'
+    assert response.json()['userData']['image'] == BLACK.hex()
+
+
+def test_layout_records_are_always_json(stub, client):
+    stub.store.update(MAC, {'image': BLACK.hex(), 'layout': {'ops': [['fill', 0]]}})
+
+    response, _ = fetch(client, BINARY)
+
+    assert response.headers['Content-Type'] == 'application/json'
+    assert 'image' not in response.json()['userData']
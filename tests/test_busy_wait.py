@@ -0,0 +1,95 @@
+""" Tests for waiting on the panel's BUSY line (src/busy_wait.py) """
+import pytest
+
+import sim
+from sim.board import BUSY_PIN
+from sim.panels import UC8151Panel
+
+# Slower than the other tests, so that the host's sleep granularity is small next to the refresh
+SCALE = 100
+
+# How far a measured wait may be from the simulated one, which starts a moment earlier and ends
+# after a poll interval and the host's sleep overrun (simulated ms)
+SLACK_MS = 1000
+
+
+@pytest.fixture
+def board():
+    return sim.install(panel='BWR', scale=SCALE)
+
+
+@pytest.fixture
+def busy_pin(board):
+    from machine import Pin
+    return Pin(BUSY_PIN, Pin.IN)
+
+
+def start_refresh(board):
+    """ Start a full refresh; returns the simulated time at which it ends """
+    board.panel.refreshed(UC8151Panel.REFRESH_MS)
+    return board.panel.busy_until
+
+
+def test_returns_busy_time(board, busy_pin):
+    from busy_wait import wait_for_idle
+
+    start = board.clock.ticks_ms()
+    end = start_refresh(board)
+    busy_ms = wait_for_idle(busy_pin, 1)
+
+    assert abs(busy_ms - (end - start)) <= SLACK_MS
+    assert not board.panel.busy()
+
+
+def test_async_returns_busy_time(board, busy_pin):
+    import uasyncio as asyncio
+    from busy_wait import wait_for_idle_async
+
+    start = board.clock.ticks_ms()
+    end = start_refresh(board)
+    busy_ms = asyncio.run(wait_for_idle_async(busy_pin, 1))
+
+    assert abs(busy_ms - (end - start)) <= SLACK_MS
+    assert not board.panel.busy()
+
+
+def test_idle_returns_at_once(board, busy_pin):
+    from busy_wait import wait_for_idle
+
+    board.clock.sleep_ms(board.panel.busy_until - board.clock.ticks_ms())
+    assert wait_for_idle(busy_pin, 1) < 10
+
+
+def test_busy_high_panel():
+    # The black and white panel holds BUSY high instead
+    board = sim.install(panel='BW', scale=SCALE)
+    from machine import Pin
+    from busy_wait import wait_for_idle
+
+    board.panel.busy_for(2000)
+    busy_ms = wait_for_idle(Pin(BUSY_PIN, Pin.IN), 0)
+    assert abs(busy_ms - 2000) <= SLACK_MS
+
+
+def test_timeout(board, busy_pin):
+    from busy_wait import DisplayTimeoutError, wait_for_idle
+
+    # BUSY never releases
+    board.panel.busy_for(10 ** 9)
+    start = board.clock.ticks_ms()
+    with pytest.raises(DisplayTimeoutError):
+        wait_for_idle(busy_pin, 1, timeout_ms=3000)
+
+    assert 3000 <= board.clock.ticks_ms() - start <= 3000 + SLACK_MS
+
+
+def test_async_timeout(board, busy_pin):
+    import uasyncio as asyncio
+    from busy_wait import DisplayTimeoutError, wait_for_idle_async
+
+    board.panel.busy_for(10 ** 9)
+    start = board.clock.ticks_ms()
+    with pytest.raises(DisplayTimeoutError):
+        asyncio.run(wait_for_idle_async(busy_pin, 1, timeout_ms=3000))
+
+    assert 3000 <= board.clock.ticks_ms() - start <= 3000 + SLACK_MS
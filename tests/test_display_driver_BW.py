@@ -0,0 +1,157 @@
+""" The black and white panel's driver: setup, the dirty-rectangle partial updates and the refresh policy """
+import random
+
+import pytest
+
+from conftest import RecordingSPI
+
+FRAME_SIZE = 128 * 296 // 8
+
+# Frame layouts as (lines, stride): portrait rows of 16 bytes, and landscape columns of 296
+LAYOUTS = [(296, 16), (16, 296)]
+
+
+def random_frame(rand):
+    return bytearray(rand.getrandbits(8) for _ in range(FRAME_SIZE))
+
+
+def changed_frame(rand, frame):
+    """ A copy of `frame` with a few bytes changed at random, so the change isn't a rectangle """
+    frame = bytearray(frame)
+    for _ in range(rand.randint(1, 4)):
+        i = rand.randrange(FRAME_SIZE)
+        frame[i] ^= rand.randint(1, 255)
+    return frame
+
+
+def brute_force_bounds(old, new, lines, stride):
+    changed = [divmod(i, stride) for i in range(lines * stride) if old[i] != new[i]]
+    if not changed:
+        return None
+    rows = [line for line, _ in changed]
+    cols = [byte for _, byte in changed]
+    return min(rows), max(rows), min(cols), max(cols)
+
+
+def test_init_goes_over_the_given_bus(bw_board):
+    from display_driver_BW import DisplayDriver
+
+    spi = RecordingSPI(bw_board)
+    DisplayDriver(spi=spi)
+
+    # Everything, starting with the controller's software reset, went over the recording bus
+    assert spi.writes[0] == (0, b'\x12')
+    assert len(spi.writes) == bw_board.spi_stats.calls
+
+
+def test_rejects_background_refreshes(bw_board):
+    from display_driver_BW import DisplayDriver
+
+    with pytest.raises(ValueError):
+        DisplayDriver(blocking=False)
+
+
+@pytest.mark.parametrize('lines, stride', LAYOUTS)
+def test_dirty_bounds_match_brute_force(lines, stride):
+    from display_driver_BW import dirty_bounds
+
+    rand = random.Random(lines)
+    old = random_frame(rand)
+    assert dirty_bounds(old, bytearray(old), lines, stride) is None
+
+    for _ in range(200):
+        new = changed_frame(rand, old)
+        assert dirty_bounds(old, new, lines, stride) == brute_force_bounds(old, new, lines, stride)
+
+
+@pytest.mark.parametrize('orientation', ['EPD_2in9_Portrait', 'EPD_2in9_Landscape'])
+@pytest.mark.parametrize('seed', range(5))
+def test_partial_updates_show_the_same_as_a_full_refresh(bw_board, orientation, seed):
+    import display_driver_BW
+
+    rand = random.Random(seed)
+    a = random_frame(rand)
+    b = changed_frame(rand, a)
+
+    epd = getattr(display_driver_BW, orientation)()
+    epd.display(a)
+    epd.display_Partial(a)
+    epd.display_Partial(b)
+    partial = bytes(bw_board.panel.shown)
+
+    epd.display(b)
+    assert partial == bw_board.panel.shown
+
+
+@pytest.mark.parametrize('mode', ['full', 'fast'])
+def test_whole_frame_goes_out_in_one_transfer_per_ram(bw_board, mode):
+    from display_driver_BW import DisplayDriver
+
+    spi = RecordingSPI(bw_board)
+    driver = DisplayDriver(spi=spi)
+    driver.frame[:] = random_frame(random.Random(mode))
+    spi.writes.clear()
+
+    assert driver.display_frame(mode=mode)
+
+    frame = bytes(driver.frame)
+    assert [data for dc, data in spi.writes if dc and len(data) > 1] == [frame, frame]
+
+
+def test_policy_forces_a_full_refresh_every_nth_update():
+    from display_driver_BW import RefreshPolicy
+
+    policy = RefreshPolicy(full_every=5)
+    modes = []
+    for _ in range(10):
+        mode = policy.choose(1)
+        policy.refreshed(mode, 1)
+        modes.append(mode)
+
+    assert modes == ['partial'] * 4 + ['full'] + ['partial'] * 4 + ['full']
+
+
+def test_policy_picks_fast_for_big_changes():
+    from display_driver_BW import RefreshPolicy
+
+    policy = RefreshPolicy(partial_percent=30)
+    assert policy.choose(30) == 'partial'
+    assert policy.choose(31) == 'fast'
+
+
+def test_policy_cleans_up_ghosting():
+    from display_driver_BW import RefreshPolicy
+
+    policy = RefreshPolicy(ghosting_percent=50)
+    policy.refreshed('partial', 20)
+    policy.refreshed('partial', 20)
+
+    # Another 20% would take the partial refreshes past 50% of the panel between them
+    assert policy.choose(10) == 'partial'
+    assert policy.choose(20) == 'full'
+
+    # A fast refresh drives every pixel, which clears the ghosting too
+    policy.refreshed('fast', 40)
+    assert policy.ghosting == 0
+    assert policy.choose(20) == 'partial'
+
+
+def test_full_refresh_until_the_controller_ram_is_known(bw_board):
+    from display_driver_BW import DisplayDriver
+
+    driver = DisplayDriver()
+
+    # Asking for a partial refresh before anything has been shown still gets a full one
+    driver.frame[0] ^= 0xff
+    assert driver.display_frame(mode='partial')
+    assert driver.last_refresh_mode == 'full'
+
+    driver.frame[0] ^= 0xff
+    assert driver.display_frame()
+    assert driver.last_refresh_mode == 'partial'
+
+    # After a reboot the panel's image is known, but not the controller's RAM
+    driver.restore_shown()
+    driver.frame[0] ^= 0xff
+    assert driver.display_frame()
+    assert driver.last_refresh_mode == 'full'
@@ -0,0 +1,89 @@
+""" The BWR driver's SRAM uploads, checked on a recording SPI bus """
+import pytest
+
+from sim.panels import PLANE_SIZE
+
+from conftest import RecordingSPI
+
+
+@pytest.fixture
+def driver(bwr_board):
+    from display_driver_BWR import DisplayDriver
+
+    spi = RecordingSPI(bwr_board)
+    driver = DisplayDriver(spi=spi, blocking=False)
+    spi.writes.clear()
+    return driver, spi
+
+
+def pattern(seed):
+    return bytearray((i * 7 + seed) & 0xff for i in range(PLANE_SIZE))
+
+
+def test_black_plane_goes_out_in_one_transfer(driver, bwr_board):
+    driver, spi = driver
+    driver.frame[:] = pattern(1)
+
+    assert driver.display_frame()
+
+    # DTM1 and the plane, DTM2 and a blank plane, then the refresh: one write each
+    assert spi.writes == [
+        (0, b'\x10'), (1, bytes(driver.frame)),
+        (0, b'\x13'), (1, b'\xff' * PLANE_SIZE),
+        (0, b'\x12'),
+    ]
+    assert bwr_board.panel.shown == driver.frame
+
+
+def test_red_plane_goes_out_in_one_transfer(driver, bwr_board):
+    driver, spi = driver
+    driver.frame[:] = pattern(1)
+    driver.red_frame[:] = pattern(2)
+
+    assert driver.display_frame(red=True)
+
+    assert spi.writes == [
+        (0, b'\x10'), (1, bytes(driver.frame)),
+        (0, b'\x13'), (1, bytes(driver.red_frame)),
+        (0, b'\x12'),
+    ]
+    assert bwr_board.panel.shown_red == driver.red_frame
+
+
+def test_hex_image_is_sent_as_decoded(driver):
+    driver, spi = driver
+    image = pattern(3)
+
+    assert driver.display(image.hex())
+
+    assert spi.writes[:2] == [(0, b'\x10'), (1, bytes(image))]
+    assert len(spi.writes) == 5
+
+
+def test_unchanged_image_sends_nothing(driver):
+    driver, spi = driver
+    driver.frame[:] = pattern(4)
+    driver.display_frame()
+    spi.writes.clear()
+
+    assert not driver.display_frame()
+    assert spi.writes == []
+
+
+def test_refresh_runs_in_the_background(driver):
+    import uasyncio as asyncio
+
+    driver, spi = driver
+    driver.frame[:] = pattern(5)
+    driver.display_frame()
+    assert driver.refresh_pending()
+
+    # Both the refresh task and a poll can be waiting on the same refresh
+    async def wait_twice():
+        return await asyncio.gather(driver.wait_async(), driver.wait_async())
+
+    first, second = asyncio.run(wait_twice())
+
+    assert not driver.refresh_pending()
+    assert first == second == driver.last_refresh_ms >= 15000
+    assert asyncio.run(driver.wait_async()) == 0
@@ -0,0 +1,158 @@
+""" The low-power duty cycle and poll schedule, stepped on a fake clock """
+import pytest
+
+from duty_cycle import DutyCycle, WAKE, CONNECT, POLL, POWER_DOWN, SLEEP
+from poll_schedule import CHANGED, UNCHANGED, FAILED, PollScheduler
+
+MAC = '28CDC100BAD9'
+
+
+class DeepSleepReset(Exception):
+    pass
+
+
+class FakeBadge:
+    """ The hardware actions of a duty cycle, on a fake clock, recording what happens """
+    def __init__(self, connects=True, results=(UNCHANGED,), connect_ms=300, poll_ms=700):
+        self.now = 0
+        self.connects = connects
+        self.results = list(results)
+        self.connect_ms = connect_ms
+        self.poll_ms = poll_ms
+        self.events = []
+        self.sleeps = []
+
+    def ticks_ms(self):
+        return self.now
+
+    def ticks_diff(self, a, b):
+        return a - b
+
+    def connect(self):
+        self.events.append('connect')
+        self.now += self.connect_ms
+        return self.connects
+
+    def poll(self):
+        self.events.append('poll')
+        self.now += self.poll_ms
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+    def power_down(self):
+        self.events.append('power_down')
+
+    def sleep_ms(self, ms):
+        self.events.append('sleep')
+        self.sleeps.append(ms)
+        self.now += ms
+
+    def duty_cycle(self, scheduler):
+        return DutyCycle(
+            scheduler, self.connect, self.poll, self.power_down, self.sleep_ms, self.ticks_ms, self.ticks_diff
+        )
+
+
+def scheduler(jitter=0):
+    return PollScheduler(MAC, min_interval=10, max_interval=120, backoff_factor=1.5, jitter=jitter)
+
+
+def run_cycles(badge, cycle, count):
+    """ Step the duty cycle until it has slept `count` times """
+    while len(badge.sleeps) < count:
+        cycle.step()
+
+
+def test_wake_poll_power_down_sleep():
+    badge = FakeBadge()
+    cycle = badge.duty_cycle(scheduler())
+
+    assert [cycle.step() for _ in range(5)] == [CONNECT, POLL, POWER_DOWN, SLEEP, WAKE]
+    assert badge.events == ['connect', 'poll', 'power_down', 'sleep']
+    assert cycle.result == UNCHANGED
+
+
+def test_time_awake_comes_off_the_sleep():
+    badge = FakeBadge(connect_ms=300, poll_ms=700)
+    cycle = badge.duty_cycle(scheduler())
+
+    run_cycles(badge, cycle, 1)
+
+    # Unchanged, so the interval backs off from 10 s to 15 s, wake to wake
+    assert cycle.awake_ms == 1000
+    assert cycle.asleep_ms == 14000
+    assert badge.sleeps == [14000]
+    assert badge.now == 15000
+
+
+def test_no_sleep_when_awake_past_the_interval():
+    badge = FakeBadge(poll_ms=20000)
+    cycle = badge.duty_cycle(scheduler())
+
+    run_cycles(badge, cycle, 1)
+
+    assert badge.sleeps == [0]
+
+
+def test_backs_off_while_unchanged_and_resets_on_change():
+    badge = FakeBadge(results=[UNCHANGED, UNCHANGED, UNCHANGED, CHANGED], connect_ms=0, poll_ms=0)
+    cycle = badge.duty_cycle(scheduler())
+
+    run_cycles(badge, cycle, 4)
+
+    assert badge.sleeps == [15000, 22500, 33750, 10000]
+
+
+def test_no_connection_skips_the_poll_and_backs_off():
+    badge = FakeBadge(connects=False, connect_ms=0)
+    cycle = badge.duty_cycle(scheduler())
+
+    run_cycles(badge, cycle, 2)
+
+    assert badge.events == ['connect', 'power_down', 'sleep'] * 2
+    assert cycle.result == FAILED
+    assert badge.sleeps == [15000, 22500]
+
+
+def test_backoff_and_jitter_carry_on_across_deep_sleep(tmp_path):
+    path = str(tmp_path / 'poll_schedule.json')
+
+    # Light sleep: one scheduler the whole time
+    light = FakeBadge(connect_ms=0, poll_ms=0)
+    run_cycles(light, light.duty_cycle(scheduler(jitter=0.2)), 6)
+
+    # Deep sleep: each wake is a reset, so a new scheduler picks up where the last one saved
+    deep = FakeBadge(connect_ms=0, poll_ms=0)
+
+    def deep_sleep_ms(ms):
+        boot_scheduler.save(path)
+        deep.sleep_ms(ms)
+        raise DeepSleepReset()
+
+    for boot in range(6):
+        boot_scheduler = scheduler(jitter=0.2)
+        assert boot_scheduler.load(path) == (boot > 0)
+
+        cycle = deep.duty_cycle(boot_scheduler)
+        cycle.sleep_ms = deep_sleep_ms
+        with pytest.raises(DeepSleepReset):
+            cycle.run()
+
+    assert deep.sleeps == light.sleeps
+    assert deep.sleeps[-1] > 2 * deep.sleeps[0]
+
+
+def test_jitter_stays_within_bounds():
+    s = scheduler(jitter=0.2)
+    delays = [s.next_delay() for _ in range(200)]
+
+    assert all(8 <= delay <= 12 for delay in delays)
+    assert len(set(delays)) > 100
+
+
+def test_damaged_schedule_file_is_ignored(tmp_path):
+    path = tmp_path / 'poll_schedule.json'
+    path.write_text('not json')
+
+    s = scheduler()
+    assert not s.load(str(path))
+    assert s.interval == 10
@@ -0,0 +1,108 @@
+""" The on-flash cache of the last displayed badge (src/frame_cache.py) """
+import os
+
+import pytest
+
+import frame_cache
+
+PLANE_SIZE = 128 * 296 // 8
+
+RECORD = {
+    'mac': '28cdc100bad9',
+    'userData': {'name': 'Matt Hall', 'image': 'ff' * PLANE_SIZE, 'imageRed': '00' * PLANE_SIZE},
+}
+
+
+def plane(seed):
+    return bytearray((i * 13 + seed) & 0xff for i in range(PLANE_SIZE))
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'badge_cache.bin')
+
+
+def load(path):
+    black = bytearray(PLANE_SIZE)
+    red = bytearray(PLANE_SIZE)
+    return frame_cache.load(black, red, path), black, red
+
+
+def test_round_trip_with_red(path):
+    frame_cache.save(plane(1), RECORD, '"v1"', 0x10, plane(2), path=path)
+
+    meta, black, red = load(path)
+    assert (black, red) == (plane(1), plane(2))
+    assert meta['etag'] == '"v1"'
+    assert meta['channel'] == 0x10
+    assert meta['red'] == frame_cache.plane_hash(plane(2))
+
+
+def test_round_trip_without_red(path):
+    frame_cache.save(plane(1), RECORD, None, 0x10, path=path)
+
+    meta, black, red = load(path)
+    assert black == plane(1)
+    assert red == bytearray(PLANE_SIZE)
+    assert meta['etag'] is None and meta['red'] is None
+
+
+def test_record_is_kept_without_its_images(path):
+    frame_cache.save(plane(1), RECORD, None, 0x10, path=path)
+
+    meta = load(path)[0]
+    assert meta['record'] == {'mac': RECORD['mac'], 'userData': {'name': 'Matt Hall'}}
+    assert 'image' in RECORD['userData']
+
+
+def test_no_cache(path):
+    assert load(path)[0] is None
+
+
+@pytest.mark.parametrize('offset, value', [(0, ord('X')), (2, frame_cache.VERSION + 1)])
+def test_bad_magic_or_version(path, offset, value):
+    frame_cache.save(plane(1), RECORD, None, 0x10, path=path)
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.write(bytes([value]))
+
+    assert load(path)[0] is None
+
+
+@pytest.mark.parametrize('keep', [3, 40, -1, -PLANE_SIZE - 1])
+def test_truncated_file(path, keep):
+    frame_cache.save(plane(1), RECORD, None, 0x10, plane(2), path=path)
+    with open(path, 'r+b') as f:
+        f.truncate(keep if keep > 0 else os.path.getsize(path) + keep)
+
+    assert load(path)[0] is None
+
+
+@pytest.mark.parametrize('from_end', [1, PLANE_SIZE + 1])
+def test_plane_that_does_not_match_its_hash(path, from_end):
+    # Damage the last byte of the red plane, or of the black plane before it
+    frame_cache.save(plane(1), RECORD, None, 0x10, plane(2), path=path)
+    with open(path, 'r+b') as f:
+        f.seek(-from_end, os.SEEK_END)
+        byte = f.read(1)[0]
+        f.seek(-from_end, os.SEEK_END)
+        f.write(bytes([byte ^ 0xff]))
+
+    assert load(path)[0] is None
+
+
+def test_leftover_temporary_file_is_ignored(path):
+    frame_cache.save(plane(1), RECORD, '"v1"', 0x10, path=path)
+
+    # As if the power went while the next cache was being written
+    with open(path + '.tmp', 'wb') as f:
+        f.write(b'BC\x01\x00\xff')
+
+    meta, black, _ = load(path)
+    assert meta['etag'] == '"v1"' and black == plane(1)
+
+    # And the next save replaces it
+    frame_cache.save(plane(3), RECORD, '"v2"', 0x10, path=path)
+    meta, black, _ = load(path)
+    assert meta['etag'] == '"v2"' and black == plane(3)
+    assert not os.path.exists(path + '.tmp')
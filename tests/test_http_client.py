@@ -0,0 +1,177 @@
+""" The keep-alive HTTP client: retries after a dropped connection, and reading bodies """
+import socket
+import threading
+
+import pytest
+
+
+class RawServer:
+    """ A TCP server that reads each request and answers with `answer(number, request)`, the bytes
+    to send back, or None to close the connection without answering """
+    def __init__(self, answer):
+        self.answer = answer
+        self.requests = []
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(4)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        stream = conn.makefile('rwb')
+        with conn:
+            while True:
+                head = b''
+                while not head.endswith(b'\r\n\r\n'):
+                    line = stream.readline()
+                    if not line:
+                        return
+                    head += line
+                length = int(head.lower().split(b'content-length:')[1].split(b'\r\n')[0])
+                request = head + stream.read(length)
+                self.requests.append(request.split(b' ')[0].decode())
+
+                response = self.answer(len(self.requests), request)
+                if response is None:
+                    return
+                stream.write(response)
+                stream.flush()
+
+    def close(self):
+        self.sock.close()
+
+
+def ok(body):
+    return b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n' % len(body) + body
+
+
+@pytest.fixture
+def serve(bwr_board):
+    servers = []
+
+    def start(answer, timeout=10):
+        from http_client import HttpClient
+
+        server = RawServer(answer)
+        servers.append(server)
+        return server, HttpClient('127.0.0.1', server.port, timeout)
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def drop_second_request(number, request):
+    # The server takes the second request, then the connection goes before it answers
+    return None if number == 2 else ok(b'done')
+
+
+def test_get_is_sent_again_after_a_dropped_connection(serve):
+    server, client = serve(drop_second_request)
+    client.get('/').close()
+
+    response = client.get('/')
+
+    assert response.content == b'done'
+    assert server.requests == ['GET', 'GET', 'GET']
+    assert client.connections == 2
+
+
+def test_post_is_not_sent_again_after_a_dropped_connection(serve):
+    server, client = serve(drop_second_request)
+    client.get('/').close()
+
+    with pytest.raises(OSError):
+        client.post('/', json={'name': 'Matt'})
+
+    assert server.requests == ['GET', 'POST']
+
+    # The next request opens a new connection
+    assert client.get('/').content == b'done'
+
+
+def test_get_is_not_sent_again_after_a_timeout(serve):
+    stop = threading.Event()
+
+    def hang_on_second_request(number, request):
+        # The server takes the second request but never answers it
+        if number == 2:
+            stop.wait(5)
+            return None
+        return ok(b'done')
+
+    server, client = serve(hang_on_second_request, timeout=0.2)
+    client.get('/').close()
+
+    try:
+        with pytest.raises(OSError) as raised:
+            client.get('/')
+    finally:
+        stop.set()
+
+    from http_client import timed_out
+    assert timed_out(raised.value)
+    assert server.requests == ['GET', 'GET']
+
+
+def test_timed_out():
+    import errno
+    from http_client import timed_out
+
+    assert timed_out(OSError(errno.ETIMEDOUT))
+    assert timed_out(socket.timeout('timed out'))
+    assert not timed_out(OSError(errno.ECONNRESET))
+    assert not timed_out(OSError('Connection closed by server'))
+
+
+def test_body_with_length_is_read_whole(serve):
+    body = bytes(range(256)) * 40
+    _, client = serve(lambda number, request: ok(body))
+
+    response = client.get('/')
+
+    assert response.content == body
+    response.close()
+
+
+def test_body_is_read_in_parts(serve):
+    _, client = serve(lambda number, request: ok(b'0123456789'))
+
+    response = client.get('/')
+    assert response.raw.read(4) == b'0123'
+    assert response.raw.read() == b'456789'
+    response.close()
+
+
+def test_chunked_body(serve):
+    chunked = b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n' \
+        b'4\r\nWiki\r\n190\r\n' + b'x' * 400 + b'\r\n0\r\n\r\n'
+    _, client = serve(lambda number, request: chunked)
+
+    response = client.get('/')
+
+    assert response.content == b'Wiki' + b'x' * 400
+    response.close()
+
+    # The connection is left at the start of the next response
+    assert client.get('/').content == b'Wiki' + b'x' * 400
+    assert client.connections == 1
+
+
+def test_malformed_chunk_drops_the_connection(serve):
+    bad = b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\nWiki\r\n0\r\n\r\n'
+    _, client = serve(lambda number, request: bad if number == 1 else ok(b'done'))
+
+    # Closing doesn't raise, and doesn't leave the connection in the middle of the body
+    client.get('/').close()
+
+    assert client.get('/').content == b'done'
+    assert client.connections == 2
@@ -0,0 +1,43 @@
+""" Tests for decoding hex badge images into a frame buffer (src/image_decoder.py) """
+import pytest
+
+from image_decoder import ImageFormatError, decode_hex_image
+
+
+def test_decodes_into_frame():
+    frame = bytearray(4)
+    decode_hex_image('00ff7fA5', frame)
+    assert frame == b'\x00\xff\x7f\xa5'
+
+
+def test_decodes_bytes():
+    frame = bytearray(2)
+    decode_hex_image(b'c3e1', frame)
+    assert frame == b'\xc3\xe1'
+
+
+@pytest.mark.parametrize('image', ['', '00ff7f', '00ff7fa5e', '00ff7fa500'])
+def test_wrong_length(image):
+    frame = bytearray(b'\x11' * 4)
+    with pytest.raises(ImageFormatError):
+        decode_hex_image(image, frame)
+
+
+@pytest.mark.parametrize('image', ['00ff7fg5', 'zz000000', '0000000-', '00 0ff00'])
+def test_not_hex(image):
+    with pytest.raises(ImageFormatError):
+        decode_hex_image(image, bytearray(4))
+
+
+def test_error_is_a_value_error():
+    # Callers that only know about ValueError still catch a bad image
+    with pytest.raises(ValueError):
+        decode_hex_image('0', bytearray(1))
+
+
+def test_wrong_length_leaves_frame_alone():
+    # The length is checked before anything is written
+    frame = bytearray(b'\x11' * 4)
+    with pytest.raises(ImageFormatError):
+        decode_hex_image('00ff', frame)
+    assert frame == b'\x11' * 4
@@ -0,0 +1,53 @@
+""" Drawing layouts (src/layout.py) without the assets that couldn't be fetched """
+import layout
+from render_layout import asset_ref, font_asset, icon_asset
+from sim.panels import PLANE_SIZE
+
+HEART = icon_asset([
+    '.##...##.',
+    '####.####',
+    '.#######.',
+    '...###...',
+])
+
+BLOCK_FONT = font_asset(4, 4, ord('A'), [['####'] * 4])
+
+FIELDS = {'name': 'Matt'}
+
+
+def key(asset):
+    return asset_ref(asset)[len(layout.ASSET_REF_PREFIX):]
+
+
+def draw(layout_data, assets=None):
+    frame = bytearray(PLANE_SIZE)
+    red_frame = bytearray(PLANE_SIZE)
+    layout.render(layout_data, frame, red_frame, FIELDS, assets)
+    return frame, red_frame
+
+
+def test_missing_icon_is_left_out():
+    with_icon = {'icons': {'heart': asset_ref(HEART)}, 'ops': [['text', 0, 0, '{name}', 0], ['icon', 10, 20, 'heart', 2]]}
+    without_icon = {'ops': [['text', 0, 0, '{name}', 0]]}
+
+    assert draw(with_icon) == draw(without_icon)
+    assert draw(with_icon, {key(HEART): bytearray.fromhex(HEART)}) != draw(without_icon)
+
+
+def test_missing_font_falls_back_to_the_default():
+    in_font = {'fonts': {'block': asset_ref(BLOCK_FONT)}, 'ops': [['text', 0, 0, 'A', 0, 'block']]}
+    in_default = {'ops': [['text', 0, 0, 'A', 0]]}
+
+    assert draw(in_font) == draw(in_default)
+    assert draw(in_font, {key(BLOCK_FONT): bytearray.fromhex(BLOCK_FONT)}) != draw(in_default)
+
+
+def test_red_is_drawn_in_black_without_a_red_plane():
+    layout_data = {'icons': {'heart': HEART}, 'ops': [['rect', 0, 0, 128, 40, 2, 1], ['text', 4, 8, '{name}', 1], ['icon', 10, 60, 'heart', 2]]}
+
+    frame = bytearray(PLANE_SIZE)
+    assert not layout.render(layout_data, frame, None, FIELDS)
+
+    # The same as drawing both planes and showing red pixels (clear bits) as black
+    black, red = draw(layout_data)
+    assert frame == bytes(b & r for b, r in zip(black, red))
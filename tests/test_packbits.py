@@ -0,0 +1,65 @@
+""" Decompressing PackBits payloads on the fly (src/packbits.py) """
+import io
+import random
+
+import pytest
+
+from image_codec import packbits_encode
+from packbits import PackBitsReader
+
+
+class TrickleStream:
+    """ A stream that returns at most `chunk` bytes from each readinto() """
+    def __init__(self, data, chunk):
+        self.data = io.BytesIO(data)
+        self.chunk = chunk
+
+    def readinto(self, buf):
+        return self.data.readinto(memoryview(buf)[:self.chunk])
+
+
+def sample(seed, size=4736):
+    # Blank space with runs and scattered noise, like a badge image
+    rand = random.Random(seed)
+    data = bytearray(b'\xff' * size)
+    for _ in range(40):
+        start = rand.randrange(size)
+        length = rand.randint(1, 300)
+        fill = rand.getrandbits(8) if rand.random() < 0.5 else None
+        for i in range(start, min(size, start + length)):
+            data[i] = fill if fill is not None else rand.getrandbits(8)
+    return bytes(data)
+
+
+def read_all(reader, piece):
+    out = bytearray()
+    buf = bytearray(piece)
+    while True:
+        n = reader.readinto(buf)
+        if not n:
+            return bytes(out)
+        out += buf[:n]
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('chunk, buffer_size, piece', [(1, 1, 1), (3, 2, 7), (7, 5, 100), (4096, 128, 4736)])
+def test_round_trip(seed, chunk, buffer_size, piece):
+    data = sample(seed)
+    reader = PackBitsReader(TrickleStream(packbits_encode(data), chunk), buffer_size)
+    assert read_all(reader, piece) == data
+
+
+def test_no_op_is_skipped():
+    encoded = bytes([128, 1, 0x41, 0x42, 128, 128, 0xFE, 0x43, 128])
+    assert read_all(PackBitsReader(io.BytesIO(encoded)), 16) == b'ABCCC'
+
+
+@pytest.mark.parametrize('encoded', [bytes([4, 1, 2]), bytes([0])])
+def test_data_ending_inside_a_literal_block(encoded):
+    with pytest.raises(EOFError):
+        read_all(PackBitsReader(io.BytesIO(encoded)), 16)
+
+
+def test_data_ending_inside_a_run_block():
+    with pytest.raises(EOFError):
+        read_all(PackBitsReader(io.BytesIO(bytes([1, 9, 9, 0xFD]))), 16)
@@ -0,0 +1,48 @@
+""" Tests for detecting the attached panel (src/panel.py) """
+import sim
+
+import panel
+from conftest import SIM_SCALE
+
+
+def test_probe_black_white_red(bwr_board):
+    assert panel.probe() == panel.BWR
+
+
+def test_probe_black_white(bw_board):
+    assert panel.probe() == panel.BW
+
+
+def test_probe_waits_for_busy_to_settle(bw_board):
+    # The controller holds BUSY high (as the black/white/red panel would when idle) while it
+    # comes out of the reset
+    bw_board.panel.HARDWARE_RESET_MS = 100
+    assert panel.probe() == panel.BW
+
+
+def test_probe_without_panel():
+    sim.install(panel=None, scale=SIM_SCALE)
+    assert panel.probe() is None
+
+
+def test_create_falls_back_to_default(bw_board, monkeypatch):
+    # As if the panel didn't answer the probe
+    monkeypatch.setattr(panel, 'probe', lambda: None)
+    assert panel.create(blocking=False, default=panel.BW).CAPABILITIES.name == panel.BW
+
+
+def test_create_blocks_where_the_panel_cant_refresh_in_the_background(bw_board):
+    assert panel.create(panel.BW, blocking=False).blocking
+
+
+def test_create_refreshes_in_the_background(bwr_board):
+    assert not panel.create(panel.BWR, blocking=False).blocking
+
+
+def test_capabilities():
+    from display_driver_BW import DisplayDriver as BWDriver
+    from display_driver_BWR import DisplayDriver as BWRDriver
+
+    assert (BWDriver.CAPABILITIES.planes, BWRDriver.CAPABILITIES.planes) == (1, 2)
+    assert BWDriver.CAPABILITIES.update_ms() == BWDriver.CAPABILITIES.partial_refresh_ms
+    assert BWRDriver.CAPABILITIES.update_ms() == BWRDriver.CAPABILITIES.refresh_ms
@@ -0,0 +1,30 @@
+""" The host-side layout renderer (tools/render_layout.py) against what the badge draws """
+import hashlib
+import importlib
+
+import sim
+
+import render_layout
+
+
+def test_import_keeps_the_simulated_board(bwr_board):
+    importlib.reload(render_layout)
+    assert sim.board is bwr_board
+
+
+def test_example_matches_the_badge(bwr_board):
+    import frame_cache
+    import layout
+    from display_driver_BWR import DisplayDriver
+
+    user_data = render_layout.EXAMPLE_USER_DATA
+    frame, red_frame, red = render_layout.render(user_data)
+
+    # Drawn and shown on the badge as main.py does
+    badge = DisplayDriver(blocking=True)
+    badge_red = layout.render(user_data['layout'], badge.frame, badge.red_frame, user_data)
+    assert badge.display_frame(red=badge_red)
+
+    assert red and badge_red
+    assert frame_cache.plane_hash(bwr_board.panel.shown) == hashlib.sha256(frame).hexdigest()
+    assert frame_cache.plane_hash(bwr_board.panel.shown_red) == hashlib.sha256(red_frame).hexdigest()
@@ -0,0 +1,67 @@
+""" The simulator's framebuf, against MicroPython's behaviour """
+import framebuf
+
+
+def mono(width, height):
+    buf = bytearray(((width + 7) // 8) * height)
+    return buf, framebuf.FrameBuffer(buf, width, height, framebuf.MONO_HLSB)
+
+
+def rows(fb, width, height):
+    return [''.join('#' if fb.pixel(x, y) else '.' for x in range(width)) for y in range(height)]
+
+
+def test_rows_start_on_a_byte_boundary():
+    buf, fb = mono(9, 2)
+    fb.pixel(0, 1, 1)
+
+    assert len(buf) == 4
+    assert buf == bytearray([0x00, 0x00, 0x80, 0x00])
+
+
+def test_text_draws_8x8_cells():
+    _, fb = mono(16, 8)
+    fb.text('AI', 0, 0, 1)
+
+    assert rows(fb, 16, 8) == [
+        '..###.....###...',
+        '.#...#.....#....',
+        '.#...#.....#....',
+        '.#...#.....#....',
+        '.#####.....#....',
+        '.#...#.....#....',
+        '.#...#....###...',
+        '................',
+    ]
+
+
+def test_text_only_draws_set_pixels():
+    _, fb = mono(8, 8)
+    fb.fill(1)
+    fb.text('A', 0, 0, 0)
+
+    # The background of the glyph is left as it was
+    assert fb.pixel(0, 0) == 1 and fb.pixel(2, 0) == 0
+
+
+def test_text_is_clipped():
+    _, fb = mono(8, 8)
+    fb.text('AA', -4, 4, 1)
+
+    # The right half of the first A, then the left half of the second
+    assert rows(fb, 8, 8)[4:] == [
+        '#.....##',
+        '.#...#..',
+        '.#...#..',
+        '.#...#..',
+    ]
+
+
+def test_text_without_a_glyph_is_a_box():
+    _, a = mono(8, 8)
+    _, b = mono(8, 8)
+    a.text('\x7f', 0, 0, 1)
+    b.text('\n', 0, 0, 1)
+
+    assert rows(a, 8, 8) == rows(b, 8, 8)
+    assert rows(a, 8, 8)[0] == '.######.'
@@ -0,0 +1,75 @@
+""" WLAN reconnection and DHCP lease reuse, on the simulated radio """
+import time
+
+import pytest
+
+TIMEOUT_MS = 10000
+
+
+@pytest.fixture
+def wlan(bwr_board):
+    import network
+    return network.WLAN(network.STA_IF)
+
+
+def connector(wlan, tmp_path, **kwargs):
+    from wifi import WifiConnector
+    return WifiConnector(wlan, 'Badge City', 'ihatecomputers', cache_path=str(tmp_path / 'wlan.json'), **kwargs)
+
+
+def reconnect(link, wlan):
+    wlan.disconnect()
+    assert link.connect(TIMEOUT_MS)
+
+
+def test_remembers_the_access_point(wlan, tmp_path, monkeypatch):
+    link = connector(wlan, tmp_path)
+    assert link.connect(TIMEOUT_MS)
+
+    # Later connections, even after a reboot, join the remembered access point without scanning
+    monkeypatch.setattr(wlan, 'scan', lambda: pytest.fail('scanned for the access point'))
+    reconnect(link, wlan)
+    assert connector(wlan, tmp_path).connect(TIMEOUT_MS)
+
+
+def test_asks_dhcp_every_time_by_default(wlan, tmp_path):
+    link = connector(wlan, tmp_path)
+    link.connect(TIMEOUT_MS)
+
+    reconnect(link, wlan)
+
+    assert not wlan._static
+
+
+def test_reuses_the_lease_while_it_lasts(wlan, bwr_board, tmp_path):
+    link = connector(wlan, tmp_path, reuse_lease=True, lease_time=60)
+    link.connect(TIMEOUT_MS)
+    address = wlan.ifconfig()
+
+    reconnect(link, wlan)
+    assert wlan._static
+    assert wlan.ifconfig() == address
+
+    # 60 s later (on the sped up clock) the lease may have gone to another device
+    time.sleep(bwr_board.clock.real_seconds(60000))
+    reconnect(link, wlan)
+    assert not wlan._static
+
+
+def test_lease_is_not_reused_after_a_reboot(wlan, tmp_path):
+    connector(wlan, tmp_path, reuse_lease=True).connect(TIMEOUT_MS)
+
+    reconnect(connector(wlan, tmp_path, reuse_lease=True), wlan)
+
+    assert not wlan._static
+
+
+def test_failed_fast_join_falls_back_to_scan_and_dhcp(wlan, bwr_board, tmp_path):
+    link = connector(wlan, tmp_path, reuse_lease=True)
+    link.connect(TIMEOUT_MS)
+
+    # The access point has been replaced
+    bwr_board.wlan_ssids['Badge City']['bssid'] = b'\x02\x00\x00\xba\xd9\xe6'
+    reconnect(link, wlan)
+
+    assert not wlan._static
@@ -0,0 +1,356 @@
+""" Local stand-in for the badgeman server
+        by: Matt Hall
+        version: 0.1
+
+    A minimal host-side (CPython) imitation of the badgeman badge API, for trying out the badge
+    client without the real server. Badge records are kept in memory.
+
+    Usage:
+        python3 tools/badgeman_stub.py [--host 0.0.0.0] [--port 3000]
+
+    Endpoints:
+        GET  /api/badges/by-mac/<MAC>   Fetch a badge record (honours If-None-Match, and sends the
+                                        binary format if 'Accept' asks for application/octet-stream,
+                                        PackBits-compressed if 'Accept-Encoding' lists x-packbits)
+        POST /api/badges/by-mac/<MAC>   Create a blank badge record, answering with the record
+                                        (in the format 'Accept' asks for, as with GET)
+        PUT  /api/badges/by-mac/<MAC>   Update a badge's userData fields from the JSON request body
+                                        ('image' is the black plane as hex; an optional 'imageRed'
+                                        adds a red plane, where a clear bit is red; a 'layout' is
+                                        drawn by the badge instead, see src/layout.py)
+        GET  /api/badges/by-mac/<MAC>/watch?since=<version>&timeout=<seconds>
+                                        Long-poll until the badge's version is newer than `since`
+                                        (see src/badge_watch.py)
+        POST /api/badges/by-mac/<MAC>/metrics
+                                        Take a badge's instrumentation spans (see src/instrument.py)
+        POST /api/assets                Store a layout asset (font or icon) from the raw request body,
+                                        answering with its hash as {'sha256': ...}
+        GET  /api/assets/<sha256>       Fetch a stored asset (see src/asset_store.py)
+        GET  /stats                     Request, connection and byte counters, and the time from the
+                                        last update to the badge fetching it, for measuring the client
+"""
+import argparse
+import hashlib
+import json
+import re
+import struct
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from image_codec import packbits_encode
+
+# Display resolution of the badges, in pixels
+DISPLAY_WIDTH = 128
+DISPLAY_HEIGHT = 296
+PLANE_SIZE = DISPLAY_WIDTH * DISPLAY_HEIGHT // 8
+
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+PACKBITS_ENCODING = 'x-packbits'
+
+BADGE_PATH = re.compile(r'^/api/badges/by-mac/([0-9A-Fa-f]{12})$')
+WATCH_PATH = re.compile(r'^/api/badges/by-mac/([0-9A-Fa-f]{12})/watch$')
+METRICS_PATH = re.compile(r'^/api/badges/by-mac/([0-9A-Fa-f]{12})/metrics$')
+ASSETS_PATH = '/api/assets'
+ASSET_PATH = re.compile(r'^/api/assets/([0-9a-f]{64})$')
+
+# Longest a watch request may be held open (seconds)
+MAX_WATCH_TIMEOUT = 300
+
+
+def blank_user_data():
+    return {
+        'name': '',
+        'pronouns': '',
+        'affiliation': '',
+        'message': '',
+        'image': 'ff' * PLANE_SIZE,
+    }
+
+
+def make_etag(body):
+    """ Strong validator for a response body """
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def encode_binary_badge(record):
+    """ Encode a badge record in the binary payload format (see src/badge_payload.py) """
+    user_data = dict(record['userData'])
+    planes = [bytes.fromhex(user_data.pop('image'))]
+
+    # An optional red plane goes after the black one
+    red = user_data.pop('imageRed', None)
+    if red:
+        planes.append(bytes.fromhex(red))
+
+    meta = json.dumps(dict(record, userData=user_data)).encode()
+    header = b'BB' + struct.pack('>BBH', 1, len(planes), len(meta))
+    return header + meta + b''.join(planes)
+
+
+def header_lists(value, token):
+    """ Whether a comma-separated header (e.g. Accept) lists `token`, ignoring q-values """
+    return any(
+        part.split(';', 1)[0].strip() == token
+        for part in (value or '').split(',')
+    )
+
+
+class BadgeStore:
+    """ Thread-safe in-memory badge records and request counters """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.badges = {}
+        self.versions = {}
+        self.update_times = {}
+
+        # Latest instrumentation spans reported by each badge
+        self.metrics = {}
+
+        # Layout assets by the SHA-256 of their bytes
+        self.assets = {}
+        self.stats = {
+            'requests': 0,
+            'connections': 0,
+            'not_modified': 0,
+            'bytes_sent': 0,
+            'watches': 0,
+            'metrics_reports': 0,
+            'assets_sent': 0,
+            'last_update_latency_ms': None,
+        }
+
+    def _bump(self, mac):
+        # Called with the lock held
+        self.versions[mac] = self.versions.get(mac, 0) + 1
+        self.changed.notify_all()
+
+    def version(self, mac):
+        with self.lock:
+            return self.versions.get(mac, 0)
+
+    def wait_for_change(self, mac, since, timeout):
+        """ Wait until the badge's version is newer than `since`; returns it, or None on timeout """
+        with self.lock:
+            if self.changed.wait_for(lambda: self.versions.get(mac, 0) > since, timeout):
+                return self.versions.get(mac, 0)
+            return None
+
+    def fetched(self, mac):
+        """ Record that a badge has fetched its record, timing how long the last update took """
+        with self.lock:
+            updated = self.update_times.pop(mac, None)
+            if updated is not None:
+                self.stats['last_update_latency_ms'] = round((time.monotonic() - updated) * 1000)
+
+    def get(self, mac):
+        with self.lock:
+            return self.badges.get(mac)
+
+    def create(self, mac):
+        with self.lock:
+            if mac not in self.badges:
+                self.badges[mac] = {'macAddress': mac, 'userData': blank_user_data()}
+                self._bump(mac)
+            return self.badges[mac]
+
+    def update(self, mac, user_data):
+        with self.lock:
+            record = self.badges.setdefault(mac, {'macAddress': mac, 'userData': blank_user_data()})
+            record['userData'].update(user_data)
+            self.update_times.setdefault(mac, time.monotonic())
+            self._bump(mac)
+            return record
+
+    def add_asset(self, data):
+        key = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            self.assets[key] = bytes(data)
+        return key
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+
+class BadgeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    store = None
+
+    def setup(self):
+        super().setup()
+        self.store.count('connections')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_body(self, status, body=b'', content_type='application/json', headers=None):
+        self.send_response(status)
+        if body or status not in (204, 304):
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+        self.store.count('requests')
+        self.store.count('bytes_sent', len(body))
+
+    def send_json(self, status, data, headers=None):
+        self.send_body(status, json.dumps(data).encode(), headers=headers)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def match_mac(self):
+        match = BADGE_PATH.match(self.path.split('?', 1)[0])
+        return match.group(1).upper() if match else None
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.store.lock:
+                return self.send_json(200, dict(self.store.stats))
+
+        asset = ASSET_PATH.match(self.path)
+        if asset:
+            with self.store.lock:
+                data = self.store.assets.get(asset.group(1))
+            if data is None:
+                return self.send_json(404, {'error': 'Asset not found'})
+            self.store.count('assets_sent')
+            return self.send_body(200, data, BINARY_CONTENT_TYPE)
+
+        watch = WATCH_PATH.match(urlsplit(self.path).path)
+        if watch and not self.server.no_push:
+            return self.watch(watch.group(1).upper())
+
+        mac = self.match_mac()
+        if mac is None:
+            return self.send_json(404, {'error': 'Not found'})
+
+        record = self.store.get(mac)
+        if record is None:
+            return self.send_json(404, {'error': 'Badge not found'})
+
+        if self.send_record(200, record):
+            self.store.fetched(mac)
+
+    def send_record(self, status, record):
+        """ Send a badge record in the format the request asks for, honouring If-None-Match.
+        Returns whether the record was sent (rather than 304 Not Modified). """
+        headers = {}
+        user_data = record['userData']
+        if user_data.get('layout'):
+            # The badge draws the layout itself, so there is no image to send and the record goes
+            # out as JSON whatever the badge accepts
+            record = dict(record, userData={k: v for k, v in user_data.items() if k not in ('image', 'imageRed')})
+            body = json.dumps(record).encode()
+            content_type = 'application/json'
+        elif header_lists(self.headers.get('Accept'), BINARY_CONTENT_TYPE) and not self.server.json_only:
+            body = encode_binary_badge(record)
+            content_type = BINARY_CONTENT_TYPE
+
+            if header_lists(self.headers.get('Accept-Encoding'), PACKBITS_ENCODING):
+                body = packbits_encode(body)
+                headers['Content-Encoding'] = PACKBITS_ENCODING
+        else:
+            body = json.dumps(record).encode()
+            content_type = 'application/json'
+
+        headers['ETag'] = make_etag(body)
+
+        if self.headers.get('If-None-Match') == headers['ETag']:
+            self.store.count('not_modified')
+            self.send_body(304, headers={'ETag': headers['ETag']})
+            return False
+
+        self.send_body(status, body, content_type, headers=headers)
+        return True
+
+    def watch(self, mac):
+        query = parse_qs(urlsplit(self.path).query)
+        timeout = min(float(query.get('timeout', ['60'])[0]), MAX_WATCH_TIMEOUT)
+        self.store.count('watches')
+
+        if 'since' not in query:
+            return self.send_json(200, {'version': self.store.version(mac)})
+
+        version = self.store.wait_for_change(mac, int(query['since'][0]), timeout)
+        if version is None:
+            return self.send_body(204)
+
+        self.send_json(200, {'version': version})
+
+    def do_POST(self):
+        metrics = METRICS_PATH.match(self.path)
+        if metrics:
+            with self.store.lock:
+                self.store.metrics[metrics.group(1).upper()] = self.read_json().get('spans', [])
+            self.store.count('metrics_reports')
+            return self.send_body(204)
+
+        if self.path == ASSETS_PATH:
+            data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            return self.send_json(201, {'sha256': self.store.add_asset(data)})
+
+        mac = self.match_mac()
+        if mac is None:
+            return self.send_json(404, {'error': 'Not found'})
+
+        # The new record comes back in the same format as a fetch would give it
+        self.send_record(201, self.store.create(mac))
+
+    def do_PUT(self):
+        mac = self.match_mac()
+        if mac is None:
+            return self.send_json(404, {'error': 'Not found'})
+
+        self.send_json(200, self.store.update(mac, self.read_json()))
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Badges drop idle connections whenever they like; that isn't worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_server(host='127.0.0.1', port=3000, verbose=False, json_only=False, no_push=False):
+    """ Create (but don't start) a stub server; port 0 picks a free port. With json_only or
+    no_push, the server behaves like one without binary format or push support. """
+    handler = type('Handler', (BadgeRequestHandler,), {'store': BadgeStore()})
+    server = StubServer((host, port), handler)
+    server.verbose = verbose
+    server.json_only = json_only
+    server.no_push = no_push
+    server.store = handler.store
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in for the badgeman server')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--json-only', action='store_true', help='never send the binary format')
+    parser.add_argument('--no-push', action='store_true', help='no watch endpoint for server push')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.verbose, args.json_only, args.no_push)
+    print(f'badgeman stub listening on {args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,278 @@
+""" Display driver benchmark
+        by: Matt Hall
+        version: 0.1
+
+    Times how the display drivers handle some typical badge images, split into phases:
+        decode      hex payload into the frame buffer
+        upload      sending the frame to the panel over SPI (up to starting the refresh)
+        wait        the panel refreshing, as timed by the driver off the BUSY pin
+    along with the number of SPI writes, the bytes they carried and the heap used.
+
+    Runs on the host against simulated hardware (tools/sim), where decode/upload times are those of
+    the host's CPython and only useful for comparing changes, but SPI counts are exact and the wait
+    comes from the panel model:
+        python3 tools/bench_display.py [runs]
+
+    Or on a Pico W with the firmware from src/ on the board, for real numbers; set PICO_DRIVERS to
+    the panel that is attached:
+        mpremote run tools/bench_display.py
+"""
+import gc
+import sys
+
+ON_HOST = sys.implementation.name != 'micropython'
+
+# Drivers to benchmark on a Pico ('BWR', 'BW portrait', 'BW landscape'); on the host, all of them
+PICO_DRIVERS = ('BWR',)
+
+# How much faster than real time the simulated panel runs on the host
+SIM_SCALE = 1000
+
+if ON_HOST:
+    import os
+    import tracemalloc
+    from time import perf_counter_ns
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import sim
+
+    sim.install(scale=SIM_SCALE)
+    tracemalloc.start()
+
+    def now_us():
+        return perf_counter_ns() // 1000
+
+    def diff_us(end, start):
+        return end - start
+
+else:
+    from utime import ticks_us as now_us, ticks_diff as diff_us
+
+import uasyncio as asyncio
+import ubinascii
+
+from image_decoder import decode_hex_image
+
+PLANE_SIZE = 128 * 296 // 8
+
+
+class CountingSPI:
+    """ Wraps an SPI bus, counting writes and bytes """
+    def __init__(self, spi):
+        self.spi = spi
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.bytes = 0
+
+    def init(self, *args, **kwargs):
+        self.spi.init(*args, **kwargs)
+
+    def deinit(self):
+        self.spi.deinit()
+
+    def write(self, buf):
+        self.calls += 1
+        self.bytes += len(buf)
+        self.spi.write(buf)
+
+
+class Meter:
+    """ Measures the heap used while running one operation """
+    def start(self):
+        gc.collect()
+        if ON_HOST:
+            tracemalloc.reset_peak()
+            self.base = tracemalloc.get_traced_memory()[0]
+        else:
+            # With the collector off, everything allocated stays counted in mem_alloc()
+            gc.disable()
+            self.base = gc.mem_alloc()
+
+    def stop(self):
+        if ON_HOST:
+            used = tracemalloc.get_traced_memory()[1] - self.base
+        else:
+            used = gc.mem_alloc() - self.base
+            gc.enable()
+        return used
+
+
+# ---------------------------------------
+# Sample images, as badge planes (bit set = white)
+
+def _random_bytes(n, seed):
+    # xorshift32, as the badge has no os.urandom on every port
+    out = bytearray(n)
+    x = seed
+    for i in range(n):
+        x ^= (x << 13) & 0xffffffff
+        x ^= x >> 17
+        x ^= (x << 5) & 0xffffffff
+        out[i] = x & 0xff
+    return out
+
+
+def blank_image():
+    return bytearray(b'\xff' * PLANE_SIZE)
+
+
+def text_image():
+    """ A name, pronouns and a message: a few bands of glyph-like marks on white """
+    image = blank_image()
+    noise = _random_bytes(PLANE_SIZE, 0x2545f491)
+    for top, height in ((24, 32), (72, 16), (120, 16), (144, 16)):
+        for y in range(top, top + height):
+            for x in range(1, 15):
+                # Sparse dark strokes, like large text
+                image[y * 16 + x] = noise[y * 16 + x] | 0x5a
+    return image
+
+
+def dithered_image():
+    """ A dithered photo: no structure to exploit """
+    return _random_bytes(PLANE_SIZE, 0x9e3779b9)
+
+
+def touched(image):
+    """ A copy of `image` with a small region changed, as in editing one word """
+    image = bytearray(image)
+    for y in range(200, 216):
+        for x in range(4, 8):
+            image[y * 16 + x] ^= 0xff
+    return image
+
+
+IMAGES = (
+    ('blank', blank_image),
+    ('text', text_image),
+    ('dithered', dithered_image),
+)
+
+
+# ---------------------------------------
+# Benchmarks
+
+def _report(name, image, rows):
+    # Average each column over the runs
+    n = len(rows)
+    avg = [sum(row[i] for row in rows) / n for i in range(len(rows[0]))]
+    print('{:<24}{:<10}{:>10.2f}{:>10.2f}{:>10.0f}{:>8.0f}{:>9.0f}{:>9.0f}'.format(name, image, *avg))
+
+
+def _header():
+    print('{:<24}{:<10}{:>10}{:>10}{:>10}{:>8}{:>9}{:>9}'.format(
+        'driver', 'image', 'decode ms', 'upload ms', 'wait ms', 'writes', 'bytes', 'heap B'
+    ))
+
+
+def bench_bwr(runs):
+    if ON_HOST:
+        sim.install(panel='BWR', scale=SIM_SCALE)
+    from machine import SPI
+    from display_driver_BWR import DisplayDriver
+
+    spi = CountingSPI(SPI(1, baudrate=4000000))
+    driver = DisplayDriver(spi=spi, blocking=False)
+    meter = Meter()
+
+    def run(payload):
+        spi.reset()
+        meter.start()
+
+        start = now_us()
+        decode_hex_image(payload, driver.frame)
+        decoded = now_us()
+        driver.display_frame()
+        uploaded = now_us()
+
+        heap = meter.stop()
+        wait_ms = asyncio.run(driver.wait_async())
+        return [
+            diff_us(decoded, start) / 1000, diff_us(uploaded, decoded) / 1000, wait_ms,
+            spi.calls, spi.bytes, heap
+        ]
+
+    for name, make in IMAGES:
+        image = make()
+        payloads = (ubinascii.hexlify(image).decode(), ubinascii.hexlify(touched(image)).decode())
+
+        # Alternate between two versions so each run really changes the panel
+        _report('BWR display', name, [run(payloads[i % 2]) for i in range(runs)])
+
+        # Displaying what is already shown should be skipped after the decode
+        _report('BWR display (same)', name, [run(payloads[(runs - 1) % 2]) for _ in range(runs)])
+
+
+def bench_bw(landscape, runs):
+    if ON_HOST:
+        sim.install(panel='BW', scale=SIM_SCALE)
+    import display_driver_BW
+
+    if landscape:
+        epd = display_driver_BW.EPD_2in9_Landscape()
+        label = 'BW landscape'
+    else:
+        epd = display_driver_BW.EPD_2in9_Portrait()
+        label = 'BW portrait'
+
+    spi = epd.spi = CountingSPI(epd.spi)
+    meter = Meter()
+
+    # Split the BUSY waits out of the time spent in the driver
+    waits = [0, 0]
+    read_busy = epd.ReadBusy
+
+    def timed_read_busy():
+        start = now_us()
+        waits[1] += read_busy()
+        waits[0] += diff_us(now_us(), start)
+
+    epd.ReadBusy = timed_read_busy
+
+    def run(method, payload):
+        spi.reset()
+        waits[0] = waits[1] = 0
+        meter.start()
+
+        start = now_us()
+        decode_hex_image(payload, epd.buffer)
+        decoded = now_us()
+        method(epd.buffer)
+        done = now_us()
+
+        heap = meter.stop()
+        upload_ms = (diff_us(done, decoded) - waits[0]) / 1000
+        return [diff_us(decoded, start) / 1000, upload_ms, waits[1], spi.calls, spi.bytes, heap]
+
+    for name, make in IMAGES:
+        image = make()
+        payloads = (ubinascii.hexlify(image).decode(), ubinascii.hexlify(touched(image)).decode())
+
+        _report(label + ' full', name, [run(epd.display, payloads[i % 2]) for i in range(runs)])
+
+        # The first fast update loads the fast waveform; time the rest
+        run(epd.display_Fast, payloads[0])
+        _report(label + ' fast', name, [run(epd.display_Fast, payloads[(i + 1) % 2]) for i in range(runs)])
+
+        # The first partial update enters partial mode and sends everything; time the rest
+        run(epd.display_Partial, payloads[0])
+        _report(label + ' partial', name, [run(epd.display_Partial, payloads[(i + 1) % 2]) for i in range(runs)])
+
+
+def main(runs=3):
+    drivers = ('BWR', 'BW portrait', 'BW landscape') if ON_HOST else PICO_DRIVERS
+    where = 'host (simulated panel)' if ON_HOST else 'Pico'
+    print('Display benchmark on {}, {} runs each'.format(where, runs))
+    _header()
+
+    for driver in drivers:
+        if driver == 'BWR':
+            bench_bwr(runs)
+        else:
+            bench_bw(driver == 'BW landscape', runs)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if ON_HOST and len(sys.argv) > 1 else 3)
@@ -0,0 +1,131 @@
+""" Host-side badge image codec and benchmark
+        by: Matt Hall
+        version: 0.1
+
+    PackBits encoder for the server side of the 'x-packbits' content coding, plus a decoder that
+    runs the badge's own src/packbits.py so both ends are checked against each other.
+
+    Running this file benchmarks the compression ratio and decode time on some typical badge images:
+        python3 tools/image_codec.py
+"""
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from packbits import PackBitsReader  # noqa: E402
+
+DISPLAY_WIDTH = 128
+DISPLAY_HEIGHT = 296
+ROW_BYTES = DISPLAY_WIDTH // 8
+PLANE_SIZE = ROW_BYTES * DISPLAY_HEIGHT
+
+
+def packbits_encode(data):
+    """ PackBits-encode `data`, using runs for 3 or more repeated bytes and literals otherwise """
+    out = bytearray()
+    i = 0
+    n = len(data)
+
+    while i < n:
+        # Measure the run starting here
+        run = 1
+        while i + run < n and run < 128 and data[i + run] == data[i]:
+            run += 1
+
+        if run >= 3:
+            out.append(257 - run)
+            out.append(data[i])
+            i += run
+            continue
+
+        # Otherwise collect literals up to the next run of 3 or more
+        start = i
+        while i < n and i - start < 128:
+            if i + 2 < n and data[i] == data[i + 1] == data[i + 2]:
+                break
+            i += 1
+        out.append(i - start - 1)
+        out += data[start:i]
+
+    return bytes(out)
+
+
+def packbits_decode(data, size=None):
+    """ Decode PackBits `data` with the badge-side decoder; reads to the end if size is None """
+    reader = PackBitsReader(io.BytesIO(data))
+    out = bytearray()
+    chunk = bytearray(1024)
+    while size is None or len(out) < size:
+        n = reader.readinto(chunk)
+        if not n:
+            break
+        out += chunk[:n]
+    return bytes(out)
+
+
+# ---------------------------------------
+# Sample badge images (1 = white, 0 = black, MONO_HLSB rows of 16 bytes)
+
+def blank_image():
+    return bytes([0xff]) * PLANE_SIZE
+
+
+def draw_block(image, x, y, w, h, rng, density=0.35, scale=1):
+    """ Draw a block of glyph-like noise, roughly what a line of text looks like """
+    for gy in range(0, h, scale):
+        for gx in range(0, w, scale):
+            if rng.random() < density:
+                for dy in range(scale):
+                    for dx in range(scale):
+                        px, py = x + gx + dx, y + gy + dy
+                        if px < DISPLAY_WIDTH and py < DISPLAY_HEIGHT:
+                            image[py * ROW_BYTES + px // 8] &= ~(0x80 >> (px % 8)) & 0xff
+
+
+def text_badge_image(seed=1):
+    """ Name in large text, a few lines of details and a logo, on a white background """
+    rng = random.Random(seed)
+    image = bytearray(blank_image())
+    draw_block(image, 8, 16, 112, 24, rng, scale=3)         # name
+    draw_block(image, 8, 56, 80, 8, rng)                    # pronouns
+    draw_block(image, 8, 80, 112, 8, rng)                   # affiliation
+    draw_block(image, 8, 96, 96, 8, rng)
+    draw_block(image, 8, 128, 112, 8, rng)                  # message
+    draw_block(image, 8, 144, 104, 8, rng)
+    draw_block(image, 32, 200, 64, 64, rng, 0.5, scale=4)   # logo
+    return bytes(image)
+
+
+def dithered_image(seed=2):
+    """ Worst case: a dithered photo, which barely compresses """
+    rng = random.Random(seed)
+    return bytes(rng.getrandbits(8) for _ in range(PLANE_SIZE))
+
+
+SAMPLES = {
+    'blank': blank_image,
+    'text badge': text_badge_image,
+    'dithered photo': dithered_image,
+}
+
+
+if __name__ == '__main__':
+    RUNS = 20
+
+    print(f'{"image":<16}{"raw B":>8}{"packed B":>10}{"ratio":>8}{"decode ms":>11}')
+    for name, make in SAMPLES.items():
+        image = make()
+        packed = packbits_encode(image)
+        assert packbits_decode(packed) == image, name
+
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            packbits_decode(packed, PLANE_SIZE)
+        decode_ms = (time.perf_counter() - start) * 1000 / RUNS
+
+        ratio = len(image) / len(packed)
+        print(f'{name:<16}{len(image):>8}{len(packed):>10}{ratio:>8.1f}{decode_ms:>11.2f}')
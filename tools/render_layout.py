@@ -0,0 +1,155 @@
+""" Host-side badge layout renderer
+        by: Matt Hall
+        version: 0.1
+
+    Draws a badge layout (see src/layout.py) with the badge's own compositor, running on the
+    simulated framebuf (tools/sim), so the planes come out byte for byte as the badge draws them.
+    Prints the SHA-256 of each plane, which is what the badge keeps in its frame cache
+    ('badge_cache.bin') for the planes on its panel (a black and white badge merges the red plane
+    into the black one first), and can save a PNG preview and the raw planes.
+
+    Usage, with a badge record or its userData as JSON (or the example layout if none is given):
+        python3 tools/render_layout.py [record.json] [--png badge.png] [--raw badge.bin]
+    Assets the layout refers to by hash are read from a directory of files named by their hash,
+    such as a copy of the badge's asset store, with --assets DIR.
+
+    Also has helpers for building assets on the server side (icon_asset(), font_asset(),
+    asset_ref()).
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import sim  # noqa: E402
+
+# Only set up a simulated board if nothing has yet (e.g. a test that imports this)
+if sim.board is None:
+    sim.install()
+
+import layout  # noqa: E402
+from sim.panels import UC8151Panel, PLANE_SIZE  # noqa: E402
+
+
+def _pack_rows(rows, width):
+    # Rows of '#' (ink) and anything else (white) as bitmap rows, bit set = white
+    out = bytearray()
+    for row in rows:
+        packed = bytearray(b'\xff' * ((width + 7) // 8))
+        for x, pixel in enumerate(row[:width]):
+            if pixel == '#':
+                packed[x >> 3] &= ~(0x80 >> (x & 7)) & 0xff
+        out += packed
+    return out
+
+
+def icon_asset(rows):
+    """ An icon asset (as hex) from rows of text, where '#' is ink """
+    width = max(len(row) for row in rows)
+    return (b'I' + struct.pack('>HH', width, len(rows)) + _pack_rows(rows, width)).hex()
+
+
+def font_asset(width, height, first, glyphs):
+    """ A font asset (as hex) from a list of glyphs, each `height` rows of text where '#' is ink """
+    data = b''.join(_pack_rows(glyph, width) for glyph in glyphs)
+    return (bytes([ord('F'), width, height, first, len(glyphs)]) + data).hex()
+
+
+def asset_ref(asset):
+    """ The reference to an asset (given as hex) to use in a layout in place of the asset """
+    return layout.ASSET_REF_PREFIX + hashlib.sha256(bytes.fromhex(asset)).hexdigest()
+
+
+def read_assets(path):
+    """ The assets in a directory of files named by their hash, as a dict of hash: bytearray """
+    assets = {}
+    for name in os.listdir(path):
+        if len(name) == 64:
+            with open(os.path.join(path, name), 'rb') as f:
+                assets[name] = bytearray(f.read())
+    return assets
+
+
+EXAMPLE_USER_DATA = {
+    'name': 'Matt Hall',
+    'pronouns': 'he/him',
+    'affiliation': 'Swansea University',
+    'message': 'Ask me about e-paper!',
+    'layout': {
+        'icons': {
+            'heart': icon_asset([
+                '.##...##.',
+                '####.####',
+                '#########',
+                '#########',
+                '.#######.',
+                '..#####..',
+                '...###...',
+                '....#....',
+            ]),
+        },
+        'ops': [
+            ['rect', 0, 0, 128, 40, 0, 1],
+            ['text', 64, 12, 'HELLO', 1, 'default', 3, 1],
+            ['text', 64, 80, '{name}', 0, 'default', 2, 1],
+            ['text', 64, 104, '{pronouns}', 2, 'default', 1, 1],
+            ['rect', 8, 124, 112, 1, 0, 1],
+            ['text', 64, 136, '{affiliation}', 0, 'default', 1, 1],
+            ['text', 64, 260, '{message}', 0, 'default', 1, 1],
+            ['icon', 60, 276, 'heart', 2],
+        ],
+    },
+}
+
+
+def render(user_data, assets=None):
+    """ Draw the layout in `user_data`; returns the black and red planes and whether red was used """
+    frame = bytearray(PLANE_SIZE)
+    red_frame = bytearray(PLANE_SIZE)
+    red = layout.render(user_data['layout'], frame, red_frame, user_data, assets)
+    return frame, red_frame, red
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Draw a badge layout as the badge would')
+    parser.add_argument('record', nargs='?', help='badge record or userData as JSON (default: an example)')
+    parser.add_argument('--png', help='save a preview of the panel to this PNG')
+    parser.add_argument('--png-scale', type=int, default=2, help='pixel size in the PNG')
+    parser.add_argument('--assets', help='directory of assets named by their hash')
+    parser.add_argument('--raw', help='save the planes (black, then red if used) to this file')
+    args = parser.parse_args()
+
+    if args.record:
+        with open(args.record) as f:
+            user_data = json.load(f)
+        user_data = user_data.get('userData', user_data)
+    else:
+        user_data = EXAMPLE_USER_DATA
+
+    assets = read_assets(args.assets) if args.assets else {}
+    frame, red_frame, red = render(user_data, assets)
+    size = len(json.dumps(user_data['layout'], separators=(',', ':')))
+    print(f'* Layout: {size} bytes as JSON')
+    for key in layout.asset_refs(user_data['layout']):
+        if key not in assets:
+            print(f'* Drawn without missing asset {key}')
+    print(f'* Black plane: {hashlib.sha256(frame).hexdigest()}')
+    print(f'* Red plane: {hashlib.sha256(red_frame).hexdigest() if red else None}')
+
+    if args.raw:
+        with open(args.raw, 'wb') as f:
+            f.write(frame + red_frame if red else frame)
+
+    if args.png:
+        panel = UC8151Panel()
+        panel.shown[:] = frame
+        panel.shown_red[:] = red_frame
+        panel.save_png(args.png, args.png_scale)
+        print(f'* Saved preview to {args.png}')
+
+
+if __name__ == '__main__':
+    main()
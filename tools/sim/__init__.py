@@ -0,0 +1,75 @@
+""" Host-side simulator for the badge hardware
+        by: Matt Hall
+        version: 0.1
+
+    Stand-ins for the MicroPython modules the badge code imports (machine, network, rp2, utime,
+    uasyncio, framebuf, ...), so that src/main.py and both display drivers can run unchanged under
+    CPython on a host machine.
+
+    The fake SPI bus records every transfer along with the D/C pin level, and feeds it to a model of
+    the panel's controller, which keeps the panel RAM, drives the BUSY pin for as long as a refresh
+    would really take and can save what's on the glass as a PNG. Time runs on a clock that can be
+    sped up, so a 15 s refresh needn't take 15 s.
+
+    Usage, to run the badge firmware against a local stub server:
+        cd tools && python3 -m sim --seconds 30 --scale 20 --png badge.png
+
+    Or from other host scripts, before importing anything from src/:
+        import sim
+        board = sim.install(panel='BWR', scale=20)
+        from display_driver_BWR import DisplayDriver
+        ...
+        board.panel.save_png('badge.png')
+"""
+import os
+import sys
+
+from sim.board import Board, Clock
+from sim.panels import PANELS
+
+# Directory holding the badge firmware
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src')
+
+# MicroPython module names, and the simulator modules that stand in for them
+FAKE_MODULES = ('machine', 'network', 'rp2', 'utime', 'uasyncio', 'framebuf', 'micropython', 'usocket')
+
+# MicroPython modules that CPython's own modules can stand in for
+ALIASES = {
+    'uos': 'os',
+    'ujson': 'json',
+    'ubinascii': 'binascii',
+    'uhashlib': 'hashlib',
+    'ustruct': 'struct',
+    'uio': 'io',
+    'uerrno': 'errno',
+    'urandom': 'random',
+}
+
+# The board the fake modules are currently wired to (see install())
+board = None
+
+
+def install(panel='BWR', scale=1.0, hosts=None, mac=b'\x28\xcd\xc1\x00\xba\xd9', src_dir=SRC_DIR):
+    """ Set up a simulated board and make the fake MicroPython modules importable. Returns the Board.
+
+    panel       which panel controller to model: 'BWR' (2.9" black/white/red) or 'BW' (2.9" black/white),
+                or None for a board with no panel attached
+    scale       how much faster than real time the simulated clock runs
+    hosts       {host: (host, port)} to redirect the badge's connections, e.g. to a local stub server
+    mac         the WLAN MAC address
+    """
+    global board
+    import importlib
+
+    board = Board(PANELS[panel]() if panel else None, Clock(scale), hosts or {}, mac)
+
+    for name, module in ALIASES.items():
+        sys.modules[name] = importlib.import_module(module)
+
+    for name in FAKE_MODULES:
+        sys.modules[name] = importlib.import_module('sim.upy.' + name)
+
+    if src_dir not in sys.path:
+        sys.path.insert(0, src_dir)
+
+    return board
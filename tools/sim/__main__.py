@@ -0,0 +1,92 @@
+""" Run the badge firmware (src/main.py) on the simulated board
+
+    Starts a badgeman stub server (tools/badgeman_stub.py), points the badge's server address at it
+    and runs main.py unchanged. Flash files (the badge and WLAN caches) go in a scratch directory.
+
+    Usage:
+        cd tools && python3 -m sim [--seconds 30] [--scale 20] [--png badge.png] [--flash DIR]
+"""
+import argparse
+import os
+import runpy
+import sys
+import tempfile
+import threading
+
+if __package__ in (None, ''):
+    # Run as 'python3 tools/sim'; make the package importable
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import sim  # noqa: E402
+
+# Server address configured in src/main.py
+SERVER_HOST = '192.168.69.1'
+
+
+def report(board, server):
+    panel = board.panel
+    stats = board.spi_stats
+    print(f'* Panel: {panel.refreshes} refreshes ({panel.refresh_ms} ms busy)')
+    print(f'* SPI: {stats.calls} writes, {stats.command_bytes} command bytes, {stats.data_bytes} data bytes')
+    if server is not None:
+        print(f'* Server: {dict(server.store.stats)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run src/main.py on the simulated badge hardware')
+    parser.add_argument('--seconds', type=float, help='stop after this many (real) seconds')
+    parser.add_argument('--panel', choices=sorted(sim.PANELS), default='BWR', help='which display hat to simulate')
+    parser.add_argument('--scale', type=float, default=20, help='how much faster than real time to run')
+    parser.add_argument('--png', help='save the panel to this PNG when stopping')
+    parser.add_argument('--png-scale', type=int, default=2, help='pixel size in the PNG')
+    parser.add_argument('--flash', help='directory for flash files (default: a new temporary one)')
+    parser.add_argument('--server', help='use this server (host:port) instead of starting a stub')
+    args = parser.parse_args()
+
+    server = None
+    if args.server:
+        host, port = args.server.rsplit(':', 1)
+        target = (host, int(port))
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        import badgeman_stub
+        server = badgeman_stub.make_server(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        target = server.server_address[:2]
+        print(f'* Stub server on {target[0]}:{target[1]}')
+
+    board = sim.install(panel=args.panel, scale=args.scale, hosts={SERVER_HOST: target})
+    from sim.upy.machine import DeepSleepReset
+
+    if args.png:
+        args.png = os.path.abspath(args.png)
+
+    os.chdir(args.flash or tempfile.mkdtemp(prefix='badge-flash-'))
+    print(f'* Flash directory: {os.getcwd()}')
+
+    def stop():
+        report(board, server)
+        if args.png:
+            board.panel.save_png(args.png, args.png_scale)
+            print(f'* Saved panel to {args.png}')
+        os._exit(0)
+
+    if args.seconds:
+        threading.Timer(args.seconds, stop).start()
+
+    # Waking from deep sleep resets the Pico, which runs main.py from the start again
+    try:
+        while True:
+            try:
+                runpy.run_path(os.path.join(sim.SRC_DIR, 'main.py'), run_name='__main__')
+                break
+            except DeepSleepReset:
+                print('* Woke from deep sleep; restarting')
+    except KeyboardInterrupt:
+        pass
+
+    stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+""" Simulated board state
+        by: Matt Hall
+        version: 0.1
+
+    The state shared by the fake MicroPython modules: pin levels, the SPI transfer log, the panel
+    model, the WLAN settings and the (optionally sped-up) clock.
+"""
+import collections
+import time
+
+# Pins the display is wired to on the Pico (as in src/display_driver_*.py)
+DC_PIN = 8
+CS_PIN = 9
+RESET_PIN = 12
+BUSY_PIN = 13
+
+# How many SPI transfers to keep in the log
+SPI_LOG_SIZE = 100000
+
+
+class Clock:
+    """ Milliseconds since the simulation started, running `scale` times faster than real time """
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self.__start = time.monotonic()
+
+    def ticks_ms(self):
+        return int((time.monotonic() - self.__start) * 1000 * self.scale)
+
+    def ticks_us(self):
+        return int((time.monotonic() - self.__start) * 1000000 * self.scale)
+
+    def real_seconds(self, ms):
+        """ Real time in seconds that `ms` simulated milliseconds take """
+        return ms / 1000 / self.scale
+
+    def sleep_ms(self, ms):
+        if ms > 0:
+            time.sleep(self.real_seconds(ms))
+
+
+class SpiStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Number of write() calls, and bytes written as commands (D/C low) and data (D/C high)
+        self.calls = 0
+        self.command_bytes = 0
+        self.data_bytes = 0
+
+    @property
+    def bytes(self):
+        return self.command_bytes + self.data_bytes
+
+
+class Board:
+    def __init__(self, panel, clock, hosts, mac):
+        self.panel = panel
+        self.clock = clock
+        self.hosts = hosts
+        self.mac = mac
+
+        # Output levels of each pin, and the level each input is pulled to (or None), by number
+        self.levels = {}
+        self.pulls = {}
+
+        # Every SPI transfer as (D/C level, bytes), oldest first
+        self.spi_log = collections.deque(maxlen=SPI_LOG_SIZE)
+        self.spi_stats = SpiStats()
+
+        # WLAN behaviour and radio state, see sim.upy.network
+        self.wlan_state = {}
+        self.wlan_ssids = {'Badge City': {'bssid': b'\x02\x00\x00\xba\xd9\xe5', 'channel': 6, 'rssi': -48}}
+        self.wlan_connect_ms = 2500
+        self.wlan_fast_connect_ms = 400
+        self.wlan_address = '192.168.69.42'
+
+        if self.panel is not None:
+            self.panel.attach(self)
+
+    def pin_value(self, pin):
+        if pin == BUSY_PIN:
+            if self.panel is None:
+                return self.pulls.get(pin) or 0
+            return self.panel.busy_level()
+        return self.levels.get(pin, 0)
+
+    def set_pull(self, pin, level):
+        self.pulls[pin] = level
+
+    def set_pin(self, pin, value):
+        previous = self.levels.get(pin)
+        self.levels[pin] = value
+
+        # The controller resets while its reset line is held low
+        if pin == RESET_PIN and value == 0 and previous != 0 and self.panel is not None:
+            self.panel.reset()
+
+    def spi_write(self, buf):
+        data = bytes(buf)
+        dc = self.levels.get(DC_PIN, 0)
+
+        self.spi_stats.calls += 1
+        if dc:
+            self.spi_stats.data_bytes += len(data)
+        else:
+            self.spi_stats.command_bytes += len(data)
+        self.spi_log.append((dc, data))
+
+        # Only a selected (CS low) controller listens to the bus
+        if not self.levels.get(CS_PIN, 0) and self.panel is not None:
+            self.panel.receive(dc, data)
+
+    def resolve(self, host, port):
+        """ Where a connection to (host, port) from the badge actually goes """
+        if host in self.hosts:
+            new_host, new_port = self.hosts[host]
+            return new_host, new_port or port
+        return host, port
@@ -0,0 +1,282 @@
+""" Models of the e-paper panel controllers
+        by: Matt Hall
+        version: 0.1
+
+    Each model takes the command and data bytes the driver sends over SPI, keeps the controller's
+    RAM, holds the BUSY line for as long as the real panel would be busy, and keeps a copy of what
+    the last refresh put on the glass.
+
+    Only the commands the badge drivers use are modelled; anything else is accepted and ignored.
+"""
+from sim.png import write_png
+
+DISPLAY_WIDTH = 128
+DISPLAY_HEIGHT = 296
+ROW_BYTES = DISPLAY_WIDTH // 8
+PLANE_SIZE = ROW_BYTES * DISPLAY_HEIGHT
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (200, 0, 0)
+
+
+class Panel:
+    """ Common parts of the controller models """
+    # BUSY pin level while busy
+    BUSY_LEVEL = 0
+
+    # How long the controller is busy coming out of a hardware reset (ms)
+    HARDWARE_RESET_MS = 5
+
+    def __init__(self):
+        self.board = None
+        self.busy_until = 0
+
+        # Number of refreshes done, and how long the panel has spent busy refreshing (simulated ms)
+        self.refreshes = 0
+        self.refresh_ms = 0
+
+        # What the last refresh put on the glass, as planes of PLANE_SIZE bytes (bit set = white)
+        self.shown = bytearray(b'\xff' * PLANE_SIZE)
+
+        self.reset()
+
+    def attach(self, board):
+        self.board = board
+
+    def now(self):
+        return self.board.clock.ticks_ms() if self.board else 0
+
+    def busy(self):
+        return self.now() < self.busy_until
+
+    def busy_for(self, ms):
+        self.busy_until = max(self.busy_until, self.now()) + ms
+
+    def busy_level(self):
+        return self.BUSY_LEVEL if self.busy() else 1 - self.BUSY_LEVEL
+
+    def refreshed(self, ms):
+        self.refreshes += 1
+        self.refresh_ms += ms
+        self.busy_for(ms)
+
+    def reset(self):
+        self.command = None
+        self.args = bytearray()
+        self.asleep = False
+        self.busy_for(self.HARDWARE_RESET_MS)
+
+    def receive(self, dc, data):
+        # A sleeping controller only wakes on a hardware reset
+        if self.asleep:
+            return
+
+        if dc:
+            self.data(data)
+        else:
+            for command in data:
+                self.command = command
+                self.args = bytearray()
+                self.run(command)
+
+    def run(self, command):
+        """ Carry out a command as soon as it is received """
+        pass
+
+    def data(self, data):
+        """ Take data bytes for the current command """
+        self.args += data
+
+    def pixel(self, x, y):
+        """ Colour of a pixel on the glass (portrait orientation) """
+        bit = 0x80 >> (x & 7)
+        return WHITE if self.shown[y * ROW_BYTES + (x >> 3)] & bit else BLACK
+
+    def save_png(self, path, scale=1):
+        """ Save what is on the glass as a PNG, optionally scaled up """
+        rows = []
+        for y in range(DISPLAY_HEIGHT):
+            row = bytearray()
+            for x in range(DISPLAY_WIDTH):
+                row += bytes(self.pixel(x, y)) * scale
+            rows.extend([bytes(row)] * scale)
+        write_png(path, DISPLAY_WIDTH * scale, DISPLAY_HEIGHT * scale, rows)
+
+
+class UC8151Panel(Panel):
+    """ Controller of the Waveshare 2.9" black/white/red panel (Pico-ePaper-2.9-B) """
+    BUSY_LEVEL = 0
+
+    # How long each operation keeps the panel busy (ms)
+    POWER_ON_MS = 80
+    POWER_OFF_MS = 20
+    REFRESH_MS = 15000
+
+    BLACK_CHANNEL = 0x10
+    RED_CHANNEL = 0x13
+
+    def __init__(self):
+        self.ram = {
+            self.BLACK_CHANNEL: bytearray(b'\xff' * PLANE_SIZE),
+            self.RED_CHANNEL: bytearray(b'\xff' * PLANE_SIZE),
+        }
+        self.shown_red = bytearray(b'\xff' * PLANE_SIZE)
+        self.offset = 0
+        super().__init__()
+
+    def run(self, command):
+        if command in self.ram:
+            self.offset = 0
+        elif command == 0x04:   # Power on
+            self.busy_for(self.POWER_ON_MS)
+        elif command == 0x02:   # Power off
+            self.busy_for(self.POWER_OFF_MS)
+        elif command == 0x12:   # Display refresh
+            self.shown[:] = self.ram[self.BLACK_CHANNEL]
+            self.shown_red[:] = self.ram[self.RED_CHANNEL]
+            self.refreshed(self.REFRESH_MS)
+
+    def data(self, data):
+        if self.command in self.ram:
+            end = min(self.offset + len(data), PLANE_SIZE)
+            self.ram[self.command][self.offset:end] = data[:end - self.offset]
+            self.offset = end
+        elif self.command == 0x07 and data[:1] == b'\xa5':   # Deep sleep
+            self.asleep = True
+        else:
+            super().data(data)
+
+    def pixel(self, x, y):
+        # In the red plane, a clear bit is red, and red shows over black
+        if not self.shown_red[y * ROW_BYTES + (x >> 3)] & (0x80 >> (x & 7)):
+            return RED
+        return super().pixel(x, y)
+
+
+class SSD1680Panel(Panel):
+    """ Controller of the Waveshare 2.9" black/white panel (Pico-ePaper-2.9) """
+    BUSY_LEVEL = 1
+
+    RESET_MS = 10
+    FULL_REFRESH_MS = 2000
+    PARTIAL_REFRESH_MS = 300
+    FAST_REFRESH_MS = 1000
+    ANALOG_ON_MS = 50
+
+    # What the temperature sensor reads (C), and the temperature at and above which the OTP holds
+    # the short (fast) waveform
+    SENSOR_TEMPERATURE = 25
+    FAST_TEMPERATURE = 0x50
+
+    def __init__(self):
+        self.ram = {
+            0x24: bytearray(b'\xff' * PLANE_SIZE),   # Black/white
+            0x26: bytearray(b'\xff' * PLANE_SIZE),   # Red, or the previous image for partial refresh
+        }
+        self.update_option = 0xF7
+        self.partial_refreshes = 0
+        self.fast_refreshes = 0
+        self.software_reset()
+        super().__init__()
+
+    def software_reset(self):
+        # SWRESET puts the registers back to their defaults; a hardware reset only wakes the
+        # controller, so settings such as the data entry mode survive EnterPartialMode()
+        self.entry_mode = 0x03
+        self.x_window = (0, ROW_BYTES - 1)
+        self.y_window = (0, DISPLAY_HEIGHT - 1)
+        self.x = 0
+        self.y = 0
+        self.temperature = self.SENSOR_TEMPERATURE
+        self.lut = 'otp'    # 'otp' (normal), 'fast' (loaded for a high temperature) or 'custom'
+
+    def run(self, command):
+        if command == 0x12:     # Software reset
+            self.software_reset()
+            self.busy_for(self.RESET_MS)
+        elif command == 0x20:   # Master activation: run the update sequence set by 0x22
+            option = self.update_option
+            if option & 0x10:
+                # Load the waveform from OTP for the temperature, read from the sensor first if
+                # asked, or as last written to 0x1A
+                if option & 0x20:
+                    self.temperature = self.SENSOR_TEMPERATURE
+                self.lut = 'fast' if self.temperature >= self.FAST_TEMPERATURE else 'otp'
+            if option & 0x04:
+                # 'Display mode 2' is the partial (differential) refresh
+                partial = bool(option & 0x08)
+                fast = not partial and self.lut == 'fast'
+                self.shown[:] = self.ram[0x24]
+                if partial:
+                    self.refreshed(self.PARTIAL_REFRESH_MS)
+                    self.partial_refreshes += 1
+                elif fast:
+                    self.refreshed(self.FAST_REFRESH_MS)
+                    self.fast_refreshes += 1
+                else:
+                    self.refreshed(self.FULL_REFRESH_MS)
+            else:
+                self.busy_for(self.ANALOG_ON_MS)
+
+    def data(self, data):
+        command = self.command
+        if command in self.ram:
+            self.write_ram(self.ram[command], data)
+            return
+
+        super().data(data)
+        args = self.args
+        if command == 0x11 and len(args) == 1:
+            self.entry_mode = args[0]
+        elif command == 0x44 and len(args) == 2:
+            self.x_window = (args[0], args[1])
+        elif command == 0x45 and len(args) == 4:
+            self.y_window = (args[0] | args[1] << 8, args[2] | args[3] << 8)
+        elif command == 0x4E and len(args) == 1:
+            self.x = args[0]
+        elif command == 0x4F and len(args) == 2:
+            self.y = args[0] | args[1] << 8
+        elif command == 0x1A and len(args) == 2:
+            self.temperature = args[0]     # Whole degrees; the second byte holds the fraction
+        elif command == 0x32 and len(args) == 1:
+            self.lut = 'custom'
+        elif command == 0x22 and len(args) == 1:
+            self.update_option = args[0]
+        elif command == 0x10 and len(args) == 1 and args[0] & 0x03:
+            self.asleep = True
+
+    def write_ram(self, ram, data):
+        # The address counter moves through the window in the direction set by the data entry
+        # mode: bit 0 increments x, bit 1 increments y, bit 2 moves in y before x
+        dx = 1 if self.entry_mode & 0x01 else -1
+        dy = 1 if self.entry_mode & 0x02 else -1
+        y_first = self.entry_mode & 0x04
+        x_start, x_end = self.x_window if dx > 0 else self.x_window[::-1]
+        y_start, y_end = self.y_window if dy > 0 else self.y_window[::-1]
+
+        x, y = self.x, self.y
+        for byte in data:
+            if 0 <= x < ROW_BYTES and 0 <= y < DISPLAY_HEIGHT:
+                ram[y * ROW_BYTES + x] = byte
+
+            if y_first:
+                if y == y_end:
+                    y = y_start
+                    x = x_start if x == x_end else x + dx
+                else:
+                    y += dy
+            else:
+                if x == x_end:
+                    x = x_start
+                    y = y_start if y == y_end else y + dy
+                else:
+                    x += dx
+
+        self.x, self.y = x, y
+
+
+PANELS = {
+    'BWR': UC8151Panel,
+    'BW': SSD1680Panel,
+}
@@ -0,0 +1,28 @@
+""" Minimal PNG writer
+        by: Matt Hall
+        version: 0.1
+
+    Writes 8-bit RGB PNGs with only the standard library (zlib), so saving the simulated panel
+    doesn't need PIL.
+"""
+import struct
+import zlib
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _chunk(kind, data):
+    body = kind + data
+    return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+
+def write_png(path, width, height, rows):
+    """ Write an RGB image given as `height` rows of `width` * 3 bytes """
+    # Each scanline starts with its filter type (0: none)
+    raw = b''.join(b'\x00' + row for row in rows)
+
+    with open(path, 'wb') as f:
+        f.write(PNG_SIGNATURE)
+        f.write(_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(_chunk(b'IDAT', zlib.compress(raw, 9)))
+        f.write(_chunk(b'IEND', b''))
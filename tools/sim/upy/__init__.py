@@ -0,0 +1 @@
+""" Fake MicroPython modules, installed under their MicroPython names by sim.install() """
@@ -0,0 +1,139 @@
+""" Fake 'framebuf' module: the monochrome formats and drawing primitives, in plain Python.
+
+text() follows MicroPython's rules (8x8 cells, characters outside ASCII 32-127 drawn as 127, only the
+glyph's set pixels drawn), but the glyphs are the badge's own 5x7 font (src/font.py) rather than
+MicroPython's built-in font, so text lands where it would on a Pico but the letters look different.
+
+The state is kept in private attributes, as drivers subclass FrameBuffer and set their own 'width',
+'height' and 'buffer'. """
+
+MONO_VLSB = 0
+MONO_HLSB = 3
+MONO_HMSB = 4
+
+# Glyphs for ASCII 32-127, 8 bytes each: one byte per column, left to right, bit 0 at the top
+_FONT = bytes.fromhex(
+    '00000000000000000000005f00000000000007000700000000147f147f14000000242a7f2a1200000023130864620000'
+    '0036495522500000000005030000000000001c2241000000000041221c00000000082a1c2a0800000008083e08080000'
+    '0000503000000000000808080808000000006060000000000020100804020000003e5149453e00000000427f40000000'
+    '0042615149460000002141454b310000001814127f1000000027454545390000003c4a49493000000001710905030000'
+    '003649494936000000064949291e00000000363600000000000056360000000000081422410000000014141414140000'
+    '0000412214080000000201510906000000324979413e0000007e1111117e0000007f494949360000003e414141220000'
+    '007f4141221c0000007f494949410000007f090901010000003e414151320000007f0808087f00000000417f41000000'
+    '002040413f010000007f081422410000007f404040400000007f0204027f0000007f0408107f0000003e4141413e0000'
+    '007f090909060000003e4151215e0000007f09192946000000464949493100000001017f01010000003f4040403f0000'
+    '001f2040201f0000007f2018207f000000631408146300000003047804030000006151494543000000007f4141000000'
+    '0002040810200000000041417f0000000004020102040000004040404040000000000102040000000020545454780000'
+    '007f484444380000003844444420000000384444487f0000003854545418000000087e090102000000085454543c0000'
+    '007f0804047800000000447d40000000002040443d000000007f1028440000000000417f40000000007c041804780000'
+    '007c0804047800000038444444380000007c14141408000000081414187c0000007c0804040800000048545454200000'
+    '00043f4440200000003c4040207c0000001c2040201c0000003c4030403c00000044281028440000000c5050503c0000'
+    '004464544c44000000000836410000000000007f0000000000004136080000000008040810080000007f414141417f00'
+)
+
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, format, stride=None):
+        self.__buf = buffer
+        self.__w = width
+        self.__h = height
+        self.__fmt = format
+        self.__stride = stride or width
+        if format != MONO_VLSB:
+            # Horizontal formats start each row on a byte boundary
+            self.__stride = (self.__stride + 7) & ~7
+
+    def __address(self, x, y):
+        # (byte index, bit mask) of a pixel
+        if self.__fmt == MONO_VLSB:
+            return (y >> 3) * self.__stride + x, 1 << (y & 7)
+        index = (y * self.__stride + x) >> 3
+        if self.__fmt == MONO_HLSB:
+            return index, 0x80 >> (x & 7)
+        return index, 1 << (x & 7)
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.__w and 0 <= y < self.__h):
+            return None
+        index, mask = self.__address(x, y)
+        if c is None:
+            return 1 if self.__buf[index] & mask else 0
+        if c:
+            self.__buf[index] |= mask
+        else:
+            self.__buf[index] &= ~mask & 0xff
+
+    def fill(self, c):
+        value = 0xff if c else 0x00
+        for i in range(len(self.__buf)):
+            self.__buf[i] = value
+
+    def fill_rect(self, x, y, w, h, c):
+        for yy in range(max(y, 0), min(y + h, self.__h)):
+            for xx in range(max(x, 0), min(x + w, self.__w)):
+                self.pixel(xx, yy, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            return self.fill_rect(x, y, w, h, c)
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        # Bresenham
+        dx = abs(x2 - x1)
+        dy = -abs(y2 - y1)
+        sx = 1 if x1 < x2 else -1
+        sy = 1 if y1 < y2 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x1, y1, c)
+            if x1 == x2 and y1 == y2:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for yy in range(fbuf._FrameBuffer__h):
+            for xx in range(fbuf._FrameBuffer__w):
+                c = fbuf.pixel(xx, yy)
+                if palette is not None:
+                    c = palette.pixel(c, 0)
+                if c != key:
+                    self.pixel(x + xx, y + yy, c)
+
+    def scroll(self, xstep, ystep):
+        old = FrameBuffer(bytearray(self.__buf), self.__w, self.__h, self.__fmt, self.__stride)
+        for yy in range(self.__h):
+            for xx in range(self.__w):
+                sx, sy = xx - xstep, yy - ystep
+                if 0 <= sx < self.__w and 0 <= sy < self.__h:
+                    self.pixel(xx, yy, old.pixel(sx, sy))
+
+    def text(self, s, x, y, c=1):
+        for char in s.encode():
+            if not 32 <= char <= 127:
+                char = 127
+            glyph = _FONT[(char - 32) * 8:(char - 31) * 8]
+            for column in glyph:
+                if 0 <= x < self.__w:
+                    yy = y
+                    while column:
+                        if column & 1:
+                            self.pixel(x, yy, c)
+                        column >>= 1
+                        yy += 1
+                x += 1
@@ -0,0 +1,125 @@
+""" Fake 'machine' module: pins, SPI and timers wired to the simulated board """
+import threading
+
+import sim
+
+
+class DeepSleepReset(Exception):
+    """ Raised by deepsleep(); on a real Pico waking from deep sleep resets the board """
+    pass
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=IN, pull=None, value=None):
+        self.id = id
+        self.mode = mode
+        self.init(mode, pull, value)
+
+    def init(self, mode=None, pull=None, value=None):
+        if mode is not None:
+            self.mode = mode
+        # A line nothing drives floats to the level of its pull resistor
+        sim.board.set_pull(self.id, {self.PULL_UP: 1, self.PULL_DOWN: 0}.get(pull))
+        if value is not None:
+            self.value(value)
+
+    def value(self, value=None):
+        if value is None:
+            return sim.board.pin_value(self.id)
+        sim.board.set_pin(self.id, 1 if value else 0)
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def high(self):
+        self.value(1)
+
+    def low(self):
+        self.value(0)
+
+    def toggle(self):
+        self.value(0 if self.value() else 1)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING):
+        pass
+
+
+class SPI:
+    def __init__(self, id, baudrate=1000000, **kwargs):
+        self.id = id
+        self.baudrate = baudrate
+
+    def init(self, baudrate=None, **kwargs):
+        if baudrate is not None:
+            self.baudrate = baudrate
+
+    def deinit(self):
+        pass
+
+    def write(self, buf):
+        sim.board.spi_write(buf)
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self.__stop = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, freq=None, period=None, callback=None):
+        self.deinit()
+        if callback is None:
+            return
+
+        period_ms = period if period is not None else 1000 / freq
+        stop = self.__stop = threading.Event()
+
+        def run():
+            while not stop.wait(sim.board.clock.real_seconds(period_ms)):
+                callback(self)
+                if mode == Timer.ONE_SHOT:
+                    break
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def deinit(self):
+        if self.__stop is not None:
+            self.__stop.set()
+            self.__stop = None
+
+
+def lightsleep(time_ms=None):
+    sim.board.clock.sleep_ms(time_ms or 0)
+
+
+def deepsleep(time_ms=None):
+    sim.board.clock.sleep_ms(time_ms or 0)
+    raise DeepSleepReset()
+
+
+def reset():
+    raise DeepSleepReset()
+
+
+def freq(hz=None):
+    return 125000000
+
+
+def unique_id():
+    return sim.board.mac
@@ -0,0 +1,18 @@
+""" Fake 'micropython' module. There is no viper or native emitter, so code using them falls back
+to plain Python as it would on a port without them. """
+
+
+def const(value):
+    return value
+
+
+def schedule(func, arg):
+    func(arg)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def mem_info(verbose=False):
+    pass
@@ -0,0 +1,85 @@
+""" Fake 'network' module: a WLAN interface that connects after a simulated delay """
+import sim
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+
+class WLAN:
+    def __init__(self, interface=STA_IF):
+        # There is only one radio, so every WLAN object shares the board's state
+        self.__dict__ = sim.board.wlan_state
+        if not self.__dict__:
+            self._active = False
+            self._status = STAT_IDLE
+            self._connected_at = 0
+            self._ifconfig = ('0.0.0.0', '0.0.0.0', '0.0.0.0', '0.0.0.0')
+            self._static = False
+            self._ssid = None
+
+    def active(self, active=None):
+        if active is None:
+            return self._active
+        self._active = bool(active)
+        if not active:
+            self._status = STAT_IDLE
+
+    def scan(self):
+        board = sim.board
+        board.clock.sleep_ms(1500)
+        return [
+            (ssid.encode(), ap['bssid'], ap['channel'], ap['rssi'], 3, False)
+            for ssid, ap in board.wlan_ssids.items()
+        ]
+
+    def connect(self, ssid, key=None, bssid=None):
+        board = sim.board
+        ap = board.wlan_ssids.get(ssid)
+        if not self._active or ap is None or (bssid is not None and bssid != ap['bssid']):
+            self._status = STAT_NO_AP_FOUND
+            return
+
+        # Joining a known access point directly skips the scan, and a static address skips DHCP
+        connect_ms = board.wlan_fast_connect_ms if bssid is not None else board.wlan_connect_ms
+        if self._static:
+            connect_ms //= 2
+
+        self._ssid = ssid
+        self._status = STAT_CONNECTING
+        self._connected_at = board.clock.ticks_ms() + connect_ms
+
+    def disconnect(self):
+        self._status = STAT_IDLE
+
+    def status(self, param=None):
+        if self._status == STAT_CONNECTING and sim.board.clock.ticks_ms() >= self._connected_at:
+            self._status = STAT_GOT_IP
+            if not self._static:
+                self._ifconfig = (sim.board.wlan_address, '255.255.255.0', '192.168.69.1', '192.168.69.1')
+        return self._status
+
+    def isconnected(self):
+        return self.status() == STAT_GOT_IP
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self._ifconfig
+        if config == 'dhcp':
+            self._static = False
+        else:
+            self._static = True
+            self._ifconfig = tuple(config)
+
+    def config(self, param=None, **kwargs):
+        if param == 'mac':
+            return sim.board.mac
+        if param == 'ssid':
+            return self._ssid
+        return None
@@ -0,0 +1,10 @@
+""" Fake 'rp2' module """
+
+_country = 'XX'
+
+
+def country(code=None):
+    global _country
+    if code is None:
+        return _country
+    _country = code
@@ -0,0 +1,31 @@
+""" Fake 'uasyncio' module: CPython's asyncio, with sleeps on the simulated clock and connections
+redirected as the board says """
+from asyncio import *  # noqa: F401,F403
+import asyncio as _asyncio
+
+import sim
+
+
+def _real(seconds):
+    return sim.board.clock.real_seconds(seconds * 1000)
+
+
+async def sleep(seconds):
+    await _asyncio.sleep(_real(seconds))
+
+
+async def sleep_ms(ms):
+    await _asyncio.sleep(_real(ms / 1000))
+
+
+async def wait_for(awaitable, timeout):
+    return await _asyncio.wait_for(awaitable, None if timeout is None else _real(timeout))
+
+
+async def wait_for_ms(awaitable, timeout):
+    return await wait_for(awaitable, timeout / 1000)
+
+
+async def open_connection(host, port, **kwargs):
+    host, port = sim.board.resolve(host, port)
+    return await _asyncio.open_connection(host, port, **kwargs)
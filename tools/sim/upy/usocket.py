@@ -0,0 +1,10 @@
+""" Fake 'usocket' module: CPython's socket, with connections redirected as the board says """
+from socket import *  # noqa: F401,F403
+import socket as _socket
+
+import sim
+
+
+def getaddrinfo(host, port, *args, **kwargs):
+    host, port = sim.board.resolve(host, port)
+    return _socket.getaddrinfo(host, port, *args, **kwargs)
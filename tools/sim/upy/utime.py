@@ -0,0 +1,40 @@
+""" Fake 'utime' module running on the simulated clock """
+import time as _time
+
+import sim
+
+
+def sleep(seconds):
+    sim.board.clock.sleep_ms(seconds * 1000)
+
+
+def sleep_ms(ms):
+    sim.board.clock.sleep_ms(ms)
+
+
+def sleep_us(us):
+    sim.board.clock.sleep_ms(us / 1000)
+
+
+def ticks_ms():
+    return sim.board.clock.ticks_ms()
+
+
+def ticks_us():
+    return sim.board.clock.ticks_us()
+
+
+def ticks_add(ticks, delta):
+    return ticks + delta
+
+
+def ticks_diff(end, start):
+    return end - start
+
+
+def time():
+    return int(_time.time())
+
+
+def localtime(secs=None):
+    return _time.localtime(secs)[:8]